@@ -2,13 +2,18 @@
                                                                                 # BIBLIOTECAS
 #===========================================================================================================================================================================
 import numpy as np
-import pandas as pd
-import streamlit as st
 import folium
-from streamlit_folium import folium_static
-from folium.plugins import MarkerCluster
+import streamlit as st
+import streamlit.components.v1 as components
+from streamlit_folium import st_folium
 from PIL import Image
 
+from utils.agregados import aplicar_mascara, metricas_gerais, metricas_gerais_aproximadas
+from utils.culinarias import culinarias_de
+from utils.data import chave_mapa, iniciar_instrumentacao, load_data, load_esbocos, load_grade, load_index, load_mapas, painel_instrumentacao
+from utils.instrumentacao import renderizar, trecho
+from utils.mapa import camada_grade, html_mapa, limites_viewport
+
 #===========================================================================================================================================================================                             
                                                                                 # TÍTULO
 #==========================================================================================================================================================================
@@ -16,179 +21,16 @@ from PIL import Image
 st.set_page_config(page_title="Zomato Dashboard", page_icon="🍽️", layout="wide")
 
 # ==================================================================================================================================================================#
-#                                                                     LIMPEZA E FEATURE ENGINEERING
+#                                                                     CARREGAMENTO
 # ==================================================================================================================================================================#
-@st.cache_data
-def load_data():
-    ''' Função para realizar a limpeza, ordenação e criação ou modificação de colunas no dataframe:
-        1 - cria uma cópia do dataframe
-        2 - Cria uma variável para alocar as colunas do tipo texto
-        3 - Percorre a variável (lista) e, para cada item, aplicar a padronização de texto e substituição dos valores de texto NaN por none
-        4 - retorna o data frame limpo
-    
-        Parâmetro: Data frame a ser limpo
-    
-        Retorno: Data frame com colunas do tipo objetos limpas e padronizadas para letra minúscula
-    '''
+# O Home.py roda em todo rerun, de qualquer página: o rastreio começa aqui e o painel sai no fim
+rastreio = iniciar_instrumentacao()
 
-    # CARREGAMENTO DOS DADOS
-    df = pd.read_csv("dataset/zomato.csv")
-    
-    # LIMPEZA E ORGANIZAÇÃO
-
-    # Criar cópia do dataframe e retirar colunas não usadas
-    df1 = df.copy()
-    # Verifica se as colunas existem antes de remover para evitar erros
-    cols_to_drop = ["Locality Verbose", "Switch to order menu"]
-    df1 = df1.drop([c for c in cols_to_drop if c in df1.columns], axis=1)
-    
-    df1.drop_duplicates(inplace=True)
-    
-    # Organizar as colunas 
-    df1.columns = df1.columns.str.lower().str.strip().str.replace(' ', '_')
-    
-    # Preencher Valores nulos de variáveis importantes
-    df1["cuisines"] = df1["cuisines"].fillna("Not Informed")
-    
-    # Deletar valores nulos não utilizáveis
-    valores_nulos = ['NaN', 'nan', 'None', 'none', 'NA', 'n/a', 'N/A', '', ' ']
-    df1.replace(valores_nulos, np.nan, inplace=True)
-    df1 = df1.loc[df1["average_cost_for_two"] != 0, :]
-    
-    # Feature Engineering
-    
-    # Criar a coluna: "Country name" , substituindo o código postal pelo nome do país
-    countries = {
-        1: "India",
-        14: "Australia",
-        30: "Brazil",
-        37: "Canada",
-        94: "Indonesia",
-        148: "New Zealand",
-        162: "Philippines",
-        166: "Qatar",
-        184: "Singapore",
-        189: "South Africa",
-        191: "Sri Lanka",
-        208: "Turkey",
-        214: "United Arab Emirates",
-        215: "United Kingdom",
-        216: "United States of America"
-    }
-    
-    df1["country_name"] = df1["country_code"].map(countries).copy()
-    
-    # Classificar as cores baseado no "rating_color"
-    colors = {
-        "3F7E00": "darkgreen",
-        "5BA829": "green",
-        "9ACD32": "lightgreen",
-        "CDD614": "orange",
-        "FFBA00": "red",
-        "CBCBC8": "darkred",
-        "FF7800": "darkred",
-    }
-    
-    df1["color"] = df1["rating_color"].map(colors).copy()
-    
-    # Criar uma coluna de classificação para cada range de preço
-    classificacao = {
-        1: "cheap",
-        2: "normal",
-        3: "gourmet",
-        4: "caro"
-    }
-    
-    df1["price_type"] = df1["price_range"].map(classificacao).copy()
-    
-    # Coluna de recomendação baseado na quantidade de votos
-    quantile_25 = df1["votes"].quantile(0.25)
-    quantile_75 = df1["votes"].quantile(0.75)
-    mediana = df1["votes"].median()
-    
-    def recomendacao(linha):
-        vote = linha["votes"]
-        rating = linha["aggregate_rating"]
-    
-        if rating > 4 and vote > quantile_75:
-            return "muito recomendado"
-        elif (rating >= 4) or (rating >= 3 and vote >= mediana):
-            return "recomendado"
-        elif rating < 3:
-            return "pouco recomendado"
-        else:
-            return "Neutro"
-            
-    df1["recomendation"] = df1.apply(recomendacao, axis=1).copy()
-    
-    # Criação de coluna de conversão de moedas para R$
-    conversoes = {
-        'Botswana Pula(P)': 0.41,
-        'Brazilian Real(R$)': 1.0,
-        'Dollar($)': 5.44,
-        'Emirati Diram(AED)': 1.48,
-        'Indian Rupees(Rs.)': 0.065,
-        'Indonesian Rupiah(IDR)': 0.00034,
-        'NewZealand($)': 3.14,
-        'Pounds(£)': 7.25,
-        'Qatari Rial(QR)': 1.49,
-        'Rand(R)': 0.32,
-        'Sri Lankan Rupee(LKR)': 0.018,
-        'Turkish Lira(TL)': 0.13
-    }
-    
-    def conversao(linha):
-        moedas = linha["currency"]
-        valor = linha["average_cost_for_two"]
-        
-        if moedas in conversoes:
-            return valor * conversoes[moedas]
-        else:
-            return None # Retorna None se não achar a moeda
-
-    df1["average_cost_for_two_real"] = df1.apply(conversao, axis=1).copy()
-
-    # Remoção de Outlier
-    if "Australia" in df1["country_name"].values:
-        outlier = df1.loc[df1["country_name"] == "Australia", "average_cost_for_two_real"].idxmax()
-        df1 = df1.drop(outlier)
-        
-    #Criação de um Dataframe auxiliar para aplicação do filtro de culinárias
-    df_culinaria = df1.copy()
-    df_culinaria["cuisines"] = df_culinaria["cuisines"].astype(str).apply(lambda x: x.split(","))
-    df_culinaria = df_culinaria.explode("cuisines")
-    df_culinaria["cuisines"] = df_culinaria["cuisines"].str.strip()
-
-    return df1,df_culinaria
-
-        #Criação de um mapa dos restaurantes
-def create_map(df):
-    if df.empty: return folium.Map(location=[0,0], zoom_start=2)
-    
-    mapa = folium.Map(location=[df["latitude"].mean(), df["longitude"].mean()], zoom_start=2)
-    marker_cluster = MarkerCluster().add_to(mapa)
-
-    for index, linha in df.iterrows():
-        html = f"""
-        <div style="width: 250px;">
-            <h3 style="text-align: center;"><b>{linha['restaurant_name']}</b></h3>
-            <div style="font-size: 12px; margin-top: 10px;">
-                <b>Cozinha:</b> {linha['cuisines']}<br>
-                <b>Preço:</b> R$ {linha['average_cost_for_two_real']:.2f}<br>
-                <b>Nota:</b> {linha['aggregate_rating']}/5.0<br>
-                <b>Recomendação:</b> {linha['recomendation']}
-            </div>
-        </div>"""
-        
-        folium.Marker(
-            location=[linha["latitude"], linha["longitude"]],
-            popup=folium.Popup(html, max_width=300),
-            icon=folium.Icon(color=linha["color"], icon="home", prefix="fa")
-        ).add_to(marker_cluster)
-
-    return mapa
-
-df_limpo, df_culinaria = load_data()
+df_limpo, ponte = load_data()
+indice = load_index(df_limpo, ponte)
+grade = load_grade(df_limpo)
+esbocos = load_esbocos(df_limpo, ponte)
+mapas = load_mapas()
 
 #===========================================================================================================================================================================                             
                                                                                 # SIDEBAR
@@ -208,13 +50,10 @@ def home():
 #----------------------------------------------
         #Filtros
 #----------------------------------------------
-        df_filtros = df_limpo.copy()
-        df_culinaria_filtro = df_culinaria.copy()
-        
         #Filtro de Preço
         
-        min_val = df_filtros["average_cost_for_two_real"].min()
-        max_val = df_filtros["average_cost_for_two_real"].max()
+        min_val = df_limpo["average_cost_for_two_real"].min()
+        max_val = df_limpo["average_cost_for_two_real"].max()
       
         sel_preco = st.slider(
             "Faixa de Preço (R$)",
@@ -223,19 +62,19 @@ def home():
             value=(min_val, max_val)
         )
 
-        #Aplicação do filtro
-
-        df_filtros = df_filtros.loc[(df_filtros["average_cost_for_two_real"] >= sel_preco[0]) & (df_filtros["average_cost_for_two_real"] <= sel_preco[1])]
     
         # Filtro de Culinarias
-        todas_culinarias = sorted(list(df_culinaria_filtro["cuisines"].unique()))
+        todas_culinarias = culinarias_de(ponte)
         sel_culinarias = st.multiselect("Culinárias", todas_culinarias)
 
-        #Aplicação do Filtro
+        #Máscaras dos filtros de preço e culinária pelo índice (None = sem filtro); as linhas
+        #filtradas só são copiadas quando alguma parte da página precisa delas
 
-        if sel_culinarias:
-            df_culinaria_filtro = df_culinaria_filtro[df_culinaria_filtro["cuisines"].isin(sel_culinarias)]
-            df_filtros = df_filtros[df_filtros["restaurant_id"].isin(df_culinaria_filtro["restaurant_id"])]
+        mascara_preco = indice.mascara(preco=sel_preco)
+        mascara = indice.mascara(culinarias=sel_culinarias)
+        if mascara_preco is not None:
+            mascara = mascara_preco if mascara is None else mascara & mascara_preco
+        df_filtros = None
 
     
         #Buscar Restaurante
@@ -244,7 +83,16 @@ def home():
         #Aplicação do Filtro
 
         if sel_texto:
-            df_filtros = df_filtros[df_filtros["restaurant_name"].str.contains(sel_texto, case=False, na=False)]
+            df_filtros = aplicar_mascara(df_limpo, mascara)
+            with trecho("busca_nome", "filtro", linhas=len(df_filtros)):
+                df_filtros = df_filtros[df_filtros["restaurant_name"].str.contains(sel_texto, case=False, na=False)]
+        
+        #Modo do Mapa
+        modo_mapa = st.radio(
+            "Modo do Mapa",
+            ["Marcadores no navegador", "Clusters no servidor"],
+            help="Clusters no servidor: os restaurantes são agregados no servidor e só os clusters visíveis são enviados ao navegador."
+        )
         
         
     st.title("Zomato Dashboard")
@@ -254,15 +102,33 @@ def home():
     # Medidas 
 #----------------------------------------------
     
+    # Com a contagem aproximada ligada (load_esbocos), restaurantes e culinárias distintos saem da
+    # união dos esboços HyperLogLog só quando a página não copia as linhas filtradas (sem busca por
+    # nome e com o mapa de clusters, que usa só a máscara) e o filtro de culinárias é o único que
+    # restringe os restaurantes; com as linhas copiadas a contagem exata sai delas
+    aproximadas = esbocos is not None and df_filtros is None and modo_mapa == "Clusters no servidor" and mascara_preco is None
+
+    if aproximadas:
+        metricas = metricas_gerais_aproximadas(df_limpo, esbocos, sel_culinarias, mascara)
+        ajuda_aproximada = f"Valor aproximado (HyperLogLog, erro padrão de ~{esbocos.erro:.1%})"
+    else:
+        if df_filtros is None:
+            df_filtros = aplicar_mascara(df_limpo, mascara)
+        metricas = metricas_gerais(df_filtros)
+        ajuda_aproximada = None
+
+    def distintos(valor):
+        return f"≈ {valor}" if aproximadas else valor
+
     with st.container():
         col1, col2, col3, col4, col5 = st.columns(5)
-        with col1: st.metric("Restaurantes", df_filtros["restaurant_id"].nunique())
-        with col2: st.metric("Países", df_filtros["country_name"].nunique())
-        with col3: st.metric("Cidades", df_filtros["city"].nunique())
+        with col1: st.metric("Restaurantes", distintos(metricas["restaurantes"]), help=ajuda_aproximada)
+        with col2: st.metric("Países", metricas["paises"])
+        with col3: st.metric("Cidades", metricas["cidades"])
         with col4: 
-            votos = df_filtros["votes"].sum()
+            votos = metricas["avaliacoes"]
             st.metric("Avaliações", f"{votos:,.0f}".replace(",", "."))
-        with col5: st.metric("Culinárias", df_filtros["cuisines"].nunique())
+        with col5: st.metric("Culinárias", distintos(metricas["culinarias"]), help=ajuda_aproximada)
             
  #---------------------------------------------------
     st.markdown("---")
@@ -273,8 +139,36 @@ def home():
 #----------------------------------------------
         
     st.markdown("### 🗺️ Visão Geográfica")
-    mapa = create_map(df_filtros)
-    folium_static(mapa, width=1024, height=600)
+
+    if modo_mapa == "Clusters no servidor":
+        # Zoom e viewport devolvidos pelo mapa na interação anterior
+        estado_mapa = st.session_state.get("mapa_grade") or {}
+        zoom = estado_mapa.get("zoom") or 2
+        limites = limites_viewport(estado_mapa.get("bounds"))
+
+        # Máscara dos restaurantes filtrados (None = sem filtro): a dos filtros do índice ou,
+        # com a busca por nome, a das linhas encontradas
+        if sel_texto:
+            mascara = None
+            if len(df_filtros) < len(df_limpo):
+                mascara = np.zeros(len(df_limpo), dtype=bool)
+                mascara[df_filtros.index.to_numpy()] = True
+
+        mapa = folium.Map(location=[df_limpo["latitude"].mean(), df_limpo["longitude"].mean()], zoom_start=2)
+        renderizar(
+            st_folium,
+            mapa,
+            key="mapa_grade",
+            width=1024,
+            height=600,
+            returned_objects=["zoom", "bounds"],
+            feature_group_to_add=camada_grade(grade, df_limpo, zoom, mascara, limites),
+        )
+    else:
+        # HTML do mapa em cache pelo conjunto de restaurantes filtrados (as linhas já foram
+        # copiadas para as métricas exatas)
+        html = mapas.obter_ou_calcular(chave_mapa(df_filtros), lambda: html_mapa(df_filtros))
+        renderizar(components.html, html, width=1024, height=610)
 
 #----------------------------------------------
     #Paginas
@@ -293,7 +187,10 @@ pages = {
 
 pg = st.navigation(pages)
 
-pg.run()
+with trecho(pg.title, "pagina"):
+    pg.run()
+
+painel_instrumentacao(rastreio)
 
 
 
@@ -0,0 +1,419 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import argparse
+import ast
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from benchmarks.limpeza_paralela import CAMINHO_CSV  # noqa: E402
+from utils import sintetico  # noqa: E402
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Escalas medidas: 1 = o próprio zomato.csv, N = base sintética com N vezes as linhas dele (utils.sintetico)
+ESCALAS = (1, 10, 100, 1000)
+
+REPETICOES = 20
+
+# Uma medida para de repetir depois deste tempo (com pelo menos 3 execuções)
+TEMPO_MAX_S = 10
+
+# Mapa com um folium.Marker por restaurante só até este tamanho (acima disso leva minutos)
+LIMITE_MAPA_DETALHADO = 20_000
+
+# Na comparação com um resultado anterior, p50 acima de LIMITE_REGRESSAO vezes o anterior é regressão
+LIMITE_REGRESSAO = 1.2
+
+# Diferenças de p50 menores que isto são ruído de medição, nunca regressão
+DIFERENCA_MINIMA_MS = 1
+
+PASTA_DADOS = Path(tempfile.gettempdir()) / "zomato_desempenho"
+
+# ==================================================================================================================================================================#
+#                                                                     MEDIÇÃO
+# ==================================================================================================================================================================#
+def medir(funcao, repeticoes=REPETICOES, tempo_max=TEMPO_MAX_S):
+    ''' Executa funcao() até "repeticoes" vezes (ou até tempo_max) e mede o pico de memória
+        alocada numa execução extra, com o tracemalloc ligado (fora da medição de tempo).
+
+        Retorno: Dicionário com p50_ms, p95_ms, execucoes e pico_mb
+    '''
+    tempos = []
+    inicio = time.perf_counter()
+    while len(tempos) < repeticoes and (len(tempos) < 3 or time.perf_counter() - inicio < tempo_max):
+        antes = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - antes)
+
+    tracemalloc.start()
+    funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tempos = np.array(tempos) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(tempos, 50)), 3),
+        "p95_ms": round(float(np.percentile(tempos, 95)), 3),
+        "execucoes": len(tempos),
+        "pico_mb": round(pico / 1024 ** 2, 3),
+    }
+
+class Medidas(dict):
+    ''' Resultados de uma escala, por nome ("grupo/medida/cenário"), com o progresso no stderr. '''
+
+    def __init__(self, repeticoes):
+        super().__init__()
+        self.repeticoes = repeticoes
+
+    def medir(self, nome, funcao):
+        self[nome] = medir(funcao, self.repeticoes)
+        print(f"  {nome:55s} p50 {self[nome]['p50_ms']:10.2f} ms  p95 {self[nome]['p95_ms']:10.2f} ms  pico {self[nome]['pico_mb']:8.1f} MB", file=sys.stderr)
+
+def funcoes_da_pagina(caminho, **globais):
+    ''' Funções de gráfico definidas numa página do Streamlit, sem executar a página.
+
+        Só os imports e as definições de função (menos as com cache do Streamlit, "@st.") são
+        executados; variáveis globais que as funções usem vêm em "globais".
+
+        Retorno: Dicionário {nome: função}
+    '''
+    arvore = ast.parse(Path(caminho).read_text(encoding="utf-8"))
+    corpo = [
+        no for no in arvore.body
+        if isinstance(no, (ast.Import, ast.ImportFrom))
+        or (isinstance(no, ast.FunctionDef) and not any(ast.unparse(d).startswith("st.") for d in no.decorator_list))
+    ]
+
+    # Com o __name__ da página, como no Streamlit (o rótulo do @instrumentar vem do módulo)
+    namespace = {"__name__": Path(caminho).stem, **globais}
+    exec(compile(ast.Module(body=corpo, type_ignores=[]), str(caminho), "exec"), namespace)
+    return {no.name: namespace[no.name] for no in corpo if isinstance(no, ast.FunctionDef)}
+
+def _graficos(medidas, pagina, funcoes, argumentos, cenario):
+    ''' Mede cada função de gráfico da página; uma função nova sem argumentos definidos aqui é erro. '''
+    faltando = set(funcoes) - set(argumentos)
+    if faltando:
+        raise RuntimeError(f"{pagina}: funções sem argumentos no benchmark: {sorted(faltando)}")
+
+    for nome, args in argumentos.items():
+        medidas.medir(f"graficos/{pagina}.{nome}/{cenario}", lambda: funcoes[nome](*args))
+
+# ==================================================================================================================================================================#
+#                                                                     CENÁRIOS
+# ==================================================================================================================================================================#
+def cenarios(df1, ponte):
+    ''' Estado dos filtros da sidebar medido em cada escala.
+
+        "todos": o padrão das páginas, com todas as opções selecionadas
+        "selecao": os 3 países com mais restaurantes, as 5 maiores cidades deles, as 5
+                   culinárias mais comuns e a faixa de preço entre os quartis
+    '''
+    paises = df1["country_name"].value_counts().index[:3].tolist()
+    cidades = df1.loc[df1["country_name"].isin(paises), "city"].value_counts().index[:5].tolist()
+    culinarias = ponte["cuisines"].value_counts().index[:5].tolist()
+    precos = df1["average_cost_for_two_real"]
+
+    return {
+        "todos": {
+            "paises": sorted(df1["country_name"].unique()),
+            "cidades": sorted(df1["city"].unique()),
+            "culinarias": sorted(ponte["cuisines"].unique()),
+            "preco": (float(precos.min()), float(precos.max())),
+        },
+        "selecao": {
+            "paises": paises,
+            "cidades": cidades,
+            "culinarias": culinarias,
+            "preco": (float(precos.quantile(0.25)), float(precos.quantile(0.75))),
+        },
+    }
+
+# ==================================================================================================================================================================#
+#                                                                     EXECUÇÃO DE UMA ESCALA
+# ==================================================================================================================================================================#
+def executar(repeticoes, paginas=True):
+    ''' Mede carga, filtros, agregações, gráficos, mapa e páginas sobre o CSV de ZOMATO_CSV.
+
+        Roda num processo próprio para cada escala, com a memória e os caches zerados.
+    '''
+    from utils import agregados, snapshot
+    from utils.consultas import criar_motor
+    from utils.cubo import CuboOLAP
+    from utils.culinarias import MelhoresPorCulinaria, culinarias_de, filtrar_ponte
+    from utils.data import CAMINHO_CSV, MOTOR_CONSULTAS, carregar_base, load_data
+    from utils.grade import GradeEspacial
+    from utils.hll import EsbocosDistintos
+    from utils.indices import IndiceFiltros
+    from utils.mapa import camada_grade, create_map, html_mapa
+
+    medidas = Medidas(repeticoes)
+
+    # Carga: a primeira pode limpar o CSV e gravar o snapshot; as seguintes leem o snapshot
+    inicio = time.perf_counter()
+    snapshot_existia = snapshot.snapshot_valido(CAMINHO_CSV)
+    base = carregar_base()
+    primeira = (time.perf_counter() - inicio) * 1000
+    medidas.medir("carga/snapshot/-", carregar_base)
+    medidas.medir("carga/load_data/-", load_data)
+
+    df1, ponte = base.frames
+    indice = IndiceFiltros(df1, ponte)
+    melhores = MelhoresPorCulinaria(df1, ponte)
+    motor = criar_motor(MOTOR_CONSULTAS)
+    grade = GradeEspacial(df1)
+    filtros_cubo = [consulta.filtro for consulta in agregados.CONSULTAS_CIDADES.values() if consulta.filtro is not None]
+    cubo = CuboOLAP(df1, ponte, filtros_cubo)
+    esbocos = EsbocosDistintos(df1, ponte)
+
+    medidas.medir("indices/filtros/-", lambda: IndiceFiltros(df1, ponte))
+    medidas.medir("indices/melhores/-", lambda: MelhoresPorCulinaria(df1, ponte))
+    medidas.medir("indices/grade/-", lambda: GradeEspacial(df1))
+    medidas.medir("indices/cubo/-", lambda: CuboOLAP(df1, ponte, filtros_cubo))
+    medidas.medir("indices/esbocos_hll/-", lambda: EsbocosDistintos(df1, ponte))
+
+    graficos = {
+        pagina: funcoes_da_pagina(RAIZ / "pages" / f"{pagina}.py")
+        for pagina in ("1_paises", "2_cidades", "3_restaurantes")
+    }
+    # Lê os filtros da sidebar da própria página: é a cadeia medida em "filtros/paises"
+    del graficos["1_paises"]["calcular_agregado"]
+
+    for cenario, filtros in cenarios(df1, ponte).items():
+        paises, cidades, culinarias, preco = filtros["paises"], filtros["cidades"], filtros["culinarias"], filtros["preco"]
+
+        # Cadeias de filtros de cada página, na ordem em que a sidebar as executa
+        def filtros_home():
+            return indice.filtrar(df1, culinarias=culinarias, preco=preco)
+
+        def filtros_paises():
+            culinarias_de(ponte, indice.mascara(paises=paises))
+            fatia = cubo.fatia(paises=paises, preco=preco)
+            if not cubo.restringe_culinarias(fatia, culinarias):
+                return fatia
+            return agregados.filtrar(df1, ponte, indice, paises=paises, culinarias=culinarias, preco=preco)
+
+        def filtros_cidades():
+            return cubo.fatia(paises=paises, preco=preco)
+
+        def filtros_restaurantes():
+            mascara_paises = indice.mascara(paises=paises)
+            sorted(df1["city"].unique() if mascara_paises is None else df1.loc[mascara_paises, "city"].unique())
+            culinarias_de(ponte, mascara_paises)
+            mascara = indice.mascara(paises=paises, cidades=cidades, preco=preco)
+            return mascara, cubo.fatia(paises=paises, cidades=cidades, culinarias=culinarias, preco=preco)
+
+        for nome, cadeia in (("home", filtros_home), ("paises", filtros_paises), ("cidades", filtros_cidades), ("restaurantes", filtros_restaurantes)):
+            medidas.medir(f"filtros/{nome}/{cenario}", cadeia)
+
+        df_home = filtros_home()
+        fatia_cidades = filtros_cidades()
+        mascara_rest, fatia_rest = filtros_restaurantes()
+
+        # Entradas das mesmas agregações pelos restaurantes (sem o cubo, como na API)
+        _, df_paises, ponte_paises = agregados.filtrar(df1, ponte, indice, paises=paises, culinarias=culinarias, preco=preco)
+        mascara_cidades = indice.mascara(paises=paises, preco=preco)
+        df_cidades = agregados.aplicar_mascara(df1, mascara_cidades)
+        ponte_cidades = filtrar_ponte(ponte, mascara_cidades)
+        df_rest = agregados.aplicar_mascara(df1, mascara_rest)
+        pares = agregados.pares_culinarias(filtrar_ponte(ponte, mascara_rest, culinarias), df1)
+
+        # Agregações: as das páginas (cubo, ou índice no agregado por país com culinárias de fora)
+        fatia_paises = cubo.fatia(paises=paises, preco=preco)
+        if cubo.restringe_culinarias(fatia_paises, culinarias):
+            agregado = agregados.agregado_por_pais(df_paises, ponte_paises, df1)
+        else:
+            agregado = agregados.agregado_por_pais_cubo(cubo, fatia_paises)
+        rankings = agregados.rankings_cidades_cubo(cubo, fatia_cidades)
+        recomendacoes = agregados.recomendacoes_por_cidade_cubo(cubo, fatia_rest)
+        ranking_culinarias = agregados.ranking_culinarias_cubo(cubo, fatia_rest)
+
+        medidas.medir(f"agregados/metricas_gerais/{cenario}", lambda: agregados.metricas_gerais(df_home))
+        medidas.medir(f"agregados/metricas_gerais_aproximadas/{cenario}", lambda: agregados.metricas_gerais_aproximadas(df1, esbocos, culinarias, indice.mascara(culinarias=culinarias)))
+        medidas.medir(f"agregados/agregado_por_pais/{cenario}", lambda: agregados.agregado_por_pais(df_paises, ponte_paises, df1))
+        medidas.medir(f"agregados/culinarias_por_cidade/{cenario}", lambda: agregados.culinarias_por_cidade(ponte_cidades, df1, motor))
+        medidas.medir(f"agregados/custo_por_cidade/{cenario}", lambda: agregados.custo_por_cidade(df_cidades, motor))
+        medidas.medir(f"agregados/rankings_cidades/{cenario}", lambda: agregados.rankings_cidades(df_cidades, motor))
+        medidas.medir(f"agregados/melhores_culinarias/{cenario}", lambda: agregados.melhores_culinarias(agregados.topo_culinarias(pares), melhores, mascara_rest, df1))
+        medidas.medir(f"agregados/ranking_culinarias/{cenario}", lambda: agregados.ranking_culinarias(pares))
+        medidas.medir(f"agregados/tabela_culinarias/{cenario}", lambda: melhores.melhores(5, mascara_rest, melhores.catalogo(mascara_rest, culinarias)[:20]))
+        medidas.medir(f"agregados/recomendacoes_por_cidade/{cenario}", lambda: agregados.recomendacoes_por_cidade(df_rest))
+
+        # Os mesmos agregados pelas células do cubo (utils.cubo)
+        medidas.medir(f"cubo/fatia/{cenario}", lambda: cubo.fatia(paises=paises, cidades=cidades, culinarias=culinarias, preco=preco))
+        medidas.medir(f"cubo/agregado_por_pais/{cenario}", lambda: agregados.agregado_por_pais_cubo(cubo, fatia_paises))
+        medidas.medir(f"cubo/rankings_cidades/{cenario}", lambda: agregados.rankings_cidades_cubo(cubo, fatia_cidades))
+        medidas.medir(f"cubo/melhores_culinarias/{cenario}", lambda: agregados.melhores_culinarias(agregados.topo_culinarias_cubo(cubo, fatia_rest), melhores, mascara_rest, df1))
+        medidas.medir(f"cubo/ranking_culinarias/{cenario}", lambda: agregados.ranking_culinarias_cubo(cubo, fatia_rest))
+        medidas.medir(f"cubo/recomendacoes_por_cidade/{cenario}", lambda: agregados.recomendacoes_por_cidade_cubo(cubo, fatia_rest))
+
+        # Gráficos: as mesmas entradas que cada página passa para as funções
+        _graficos(medidas, "1_paises", graficos["1_paises"], {nome: (agregado,) for nome in graficos["1_paises"]}, cenario)
+        _graficos(medidas, "2_cidades", graficos["2_cidades"], {
+            "culinaria_por_cidade": (rankings["culinarias"],),
+            "cidade_com_reserva": (rankings["reserva"],),
+            "cidade_com_entregas": (rankings["entregas"],),
+            "cidade_pedido_online": (rankings["pedido_online"],),
+            "cidade_maior_valor_final": (rankings["custo"],),
+            "nota_acima": (rankings["nota_acima"],),
+            "nota_abaixo": (rankings["nota_abaixo"],),
+        }, cenario)
+        _graficos(medidas, "3_restaurantes", graficos["3_restaurantes"], {
+            "top_culinarias": (ranking_culinarias.sort_values("aggregate_rating", ascending=False).head(10), "Greens"),
+            "distribuicao_recomendacoes": (recomendacoes,),
+        }, cenario)
+
+        # Mapa da Home: HTML completo (marcadores no navegador) e clusters da grade no servidor
+        mascara_home = None
+        if len(df_home) < len(df1):
+            mascara_home = np.zeros(len(df1), dtype=bool)
+            mascara_home[df_home.index.to_numpy()] = True
+
+        medidas.medir(f"mapa/create_map/{cenario}", lambda: create_map(df_home))
+        medidas.medir(f"mapa/html_mapa/{cenario}", lambda: html_mapa(df_home))
+        medidas.medir(f"mapa/camada_grade/{cenario}", lambda: camada_grade(grade, df1, 2, mascara_home))
+        if len(df_home) <= LIMITE_MAPA_DETALHADO:
+            medidas.medir(f"mapa/create_map_detalhado/{cenario}", lambda: create_map(df_home, "detalhado"))
+
+    # Páginas inteiras (filtros padrão), com o AppTest do Streamlit: inclui os widgets e a
+    # serialização dos gráficos, sem navegador
+    if paginas:
+        from streamlit.testing.v1 import AppTest
+
+        for pagina in ("Home.py", "pages/1_paises.py", "pages/2_cidades.py", "pages/3_restaurantes.py"):
+            def rodar():
+                teste = AppTest.from_file(str(RAIZ / pagina), default_timeout=3600).run()
+                if teste.exception:
+                    raise RuntimeError(f"{pagina}: {teste.exception[0].value}")
+
+            rodar()
+            medidas.medir(f"paginas/{Path(pagina).stem}/todos", rodar)
+
+    return {
+        "csv": str(CAMINHO_CSV),
+        "restaurantes": len(df1),
+        "pares_culinaria": len(ponte),
+        "carga_inicial_ms": round(primeira, 3),
+        "snapshot_existia": snapshot_existia,
+        "pico_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "medidas": dict(medidas),
+    }
+
+# ==================================================================================================================================================================#
+#                                                                     ESCALAS E RELATÓRIO
+# ==================================================================================================================================================================#
+def preparar_csv(escala, pasta):
+    ''' CSV da escala: o zomato.csv na escala 1, base sintética (utils.sintetico) nas demais,
+        gerada uma vez e reaproveitada nas próximas execuções.
+    '''
+    import pandas as pd
+
+    if escala == 1:
+        return CAMINHO_CSV
+
+    caminho = Path(pasta) / f"zomato_sintetico_x{escala}.csv"
+    if not caminho.exists():
+        print(f"Gerando {caminho}...", file=sys.stderr)
+        Path(pasta).mkdir(parents=True, exist_ok=True)
+        temporario = caminho.with_name(caminho.name + ".tmp")
+        base = pd.read_csv(CAMINHO_CSV)
+        sintetico.gerar_csv(temporario, escala * len(base), base=base)
+        os.replace(temporario, caminho)
+    return caminho
+
+def ambiente():
+    ''' Versões e máquina, para saber se dois resultados são comparáveis. '''
+    import pandas as pd
+    import pyarrow
+    import streamlit
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=RAIZ, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "pyarrow": pyarrow.__version__,
+        "streamlit": streamlit.__version__,
+        "plataforma": platform.platform(),
+        "nucleos": os.cpu_count(),
+        "motor": os.environ.get("ZOMATO_MOTOR", "pandas"),
+    }
+
+def comparar(atual, anterior, limite=LIMITE_REGRESSAO):
+    ''' Medidas cujo p50 ficou mais de "limite" vezes (e mais de DIFERENCA_MINIMA_MS) acima
+        do resultado anterior.
+
+        Retorno: Lista de (escala, medida, p50 anterior, p50 atual)
+    '''
+    regressoes = []
+    for escala, resultado in atual["escalas"].items():
+        medidas_anteriores = anterior.get("escalas", {}).get(escala, {}).get("medidas", {})
+        for nome, medida in resultado["medidas"].items():
+            antes = medidas_anteriores.get(nome)
+            if antes and medida["p50_ms"] > limite * antes["p50_ms"] and medida["p50_ms"] - antes["p50_ms"] > DIFERENCA_MINIMA_MS:
+                regressoes.append((escala, nome, antes["p50_ms"], medida["p50_ms"]))
+    return regressoes
+
+# ==================================================================================================================================================================#
+#                                                                     EXECUÇÃO
+# ==================================================================================================================================================================#
+if __name__ == "__main__":
+    # Uso: python benchmarks/desempenho.py [--escalas 1 10 100 1000] [--repeticoes 20] [--saida desempenho.json] [--comparar anterior.json]
+    # A escala 1000x tem ~7 milhões de restaurantes: o CSV gerado ocupa alguns GB e a execução leva horas
+    parser = argparse.ArgumentParser(description="p50/p95 e pico de memória de carga, filtros, agregações, gráficos, mapa e páginas")
+    parser.add_argument("--escalas", type=int, nargs="+", default=list(ESCALAS), help="1 = zomato.csv, N = base sintética com N vezes as linhas dele")
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES)
+    parser.add_argument("--sem-paginas", action="store_true", help="não mede as páginas inteiras com o AppTest")
+    parser.add_argument("--pasta", type=Path, default=PASTA_DADOS, help="onde ficam os CSVs sintéticos e os snapshots deles")
+    parser.add_argument("--saida", type=Path, default=Path("desempenho.json"))
+    parser.add_argument("--comparar", type=Path, help="resultado anterior; sai com código 1 se houver regressão")
+    parser.add_argument("--limite", type=float, default=LIMITE_REGRESSAO, help="razão de p50 considerada regressão no --comparar")
+    parser.add_argument("--interno", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        # Processo de uma escala: o CSV vem em ZOMATO_CSV e o resultado sai no stdout
+        json.dump(executar(args.repeticoes, not args.sem_paginas), sys.stdout)
+        sys.exit(0)
+
+    resultado = {"ambiente": ambiente(), "escalas": {}}
+    for escala in args.escalas:
+        caminho = preparar_csv(escala, args.pasta)
+        print(f"Escala {escala}x: {caminho}", file=sys.stderr)
+
+        # Os avisos do Streamlit fora do "streamlit run" (sem ScriptRunContext) só poluem a saída
+        ambiente_escala = {"STREAMLIT_LOGGER_LEVEL": "error", **os.environ, "ZOMATO_CSV": str(caminho)}
+        comando = [sys.executable, str(Path(__file__).resolve()), "--interno", "--repeticoes", str(args.repeticoes)]
+        if args.sem_paginas:
+            comando.append("--sem-paginas")
+        processo = subprocess.run(comando, cwd=RAIZ, env=ambiente_escala, stdout=subprocess.PIPE, text=True, check=True)
+        resultado["escalas"][str(escala)] = json.loads(processo.stdout)
+
+    args.saida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Resultado em {args.saida}", file=sys.stderr)
+
+    if args.comparar:
+        regressoes = comparar(resultado, json.loads(args.comparar.read_text(encoding="utf-8")), args.limite)
+        for escala, nome, antes, depois in regressoes:
+            print(f"REGRESSÃO {escala}x {nome}: p50 {antes:.2f} -> {depois:.2f} ms ({depois / antes:.2f}x)", file=sys.stderr)
+        sys.exit(1 if regressoes else 0)
@@ -0,0 +1,74 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import sintetico  # noqa: E402
+from utils.blocos import limpar_em_blocos  # noqa: E402
+from utils.paralelo import limpar_em_paralelo  # noqa: E402
+
+import pyarrow.feather as feather  # noqa: E402
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+CAMINHO_CSV = Path(__file__).resolve().parent.parent / "dataset" / "zomato.csv"
+
+# ==================================================================================================================================================================#
+#                                                                     MEDIÇÃO
+# ==================================================================================================================================================================#
+def _destino(pasta, nome):
+    return {frame: Path(pasta) / f"{nome}_{frame}.feather" for frame in ("limpo", "ponte", "excluidos")}
+
+def _mesmos_arquivos(a, b):
+    return all(feather.read_table(a[frame]).equals(feather.read_table(b[frame])) for frame in a)
+
+def medir(caminho_csv, processos, pasta):
+    ''' Tempo da limpeza em blocos (referência) e da limpeza em paralelo com cada quantidade de
+        processos, conferindo que todas gravam exatamente os mesmos arquivos.
+    '''
+    referencia = _destino(pasta, "blocos")
+    inicio = time.perf_counter()
+    limpar_em_blocos(caminho_csv, referencia)
+    base = time.perf_counter() - inicio
+    print(f"{'blocos':>10}  {base:8.2f}s")
+
+    for quantidade in processos:
+        destino = _destino(pasta, f"paralelo_{quantidade}")
+        inicio = time.perf_counter()
+        limpar_em_paralelo(caminho_csv, destino, quantidade)
+        tempo = time.perf_counter() - inicio
+
+        igual = "igual" if _mesmos_arquivos(referencia, destino) else "DIFERENTE"
+        print(f"{quantidade:>7} pr  {tempo:8.2f}s  speedup {base / tempo:5.2f}x  {igual}")
+
+# ==================================================================================================================================================================#
+#                                                                     EXECUÇÃO
+# ==================================================================================================================================================================#
+if __name__ == "__main__":
+    # Uso: python benchmarks/limpeza_paralela.py [--escala 200] [--processos 1 2 4 8] [--csv arquivo.csv]
+    parser = argparse.ArgumentParser(description="Speedup da limpeza em paralelo (utils.paralelo)")
+    parser.add_argument("--escala", type=int, default=200, help="CSV sintético (utils.sintetico) com N vezes as linhas do zomato.csv")
+    parser.add_argument("--processos", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--csv", type=Path, help="CSV já existente, no lugar do sintético")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="zomato_bench_") as pasta:
+        caminho = args.csv
+        if caminho is None:
+            # Mesmo gerador e mesma semente do benchmarks/desempenho.py: a mesma escala gera o mesmo arquivo
+            caminho = Path(pasta) / f"zomato_sintetico_x{args.escala}.csv"
+            base = pd.read_csv(CAMINHO_CSV)
+            sintetico.gerar_csv(caminho, args.escala * len(base), base=base)
+
+        print(f"{caminho} ({os.path.getsize(caminho) / 1024 ** 2:,.0f} MB), {os.cpu_count()} núcleos")
+        medir(caminho, args.processos, pasta)
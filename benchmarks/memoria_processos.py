@@ -0,0 +1,120 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.limpeza_paralela import CAMINHO_CSV, gerar_csv  # noqa: E402
+from utils import snapshot  # noqa: E402
+from utils.blocos import gravar_snapshot_em_blocos  # noqa: E402
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Campos do /proc/<pid>/smaps_rollup medidos em cada processo (kB). Anonymous é a memória
+# alocada pelo próprio processo; as páginas do arquivo mapeado entram no Rss de todos os
+# processos, mas no Pss cada um conta só a sua fração
+CAMPOS = ("Rss", "Pss", "Anonymous")
+
+# ==================================================================================================================================================================#
+#                                                                     PROCESSOS
+# ==================================================================================================================================================================#
+def memoria(pid):
+    ''' Memória do processo em MB, lida do /proc/<pid>/smaps_rollup (só Linux). '''
+    valores = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for linha in f:
+            campo, *resto = linha.split()
+            if campo.rstrip(":") in CAMPOS:
+                valores[campo.rstrip(":")] = int(resto[0]) / 1024
+    return valores
+
+def _processo(caminho_csv, modo, pronto, fim):
+    ''' Executado em cada processo: carrega os dados como um servidor do dashboard e espera a
+        medição. No modo "vazio" só importa as bibliotecas (custo fixo de cada processo).
+    '''
+    import pandas as pd
+
+    from utils.ingestao import BaseIncremental
+    from utils.limpeza import limpar_base
+
+    pd.set_option("mode.copy_on_write", True)
+
+    inicio = time.perf_counter()
+    if modo != "vazio":
+        base = BaseIncremental(*snapshot.carregar(caminho_csv, limpar_base, modo == "compartilhado"))
+        base.frames
+    pronto.put((os.getpid(), time.perf_counter() - inicio))
+    fim.wait()
+
+def medir(caminho_csv, quantidade, modo):
+    ''' Sobe "quantidade" processos ao mesmo tempo no modo dado e mede cada um depois que todos
+        carregaram os dados.
+
+        Retorno: Lista de (segundos para carregar, dicionário de memória em MB) por processo
+    '''
+    contexto = multiprocessing.get_context("spawn")
+    pronto, fim = contexto.Queue(), contexto.Event()
+    processos = [contexto.Process(target=_processo, args=(caminho_csv, modo, pronto, fim)) for _ in range(quantidade)]
+    for processo in processos:
+        processo.start()
+
+    try:
+        carregados = [pronto.get() for _ in processos]
+        return [(tempo, memoria(pid)) for pid, tempo in carregados]
+    finally:
+        fim.set()
+        for processo in processos:
+            processo.join()
+
+def resumo(medidas, vazio=None):
+    ''' Médias por processo; com "vazio" também o quanto os dados somam a um processo vazio. '''
+    media = {campo: sum(m[campo] for _, m in medidas) / len(medidas) for campo in CAMPOS}
+    tempo = sum(t for t, _ in medidas) / len(medidas)
+    texto = f"carga {tempo:6.2f}s  " + "  ".join(f"{campo} {media[campo]:7.1f}" for campo in CAMPOS)
+    if vazio is not None:
+        texto += f"  dados: Pss {media['Pss'] - vazio['Pss']:7.1f}  Anonymous {media['Anonymous'] - vazio['Anonymous']:7.1f}"
+    return media, texto
+
+# ==================================================================================================================================================================#
+#                                                                     EXECUÇÃO
+# ==================================================================================================================================================================#
+if __name__ == "__main__":
+    # Uso: python benchmarks/memoria_processos.py [--copias 20] [--processos 1 2 4 8] [--csv arquivo.csv]
+    parser = argparse.ArgumentParser(description="Memória por processo com o snapshot copiado ou compartilhado (ZOMATO_MEMORIA_COMPARTILHADA)")
+    parser.add_argument("--copias", type=int, default=20, help="cópias do zomato.csv no CSV sintético")
+    parser.add_argument("--processos", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--csv", type=Path, help="CSV já existente, no lugar do sintético")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="zomato_bench_") as pasta:
+        caminho = args.csv
+        if caminho is None:
+            caminho = Path(pasta) / "sintetico.csv"
+            if args.copias > 1:
+                gerar_csv(caminho, args.copias, textos_unicos=True)
+            else:
+                shutil.copyfile(CAMINHO_CSV, caminho)
+
+        # O snapshot é construído antes, fora da medição (no deploy quem faz isso é o primeiro processo)
+        if not snapshot.snapshot_valido(caminho):
+            gravar_snapshot_em_blocos(caminho)
+        tamanho = sum(os.path.getsize(snapshot.caminhos_snapshot(caminho)[nome]) for nome in snapshot.FRAMES)
+        print(f"{caminho} ({os.path.getsize(caminho) / 1024 ** 2:,.0f} MB de CSV, {tamanho / 1024 ** 2:,.0f} MB de snapshot)")
+        print("valores médios por processo, em MB (Pss divide as páginas compartilhadas entre os processos)")
+
+        vazio, texto = resumo(medir(caminho, 1, "vazio"))
+        print(f"{'vazio':>13} {1:>3} pr  {texto}")
+
+        for modo in ("copia", "compartilhado"):
+            for quantidade in args.processos:
+                _, texto = resumo(medir(caminho, quantidade, modo), vazio)
+                print(f"{modo:>13} {quantidade:>3} pr  {texto}")
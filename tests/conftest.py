@@ -0,0 +1,27 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# ==================================================================================================================================================================#
+#                                                                     MARCADORES
+# ==================================================================================================================================================================#
+def pytest_addoption(parser):
+    parser.addoption("--lento", action="store_true", help="roda também os testes marcados como lento (ou ZOMATO_TESTES_LENTOS=1)")
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "lento: testes com bases sintéticas grandes, pulados sem --lento")
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--lento") or os.environ.get("ZOMATO_TESTES_LENTOS") == "1":
+        return
+    pular = pytest.mark.skip(reason="teste lento: use --lento ou ZOMATO_TESTES_LENTOS=1")
+    for item in items:
+        if "lento" in item.keywords:
+            item.add_marker(pular)
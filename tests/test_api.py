@@ -0,0 +1,45 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import hashlib
+import json
+
+import pandas as pd
+from tornado.testing import AsyncHTTPTestCase
+
+from utils.api import ServicoMetricas, criar_app
+from utils.cache import CacheLRU
+from utils.consultas import MotorPandas
+from utils.data import CAMINHO_CSV
+from utils.ingestao import BaseIncremental
+from utils.limpeza import limpar_base
+
+# ==================================================================================================================================================================#
+#                                                                     TESTES
+# ==================================================================================================================================================================#
+class TesteCacheHTTP(AsyncHTTPTestCase):
+    ''' Cabeçalhos de cache das rotas: métricas revalidam pelo ETag, o status nunca é guardado. '''
+
+    def get_app(self):
+        self.servico = ServicoMetricas(BaseIncremental(*limpar_base(pd.read_csv(CAMINHO_CSV))), MotorPandas(), CacheLRU(max_itens=64))
+        return criar_app(self.servico)
+
+    def test_metrica_responde_304_com_o_mesmo_etag(self):
+        resposta = self.fetch("/api/geral?paises=India")
+        self.assertEqual(resposta.code, 200)
+        etag = resposta.headers["Etag"]
+
+        revalidada = self.fetch("/api/geral?paises=India", headers={"If-None-Match": etag})
+        self.assertEqual(revalidada.code, 304)
+
+    def test_status_sem_etag(self):
+        resposta = self.fetch("/api/status")
+        self.assertEqual(resposta.code, 200)
+        self.assertEqual(resposta.headers["Cache-Control"], "no-store")
+        self.assertNotIn("Etag", resposta.headers)
+
+        # Mesmo com o If-None-Match que o tornado calcularia para o corpo anterior, o status volta inteiro
+        etag = f'"{hashlib.sha1(resposta.body).hexdigest()}"'
+        revalidada = self.fetch("/api/status", headers={"If-None-Match": etag})
+        self.assertEqual(revalidada.code, 200)
+        self.assertEqual(json.loads(revalidada.body)["versao"], 0)
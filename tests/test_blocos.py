@@ -0,0 +1,85 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import paralelo
+from utils.blocos import limpar_em_blocos
+from utils.data import CAMINHO_CSV
+from utils.limpeza import limpar_base
+from utils.sintetico import PerfilZomato
+
+feather = pytest.importorskip("pyarrow.feather")
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# (linhas sintéticas, linhas por bloco, intervalos de bytes): blocos e intervalos pequenos
+# para que duplicatas e campos com quebra de linha caiam nas fronteiras
+PEQUENO = (3_000, 97, 8)
+GRANDE = (300_000, 20_000, 16)
+
+PROCESSOS = 3
+
+# ==================================================================================================================================================================#
+#                                                                     AUXILIARES
+# ==================================================================================================================================================================#
+@pytest.fixture(scope="module")
+def zomato():
+    return pd.read_csv(CAMINHO_CSV)
+
+def gravar_csv(zomato, caminho, linhas, semente=0):
+    ''' CSV sintético (utils.sintetico) com os casos difíceis da leitura por partes:
+        - endereços entre aspas com quebras de linha
+        - linhas repetidas longe da primeira ocorrência (em outros blocos e intervalos)
+        - o outlier de preço da Austrália no meio do arquivo
+    '''
+    gerador = np.random.default_rng(semente)
+    df = PerfilZomato(zomato).gerar(linhas, gerador)[zomato.columns]
+
+    quebras = gerador.random(len(df)) < 0.5
+    df.loc[quebras, "Address"] = df.loc[quebras, "Address"] + '\n"Bloco" 2,\nfundos'
+
+    repetidas = df.iloc[gerador.integers(0, len(df) // 3, len(df) // 20)]
+    australia = zomato[zomato["Country Code"] == 14]
+    outlier = australia.loc[[australia["Average Cost for two"].idxmax()]]
+
+    meio = len(df) // 2
+    df = pd.concat([df.iloc[:meio], outlier, df.iloc[meio:], repetidas], ignore_index=True)
+    df.to_csv(caminho, index=False)
+
+def ler_destino(destino):
+    return tuple(feather.read_table(destino[nome]).to_pandas() for nome in ("limpo", "ponte", "excluidos"))
+
+def conferir_construtores(zomato, pasta, monkeypatch, linhas, linhas_por_bloco, quantidade):
+    caminho = pasta / "sintetico.csv"
+    gravar_csv(zomato, caminho, linhas)
+
+    # Mais intervalos que processos: o tamanho máximo de cada intervalo é que define a quantidade
+    monkeypatch.setattr(paralelo, "TAMANHO_INTERVALO_MB", caminho.stat().st_size / quantidade / 1024 ** 2)
+    _, intervalos = paralelo.intervalos_csv(caminho, quantidade)
+    assert len(intervalos) >= 3
+
+    esperado = limpar_base(pd.read_csv(caminho))
+    assert len(esperado[2]) == 1
+
+    for nome, construir in (
+        ("blocos", lambda destino: limpar_em_blocos(caminho, destino, linhas_por_bloco)),
+        ("paralelo", lambda destino: paralelo.limpar_em_paralelo(caminho, destino, PROCESSOS, linhas_por_bloco)),
+    ):
+        destino = {frame: pasta / f"{nome}_{frame}.feather" for frame in ("limpo", "ponte", "excluidos")}
+        assert construir(destino) == len(esperado[0])
+        for obtido, frame in zip(ler_destino(destino), esperado):
+            pd.testing.assert_frame_equal(obtido, frame)
+
+# ==================================================================================================================================================================#
+#                                                                     TESTES
+# ==================================================================================================================================================================#
+def test_blocos_e_paralelo_iguais_ao_limpar_base(zomato, tmp_path, monkeypatch):
+    conferir_construtores(zomato, tmp_path, monkeypatch, *PEQUENO)
+
+@pytest.mark.lento
+def test_blocos_e_paralelo_iguais_ao_limpar_base_grande(zomato, tmp_path, monkeypatch):
+    conferir_construtores(zomato, tmp_path, monkeypatch, *GRANDE)
@@ -0,0 +1,64 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import pandas as pd
+import pytest
+
+from utils.agregados import CONSULTA_CULINARIAS_CIDADE, CONSULTA_CUSTO_CIDADE, CONSULTAS_CIDADES, aplicar_mascara
+from utils.consultas import Consulta, MotorDuckDB, MotorPandas
+from utils.culinarias import filtrar_ponte, juntar
+from utils.data import CAMINHO_CSV
+from utils.indices import IndiceFiltros
+from utils.limpeza import limpar_dados
+
+pytest.importorskip("duckdb")
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Consultas sobre os restaurantes: as da Visão Cidades, o custo médio e as que só a API faz
+# (sem limite, crescente, soma de reais)
+CONSULTAS = {
+    **CONSULTAS_CIDADES,
+    "custo": CONSULTA_CUSTO_CIDADE,
+    "votos_crescente": Consulta(["country_name"], "votes", "mean", crescente=True),
+    "votos_top": Consulta(["country_name"], "votes", "sum", limite=3),
+    "custo_total": Consulta(["city"], "average_cost_for_two_real", "sum"),
+}
+
+FILTROS = [
+    {},
+    {"paises": ["India", "Brazil"]},
+    {"paises": ["India"], "culinarias": ["North Indian", "Chinese"], "preco": (10.0, 100.0)},
+]
+
+# ==================================================================================================================================================================#
+#                                                                     TESTES
+# ==================================================================================================================================================================#
+@pytest.fixture(scope="module")
+def base():
+    df1, ponte = limpar_dados(pd.read_csv(CAMINHO_CSV))
+    return df1, ponte, IndiceFiltros(df1, ponte)
+
+@pytest.fixture(scope="module")
+def motores():
+    return MotorPandas(), MotorDuckDB()
+
+@pytest.mark.parametrize("filtros", FILTROS, ids=str)
+@pytest.mark.parametrize("nome", list(CONSULTAS))
+def test_duckdb_igual_ao_pandas(base, motores, filtros, nome):
+    # Resultado e ordem dos empates idênticos, sem tolerância
+    df1, _, indice = base
+    df = aplicar_mascara(df1, indice.mascara(**filtros))
+    pandas, duckdb = motores
+
+    pd.testing.assert_frame_equal(duckdb.executar(CONSULTAS[nome], df), pandas.executar(CONSULTAS[nome], df), check_exact=True)
+
+@pytest.mark.parametrize("filtros", FILTROS, ids=str)
+def test_culinarias_por_cidade_duckdb_igual_ao_pandas(base, motores, filtros):
+    df1, ponte, indice = base
+    mascara = indice.mascara(paises=filtros.get("paises"), preco=filtros.get("preco"))
+    pares = juntar(filtrar_ponte(ponte, mascara, filtros.get("culinarias")), df1, CONSULTA_CULINARIAS_CIDADE.grupos + ["cuisines"])
+    pandas, duckdb = motores
+
+    pd.testing.assert_frame_equal(duckdb.executar(CONSULTA_CULINARIAS_CIDADE, pares), pandas.executar(CONSULTA_CULINARIAS_CIDADE, pares), check_exact=True)
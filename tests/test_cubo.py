@@ -0,0 +1,91 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import pandas as pd
+import pytest
+
+from utils.agregados import CONSULTA_CULINARIAS_CIDADE, CONSULTA_CUSTO_CIDADE, CONSULTAS_CIDADES, MEDIDAS_POR_PAIS, aplicar_mascara
+from utils.consultas import MotorPandas
+from utils.cubo import CuboOLAP
+from utils.culinarias import filtrar_ponte, juntar
+from utils.data import CAMINHO_CSV
+from utils.indices import IndiceFiltros
+from utils.limpeza import limpar_dados
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Médias do cubo e do pandas podem diferir no último ulp (ver CuboOLAP)
+RTOL = 1e-12
+
+FILTROS = [
+    {},
+    {"paises": ["India", "Brazil"]},
+    {"preco": (20.0, 300.0)},
+    {"culinarias": ["Italian", "Pizza"]},
+    {"paises": ["India"], "culinarias": ["North Indian", "Chinese"], "preco": (10.0, 100.0)},
+]
+
+# ==================================================================================================================================================================#
+#                                                                     AUXILIARES
+# ==================================================================================================================================================================#
+@pytest.fixture(scope="module")
+def base():
+    df1, ponte = limpar_dados(pd.read_csv(CAMINHO_CSV))
+    filtros = [consulta.filtro for consulta in CONSULTAS_CIDADES.values() if consulta.filtro is not None]
+    return df1, ponte, IndiceFiltros(df1, ponte), CuboOLAP(df1, ponte, filtros)
+
+def linhas_filtradas(base, filtros):
+    ''' Restaurantes (sem o filtro de culinárias, como as células de restaurantes) e pares da
+        ponte filtrados pelo índice.
+    '''
+    df1, ponte, indice, _ = base
+    mascara = indice.mascara(paises=filtros.get("paises"), preco=filtros.get("preco"))
+    return aplicar_mascara(df1, mascara), filtrar_ponte(ponte, mascara, filtros.get("culinarias"))
+
+def conferir(obtido, esperado):
+    pd.testing.assert_frame_equal(obtido.reset_index(drop=True), esperado.reset_index(drop=True), check_dtype=False, check_categorical=False, rtol=RTOL)
+
+def por_chaves(df, chaves):
+    return df.sort_values(chaves, kind="stable").reset_index(drop=True)
+
+# ==================================================================================================================================================================#
+#                                                                     TESTES
+# ==================================================================================================================================================================#
+@pytest.mark.parametrize("filtros", FILTROS, ids=str)
+def test_agregar_igual_ao_groupby(base, filtros):
+    df1, _, _, cubo = base
+    fatia = cubo.fatia(**filtros)
+    restaurantes, pares = linhas_filtradas(base, filtros)
+
+    esperado = restaurantes.groupby("country_name", observed=True).agg(**MEDIDAS_POR_PAIS).reset_index()
+    conferir(cubo.agregar(["country_name"], MEDIDAS_POR_PAIS, fatia), esperado)
+
+    medidas = {"nota": ("aggregate_rating", "mean"), "votos": ("votes", "sum"), "pares": ("aggregate_rating", "size")}
+    esperado = juntar(pares, df1, ["country_name", "cuisines", "aggregate_rating", "votes"]).groupby(["country_name", "cuisines"], observed=True).agg(**medidas).reset_index()
+    conferir(cubo.agregar(["country_name", "cuisines"], medidas, fatia), esperado)
+
+@pytest.mark.parametrize("filtros", FILTROS, ids=str)
+def test_executar_igual_ao_motor_pandas(base, filtros):
+    df1, _, _, cubo = base
+    fatia = cubo.fatia(**filtros)
+    restaurantes, pares = linhas_filtradas(base, filtros)
+    motor = MotorPandas()
+
+    for consulta in [*CONSULTAS_CIDADES.values(), CONSULTA_CUSTO_CIDADE]:
+        conferir(cubo.executar(consulta, fatia), motor.executar(consulta, restaurantes))
+
+    # Culinárias distintas por cidade: dos pares com o filtro de culinárias
+    pares = juntar(pares, df1, CONSULTA_CULINARIAS_CIDADE.grupos + ["cuisines"])
+    conferir(cubo.executar(CONSULTA_CULINARIAS_CIDADE, fatia), motor.executar(CONSULTA_CULINARIAS_CIDADE, pares))
+
+def test_custo_medio_sem_limite_igual_ao_groupby(base):
+    # Todas as cidades (sem o top 5), pela ordem das chaves: a diferença de ulp não troca grupos
+    _, _, _, cubo = base
+    fatia = cubo.fatia(preco=(20.0, 300.0))
+    restaurantes, _ = linhas_filtradas(base, {"preco": (20.0, 300.0)})
+    grupos = CONSULTA_CUSTO_CIDADE.grupos
+
+    esperado = restaurantes.groupby(grupos, observed=True)["average_cost_for_two_real"].mean().reset_index()
+    obtido = cubo.agregar(grupos, {"average_cost_for_two_real": ("average_cost_for_two_real", "mean")}, fatia)
+    conferir(por_chaves(obtido, grupos), por_chaves(esperado, grupos))
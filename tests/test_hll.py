@@ -0,0 +1,79 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.data import CAMINHO_CSV, ERRO_CONTAGEM
+from utils.hll import EsbocosDistintos, HyperLogLog
+from utils.indices import IndiceFiltros
+from utils.limpeza import limpar_dados
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+FILTROS = [
+    {},
+    {"culinarias": ["Italian", "Pizza"]},
+    {"culinarias": ["North Indian"]},
+    {"paises": ["India", "Brazil"]},
+    {"paises": ["India"], "cidades": ["New Delhi", "Gurgaon"], "culinarias": ["Chinese", "Fast Food", "Cafe"]},
+]
+
+# ==================================================================================================================================================================#
+#                                                                     AUXILIARES
+# ==================================================================================================================================================================#
+@pytest.fixture(scope="module")
+def base():
+    df1, ponte = limpar_dados(pd.read_csv(CAMINHO_CSV))
+    return df1, ponte, IndiceFiltros(df1, ponte)
+
+@pytest.fixture(scope="module")
+def esbocos(base):
+    df1, ponte, _ = base
+    return EsbocosDistintos(df1, ponte, erro=ERRO_CONTAGEM)
+
+def filtrados(base, filtros):
+    df1, _, indice = base
+    mascara = indice.mascara(**filtros)
+    return df1 if mascara is None else df1[mascara]
+
+# ==================================================================================================================================================================#
+#                                                                     TESTES
+# ==================================================================================================================================================================#
+@pytest.mark.parametrize("filtros", FILTROS, ids=str)
+@pytest.mark.parametrize("coluna", ["restaurant_id", "cuisines"])
+def test_uniao_das_particoes_igual_ao_esboco_dos_filtrados(base, esbocos, filtros, coluna):
+    # A união das partições selecionadas é o próprio esboço dos restaurantes filtrados: mesmos
+    # registros e mesma estimativa, sem dupla contagem de quem tem várias culinárias
+    selecao = esbocos.selecao(**filtros)
+    direto = HyperLogLog(esbocos.precisao).adicionar(filtrados(base, filtros)[coluna].to_numpy())
+
+    registros = esbocos.esbocos[coluna][slice(None) if selecao is None else selecao].max(axis=0)
+    np.testing.assert_array_equal(registros, direto.registros)
+    assert esbocos.estimar(coluna, selecao) == direto.estimar()
+
+@pytest.mark.parametrize("filtros", FILTROS, ids=str)
+def test_paises_e_cidades_exatos(base, esbocos, filtros):
+    df = filtrados(base, filtros)
+    selecao = esbocos.selecao(**filtros)
+
+    assert esbocos.contar("country_name", selecao) == df["country_name"].nunique()
+    assert esbocos.contar("city", selecao) == df["city"].nunique()
+
+def test_erro_padrao_no_zomato(base, esbocos):
+    # Com o ERRO_CONTAGEM padrão, as contagens da Home sem filtro ficam dentro do erro padrão anunciado
+    df1, _, _ = base
+    for coluna in ("restaurant_id", "cuisines"):
+        exato = df1[coluna].nunique()
+        assert abs(esbocos.estimar(coluna) - exato) <= esbocos.erro * exato, coluna
+
+def test_uniao_de_esbocos():
+    valores = np.arange(10_000)
+    a = HyperLogLog(12).adicionar(valores[:6_000])
+    b = HyperLogLog(12).adicionar(valores[4_000:])
+
+    np.testing.assert_array_equal(a.unir(b).registros, HyperLogLog(12).adicionar(valores).registros)
+    with pytest.raises(ValueError):
+        a.unir(HyperLogLog(10))
@@ -0,0 +1,149 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.data import CAMINHO_CSV
+from utils.indices import IndiceFiltros
+from utils.ingestao import BaseIncremental
+from utils.limpeza import limpar_base
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Filtros conferidos no IndiceFiltros da base incremental (inclui a culinária criada pelos deltas)
+FILTROS = [
+    {"paises": ["Brazil", "India"]},
+    {"cidades": ["New Delhi", "Aaa Nova Cidade"]},
+    {"culinarias": ["Italian", "Culinária Nova"]},
+    {"preco": (20.0, 300.0)},
+    {"paises": ["India"], "culinarias": ["North Indian"], "preco": (0.0, 50.0)},
+]
+
+# ==================================================================================================================================================================#
+#                                                                     AUXILIARES
+# ==================================================================================================================================================================#
+@pytest.fixture(scope="module")
+def zomato():
+    return pd.read_csv(CAMINHO_CSV)
+
+def upsert(df_bruto, delta):
+    ''' CSV equivalente ao upsert: as linhas dos ids do delta são trocadas pelas do delta, no fim. '''
+    return pd.concat([df_bruto[~df_bruto["Restaurant ID"].isin(delta["Restaurant ID"])], delta], ignore_index=True)
+
+def amostra_ids(df_bruto, quantidade, semente):
+    ''' Todas as linhas de "quantidade" restaurantes sorteados entre os que têm custo (os sem custo
+        já ficam fora da base e não contariam como atualizados).
+    '''
+    com_custo = df_bruto.loc[df_bruto["Average Cost for two"] != 0, "Restaurant ID"]
+    ids = com_custo.drop_duplicates().sample(quantidade, random_state=semente)
+    return df_bruto[df_bruto["Restaurant ID"].isin(ids)].drop_duplicates().copy()
+
+def conferir_reconstrucao(base, df_bruto):
+    ''' A versão publicada da base incremental é igual à limpeza completa do CSV equivalente:
+        df_limpo, ponte, outlier guardado e máscaras do IndiceFiltros.
+
+        As categorias da base incremental podem sobrar (valores do outlier ou de linhas que
+        saíram), então só os valores das colunas categóricas são comparados.
+    '''
+    df1, ponte = base.frames
+    esperado, ponte_esperada, excluidos = limpar_base(df_bruto)
+
+    pd.testing.assert_frame_equal(df1, esperado, check_categorical=False)
+    pd.testing.assert_frame_equal(
+        ponte.assign(cuisines=ponte["cuisines"].astype(str)),
+        ponte_esperada.assign(cuisines=ponte_esperada["cuisines"].astype(str)),
+    )
+    assert base.excluidos["restaurant_id"].tolist() == excluidos["restaurant_id"].tolist()
+
+    indice, indice_esperado = IndiceFiltros(df1, ponte), IndiceFiltros(esperado, ponte_esperada)
+    for filtros in FILTROS:
+        mascara, mascara_esperada = indice.mascara(**filtros), indice_esperado.mascara(**filtros)
+        assert (mascara is None) == (mascara_esperada is None), filtros
+        if mascara is not None:
+            np.testing.assert_array_equal(mascara, mascara_esperada, err_msg=str(filtros))
+
+# ==================================================================================================================================================================#
+#                                                                     TESTES
+# ==================================================================================================================================================================#
+def test_insercao(zomato):
+    # Restaurantes novos, um deles com culinária e cidade que a base não tem
+    delta = amostra_ids(zomato, 200, semente=4).drop_duplicates("Restaurant ID")
+    delta["Restaurant ID"] = np.arange(len(delta)) + 90_000_000
+    delta.loc[delta.index[:20], "Cuisines"] = "Italian, Culinária Nova"
+    delta.loc[delta.index[:5], "City"] = "Aaa Nova Cidade"
+
+    base = BaseIncremental(*limpar_base(zomato))
+    resumo = base.aplicar_delta(delta)
+
+    assert (resumo["inseridos"], resumo["atualizados"], resumo["removidos"]) == (200, 0, 0)
+    conferir_reconstrucao(base, upsert(zomato, delta))
+
+def test_atualizacao_e_remocao(zomato):
+    # Nota, custo e culinárias trocados; custo zero tira o restaurante da base
+    delta = amostra_ids(zomato, 100, semente=5)
+    delta["Aggregate rating"] = (5 - delta["Aggregate rating"]).round(1)
+    delta["Average Cost for two"] = delta["Average Cost for two"] * 2
+    delta["Cuisines"] = "Culinária Nova"
+    zerados = amostra_ids(zomato[~zomato["Restaurant ID"].isin(delta["Restaurant ID"])], 10, semente=6)
+    zerados["Average Cost for two"] = 0
+    delta = pd.concat([delta, zerados], ignore_index=True)
+
+    base = BaseIncremental(*limpar_base(zomato))
+    resumo = base.aplicar_delta(delta)
+
+    assert resumo["removidos"] == 10
+    conferir_reconstrucao(base, upsert(zomato, delta))
+
+def test_duplicatas_no_delta(zomato):
+    # A mesma linha duas vezes no delta e linhas idênticas às da base (upsert sem mudança)
+    iguais = amostra_ids(zomato, 30, semente=7)
+    novo = amostra_ids(zomato, 3, semente=10).drop_duplicates("Restaurant ID")
+    novo["Restaurant ID"] = [1, 2, 3]
+    delta = pd.concat([iguais, novo, novo, iguais.head(5)], ignore_index=True)
+
+    base = BaseIncremental(*limpar_base(zomato))
+    resumo = base.aplicar_delta(delta)
+
+    assert (resumo["inseridos"], resumo["atualizados"]) == (3, 30)
+    conferir_reconstrucao(base, upsert(zomato, delta))
+
+def test_votos_mudam_os_quartis(zomato):
+    # Votos muito maiores num grupo de restaurantes sobem o 3º quartil e a mediana: a recomendação
+    # dos restaurantes que não estão no delta também muda
+    delta = amostra_ids(zomato, 1500, semente=2)
+    delta["Votes"] = delta["Votes"] * 7 + 1000
+
+    base = BaseIncremental(*limpar_base(zomato))
+    anterior = base.frames[0]
+    recomendacao_anterior = anterior["recomendation"].copy()
+    resumo = base.aplicar_delta(delta)
+
+    assert resumo["quartis_recalculados"]
+    conferir_reconstrucao(base, upsert(zomato, delta))
+
+    df1 = base.frames[0]
+    fora_do_delta = ~df1["restaurant_id"].isin(delta["Restaurant ID"]).to_numpy()
+    mantidos = anterior.set_index("restaurant_id")["recomendation"].astype(str)
+    mudaram = mantidos.reindex(df1.loc[fora_do_delta, "restaurant_id"]).to_numpy() != df1.loc[fora_do_delta, "recomendation"].astype(str).to_numpy()
+    assert mudaram.any()
+
+    # A versão já publicada não muda (sessões no meio de um rerun continuam lendo a anterior)
+    pd.testing.assert_series_equal(anterior["recomendation"], recomendacao_anterior)
+
+def test_sincronizar_aplica_em_ordem_uma_vez(zomato, tmp_path):
+    insercao = amostra_ids(zomato, 50, semente=8).drop_duplicates("Restaurant ID")
+    insercao["Restaurant ID"] = np.arange(len(insercao)) + 91_000_000
+    votos = amostra_ids(upsert(zomato, insercao), 1500, semente=9)
+    votos["Votes"] = votos["Votes"] * 7 + 1000
+    insercao.to_csv(tmp_path / "001_insercao.csv", index=False)
+    votos.to_csv(tmp_path / "002_votos.csv", index=False)
+
+    base = BaseIncremental(*limpar_base(zomato))
+    assert base.sincronizar(tmp_path)
+    assert not base.sincronizar(tmp_path)
+    assert base.versao == 2
+
+    conferir_reconstrucao(base, upsert(upsert(zomato, insercao), votos))
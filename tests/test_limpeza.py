@@ -0,0 +1,133 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.data import CAMINHO_CSV
+from utils.limpeza import CLASSIFICACAO, COLORS, CONVERSOES, COUNTRIES, classificar_recomendacao, limpar_base
+from utils.sintetico import PerfilZomato
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Linhas sintéticas (utils.sintetico) somadas ao zomato.csv no teste lento: o 1 milhão de linhas
+# da expansão em que a limpeza vetorizada foi conferida (menos com ZOMATO_TESTE_LINHAS)
+LINHAS_EXPANSAO = int(os.environ.get("ZOMATO_TESTE_LINHAS", 1_000_000))
+
+# ==================================================================================================================================================================#
+#                                                                     ORÁCULO
+# ==================================================================================================================================================================#
+def limpeza_com_apply(df):
+    ''' Limpeza original do load_data, com a recomendação e a conversão linha a linha por
+        DataFrame.apply: é a referência do caminho vetorizado (utils.limpeza).
+
+        Retorno: Tupla (df1, df_culinaria) como no load_data original
+    '''
+    df1 = df.copy()
+    cols_to_drop = ["Locality Verbose", "Switch to order menu"]
+    df1 = df1.drop([c for c in cols_to_drop if c in df1.columns], axis=1)
+
+    df1.drop_duplicates(inplace=True)
+
+    df1.columns = df1.columns.str.lower().str.strip().str.replace(' ', '_')
+
+    df1["cuisines"] = df1["cuisines"].fillna("Not Informed")
+
+    valores_nulos = ['NaN', 'nan', 'None', 'none', 'NA', 'n/a', 'N/A', '', ' ']
+    df1.replace(valores_nulos, np.nan, inplace=True)
+    df1 = df1.loc[df1["average_cost_for_two"] != 0, :]
+
+    df1["country_name"] = df1["country_code"].map(COUNTRIES).copy()
+    df1["color"] = df1["rating_color"].map(COLORS).copy()
+    df1["price_type"] = df1["price_range"].map(CLASSIFICACAO).copy()
+
+    quantile_75 = df1["votes"].quantile(0.75)
+    mediana = df1["votes"].median()
+
+    def recomendacao(linha):
+        vote = linha["votes"]
+        rating = linha["aggregate_rating"]
+
+        if rating > 4 and vote > quantile_75:
+            return "muito recomendado"
+        elif (rating >= 4) or (rating >= 3 and vote >= mediana):
+            return "recomendado"
+        elif rating < 3:
+            return "pouco recomendado"
+        else:
+            return "Neutro"
+
+    df1["recomendation"] = df1.apply(recomendacao, axis=1).copy()
+
+    def conversao(linha):
+        moedas = linha["currency"]
+        valor = linha["average_cost_for_two"]
+
+        if moedas in CONVERSOES:
+            return valor * CONVERSOES[moedas]
+        else:
+            return None
+
+    df1["average_cost_for_two_real"] = df1.apply(conversao, axis=1).copy()
+
+    if "Australia" in df1["country_name"].values:
+        outlier = df1.loc[df1["country_name"] == "Australia", "average_cost_for_two_real"].idxmax()
+        df1 = df1.drop(outlier)
+
+    df_culinaria = df1.copy()
+    df_culinaria["cuisines"] = df_culinaria["cuisines"].astype(str).apply(lambda x: x.split(","))
+    df_culinaria = df_culinaria.explode("cuisines")
+    df_culinaria["cuisines"] = df_culinaria["cuisines"].str.strip()
+
+    return df1, df_culinaria
+
+def conferir_limpeza(df):
+    ''' Compara limpar_base (sem e com os tipos compactos) com o oráculo: mesmas linhas, colunas
+        e valores no df_limpo e os mesmos pares restaurante -> culinária na ponte.
+    '''
+    esperado, culinaria = limpeza_com_apply(df)
+    esperado = esperado.reset_index(drop=True)
+
+    df1, ponte, excluidos = limpar_base(df, compactar=False)
+    pd.testing.assert_frame_equal(df1, esperado)
+    # O outlier da Austrália sai do df_limpo e fica guardado nos excluídos
+    assert len(excluidos) == 1 and excluidos.loc[0, "country_name"] == "Australia"
+
+    # Os tipos compactos mudam a representação, não os valores
+    compacto, ponte_compacta, _ = limpar_base(df, compactar=True)
+    pd.testing.assert_frame_equal(compacto, esperado.astype(compacto.dtypes.to_dict()), check_categorical=False)
+
+    # Ponte: um par (posição do restaurante, culinária) por linha do explode original
+    posicoes = pd.Series(np.arange(len(esperado)), index=culinaria.index.unique())
+    pares = pd.DataFrame({"restaurante": posicoes.loc[culinaria.index].to_numpy(), "cuisines": culinaria["cuisines"].to_numpy()})
+    for atual in (ponte, ponte_compacta):
+        obtido = pd.DataFrame({"restaurante": atual["restaurante"].to_numpy(np.int64), "cuisines": atual["cuisines"].astype(str).to_numpy()})
+        pd.testing.assert_frame_equal(obtido, pares)
+
+# ==================================================================================================================================================================#
+#                                                                     TESTES
+# ==================================================================================================================================================================#
+@pytest.fixture(scope="module")
+def zomato():
+    return pd.read_csv(CAMINHO_CSV)
+
+def test_classificar_recomendacao_segue_a_ordem_do_if():
+    # Nota acima de 4 com poucos votos cai na segunda condição; nota 3 com poucos votos fica neutra
+    nota = np.array([4.5, 4.5, 4.0, 3.5, 3.5, 2.9, 3.0])
+    votos = np.array([100, 10, 0, 50, 10, 1000, 0])
+    esperado = ["muito recomendado", "recomendado", "recomendado", "recomendado", "Neutro", "pouco recomendado", "Neutro"]
+
+    assert classificar_recomendacao(nota, votos, quantil_75=80, mediana=50).tolist() == esperado
+
+def test_limpeza_igual_ao_apply_no_zomato(zomato):
+    conferir_limpeza(zomato)
+
+@pytest.mark.lento
+def test_limpeza_igual_ao_apply_na_base_expandida(zomato):
+    # zomato.csv mais restaurantes sintéticos no mesmo formato (duplicatas inclusas)
+    novos = PerfilZomato(zomato).gerar(LINHAS_EXPANSAO, np.random.default_rng(0))
+    conferir_limpeza(pd.concat([zomato, novos[zomato.columns]], ignore_index=True))
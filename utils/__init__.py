@@ -0,0 +1 @@
+""" Módulos compartilhados pelas páginas do dashboard (carregamento, limpeza e mapa). """
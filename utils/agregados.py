@@ -0,0 +1,223 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import numpy as np
+
+from utils.consultas import Consulta
+from utils.culinarias import culinarias_unicas_por, filtrar_ponte, juntar
+from utils.instrumentacao import instrumentar
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Rankings de somas e contagens por cidade da Visão Cidades (a página os tira das células do cubo
+# com rankings_cidades_cubo; a API executa as consultas direto no motor)
+CIDADE = ["city", "country_name"]
+CONSULTAS_CIDADES = {
+    "pedido_online": Consulta(CIDADE, "has_online_delivery", "sum", limite=5),
+    "reserva": Consulta(CIDADE, "has_table_booking", "sum", limite=5),
+    "entregas": Consulta(CIDADE, "is_delivering_now", "sum", limite=5),
+    "nota_acima": Consulta(["country_name", "city"], "aggregate_rating", "count", limite=5, filtro=("aggregate_rating", ">", 4)),
+    "nota_abaixo": Consulta(["country_name", "city"], "aggregate_rating", "count", limite=5, filtro=("aggregate_rating", "<", 2.5)),
+}
+CONSULTA_CULINARIAS_CIDADE = Consulta(CIDADE, "cuisines", "nunique", limite=5)
+CONSULTA_CUSTO_CIDADE = Consulta(CIDADE, "average_cost_for_two_real", "mean", limite=5)
+
+# Métricas por país da Visão Países (nome -> (coluna, agregação)), sem as culinárias, que vêm da ponte
+MEDIDAS_POR_PAIS = {
+    "cidades": ("city", "nunique"),
+    "restaurantes": ("restaurant_id", "count"),
+    "entregas": ("is_delivering_now", "sum"),
+    "reservas": ("has_table_booking", "sum"),
+    "votos": ("votes", "sum"),
+    "media_votos": ("votes", "mean"),
+    "nota_media": ("aggregate_rating", "mean"),
+    "preco_medio": ("average_cost_for_two_real", "mean"),
+}
+
+# ==================================================================================================================================================================#
+#                                                                     FILTROS
+# ==================================================================================================================================================================#
+@instrumentar("filtro")
+def aplicar_mascara(df1, mascara):
+    ''' Restaurantes da máscara (None = o próprio df_limpo, sem cópia). '''
+    return df1 if mascara is None else df1.take(np.flatnonzero(mascara))
+
+@instrumentar("filtro")
+def filtrar(df1, ponte, indice, paises=None, cidades=None, culinarias=None, preco=None):
+    ''' Aplica os filtros da sidebar pelo índice, sem varrer o df_limpo.
+
+        O filtro de culinárias vale de dois jeitos: a ponte só fica com os pares das culinárias
+        escolhidas (gráficos de culinária) e o df_limpo fica com os restaurantes que oferecem
+        alguma delas (gráficos gerais). Listas vazias ou None = todos.
+
+        Retorno: Tupla (máscara por restaurante ou None, df_limpo filtrado, ponte filtrada)
+    '''
+    mascara = indice.mascara(paises=paises, cidades=cidades, preco=preco)
+    ponte_filtrada = filtrar_ponte(ponte, mascara, culinarias)
+
+    mascara_culinarias = indice.mascara(culinarias=culinarias)
+    if mascara_culinarias is not None:
+        mascara = mascara_culinarias if mascara is None else mascara & mascara_culinarias
+
+    return mascara, aplicar_mascara(df1, mascara), ponte_filtrada
+
+# ==================================================================================================================================================================#
+#                                                                     MÉTRICAS GERAIS
+# ==================================================================================================================================================================#
+@instrumentar("agregacao")
+def metricas_gerais(df1):
+    ''' Métricas do topo da Home para o df_limpo filtrado. '''
+    return {
+        "restaurantes": int(df1["restaurant_id"].nunique()),
+        "paises": int(df1["country_name"].nunique()),
+        "cidades": int(df1["city"].nunique()),
+        "avaliacoes": int(df1["votes"].sum()),
+        "culinarias": int(df1["cuisines"].nunique()),
+    }
+
+@instrumentar("agregacao")
+def metricas_gerais_aproximadas(df1, esbocos, culinarias=None, mascara=None):
+    ''' metricas_gerais sem copiar as linhas filtradas: restaurantes e culinárias distintos pela
+        união dos esboços HyperLogLog (utils.hll) das partições das culinárias selecionadas, países
+        e cidades pelas próprias partições e as avaliações pela máscara dos filtros sobre o
+        df_limpo completo (None = sem filtro).
+
+        Vale só quando a máscara é "restaurantes com alguma das culinárias" (sem outro filtro por
+        restaurante, como faixa de preço ou busca por nome). Com as linhas filtradas já copiadas,
+        metricas_gerais dá a contagem exata.
+    '''
+    selecao = esbocos.selecao(culinarias=culinarias)
+    votos = df1["votes"].to_numpy()
+    return {
+        "restaurantes": esbocos.estimar("restaurant_id", selecao),
+        "paises": esbocos.contar("country_name", selecao),
+        "cidades": esbocos.contar("city", selecao),
+        "avaliacoes": int(votos.sum() if mascara is None else votos[mascara].sum()),
+        "culinarias": esbocos.estimar("cuisines", selecao),
+    }
+
+# ==================================================================================================================================================================#
+#                                                                     AGREGADO POR PAÍS
+# ==================================================================================================================================================================#
+@instrumentar("agregacao")
+def agregado_por_pais(df1, ponte, df_limpo):
+    ''' Calcula numa única passada todas as métricas por país usadas na Visão Países.
+
+        Parâmetros: df_limpo filtrado, ponte filtrada e df_limpo completo (para buscar o país
+                    de cada par da ponte)
+
+        Retorno: Data frame indexado por "country_name" com as colunas:
+                 cidades, restaurantes, culinarias, entregas, reservas, votos, media_votos,
+                 nota_media e preco_medio
+    '''
+    agregado = df1.groupby("country_name", observed=True).agg(**MEDIDAS_POR_PAIS)
+
+    culinarias = culinarias_unicas_por(ponte, df_limpo, ["country_name"]).set_index("country_name")["cuisines"]
+    agregado.insert(2, "culinarias", culinarias.reindex(agregado.index, fill_value=0))
+
+    return agregado
+
+# ==================================================================================================================================================================#
+#                                                                     CIDADES
+# ==================================================================================================================================================================#
+@instrumentar("agregacao")
+def culinarias_por_cidade(ponte, df1, motor):
+    ''' 5 cidades com mais culinárias distintas, a partir da ponte filtrada. '''
+    pares = juntar(ponte, df1, ["city", "country_name", "cuisines"])
+    return motor.executar(CONSULTA_CULINARIAS_CIDADE, pares)
+
+@instrumentar("agregacao")
+def custo_por_cidade(df1, motor):
+    ''' 5 cidades com maior custo médio para dois em R$, a partir do df_limpo filtrado. '''
+    return motor.executar(CONSULTA_CUSTO_CIDADE, df1)
+
+@instrumentar("agregacao")
+def rankings_cidades(df1, motor):
+    ''' Resultado de cada consulta de CONSULTAS_CIDADES sobre o df_limpo filtrado. '''
+    return {nome: motor.executar(consulta, df1) for nome, consulta in CONSULTAS_CIDADES.items()}
+
+# ==================================================================================================================================================================#
+#                                                                     CULINÁRIAS E RESTAURANTES
+# ==================================================================================================================================================================#
+@instrumentar("agregacao")
+def pares_culinarias(ponte, df1):
+    ''' Nota e votos de cada par (restaurante, culinária) da ponte filtrada. '''
+    return juntar(ponte, df1, ["restaurante", "cuisines", "aggregate_rating", "votes"])
+
+@instrumentar("agregacao")
+def topo_culinarias(pares, n=5):
+    ''' As n culinárias de maior nota média (empate: mais votos), com a soma dos votos. '''
+    por_culinaria = pares.groupby("cuisines", observed=True).agg({"aggregate_rating": "mean", "votes": "sum"})
+    return por_culinaria.sort_values(["aggregate_rating", "votes"], ascending=[False, False]).head(n).reset_index()
+
+@instrumentar("agregacao")
+def melhores_culinarias(topo, melhores, mascara, df1):
+    ''' Culinárias do topo (topo_culinarias), cada uma com o seu melhor restaurante entre os
+        da máscara.
+
+        Retorno: Data frame com cuisines, aggregate_rating, votes e restaurant_name,
+                 country_name e city do melhor restaurante
+    '''
+
+    # Melhor restaurante de cada culinária do topo, direto das listas pré-ordenadas por (nota, votos)
+    melhor = melhores.melhores(1, mascara, topo["cuisines"].tolist())
+    melhor = dict(zip(melhor["cuisines"], melhor["restaurante"]))
+    posicoes = np.array([melhor[culinaria] for culinaria in topo["cuisines"]], dtype=np.int64)
+    restaurantes = df1[["restaurant_name", "country_name", "city"]].take(posicoes).reset_index(drop=True)
+
+    return topo.join(restaurantes)
+
+@instrumentar("agregacao")
+def ranking_culinarias(pares):
+    ''' Nota média de cada culinária, na ordem das categorias. '''
+    return pares.groupby("cuisines", observed=True).agg({"aggregate_rating": "mean"}).reset_index()
+
+@instrumentar("agregacao")
+def recomendacoes_por_cidade(df1):
+    ''' Quantidade de restaurantes por país, cidade e tipo de recomendação. '''
+    return df1.groupby(["country_name", "city", "recomendation"], observed=True).size().reset_index(name="count")
+
+# ==================================================================================================================================================================#
+#                                                                     CUBO OLAP
+# ==================================================================================================================================================================#
+# Os mesmos agregados a partir de uma fatia do cubo (utils.cubo), somando células em vez de restaurantes
+
+@instrumentar("agregacao")
+def agregado_por_pais_cubo(cubo, fatia):
+    ''' agregado_por_pais pelas células do cubo. A fatia não pode restringir as culinárias dos
+        restaurantes (ver CuboOLAP.restringe_culinarias).
+    '''
+    agregado = cubo.agregar(["country_name"], MEDIDAS_POR_PAIS, fatia).set_index("country_name")
+
+    culinarias = cubo.agregar(["country_name"], {"cuisines": ("cuisines", "nunique")}, fatia).set_index("country_name")["cuisines"]
+    agregado.insert(2, "culinarias", culinarias.reindex(agregado.index, fill_value=0))
+
+    return agregado
+
+@instrumentar("agregacao")
+def rankings_cidades_cubo(cubo, fatia):
+    ''' Culinárias distintas ("culinarias"), custo médio ("custo") e cada consulta de
+        CONSULTAS_CIDADES por cidade, pelas células do cubo.
+    '''
+    return {
+        "culinarias": cubo.executar(CONSULTA_CULINARIAS_CIDADE, fatia),
+        "custo": cubo.executar(CONSULTA_CUSTO_CIDADE, fatia),
+        **{nome: cubo.executar(consulta, fatia) for nome, consulta in CONSULTAS_CIDADES.items()},
+    }
+
+@instrumentar("agregacao")
+def topo_culinarias_cubo(cubo, fatia, n=5):
+    ''' topo_culinarias pelas células de pares do cubo. '''
+    por_culinaria = cubo.agregar(["cuisines"], {"aggregate_rating": ("aggregate_rating", "mean"), "votes": ("votes", "sum")}, fatia)
+    return por_culinaria.sort_values(["aggregate_rating", "votes"], ascending=[False, False]).head(n).reset_index(drop=True)
+
+@instrumentar("agregacao")
+def ranking_culinarias_cubo(cubo, fatia):
+    ''' ranking_culinarias pelas células de pares do cubo. '''
+    return cubo.agregar(["cuisines"], {"aggregate_rating": ("aggregate_rating", "mean")}, fatia)
+
+@instrumentar("agregacao")
+def recomendacoes_por_cidade_cubo(cubo, fatia):
+    ''' recomendacoes_por_cidade pelas células de restaurantes do cubo. '''
+    return cubo.agregar(["country_name", "city", "recomendation"], {"count": ("restaurant_id", "size")}, fatia)
@@ -0,0 +1,222 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import asyncio
+import hashlib
+import json
+import threading
+
+import tornado.ioloop
+import tornado.web
+
+from utils import agregados
+from utils.cache import CacheLRU, chave_filtros
+from utils.consultas import criar_motor
+from utils.culinarias import MelhoresPorCulinaria
+from utils.data import CACHE_MB, MOTOR_CONSULTAS, PASTA_NOVOS, PORTA_API, carregar_base, versao_dados
+from utils.indices import IndiceFiltros
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Filtros de lista aceitos em todas as rotas, repetidos na query string: ?paises=India&paises=Brazil.
+# O preço vem em preco_min e preco_max (R$, extremos inclusos)
+FILTROS_LISTA = ("paises", "cidades", "culinarias")
+
+# Intervalo entre as verificações de PASTA_NOVOS; as requisições só leem a versão já publicada
+INTERVALO_SINCRONIZAR_S = 2
+
+# ==================================================================================================================================================================#
+#                                                                     MÉTRICAS
+# ==================================================================================================================================================================#
+def registros(df):
+    ''' Linhas do data frame como lista de dicionários com tipos do Python (NaN vira None). '''
+    df = df.astype(object)
+    return df.where(df.notna(), None).to_dict(orient="records")
+
+def _geral(dados, mascara, df_filtrado, ponte_filtrada):
+    return agregados.metricas_gerais(df_filtrado)
+
+def _paises(dados, mascara, df_filtrado, ponte_filtrada):
+    return registros(agregados.agregado_por_pais(df_filtrado, ponte_filtrada, dados["df1"]).reset_index())
+
+def _cidades(dados, mascara, df_filtrado, ponte_filtrada):
+    motor = dados["motor"]
+    resultado = {
+        "culinarias": agregados.culinarias_por_cidade(ponte_filtrada, dados["df1"], motor),
+        "custo": agregados.custo_por_cidade(df_filtrado, motor),
+        **agregados.rankings_cidades(df_filtrado, motor),
+    }
+    return {nome: registros(tabela) for nome, tabela in resultado.items()}
+
+def _culinarias(dados, mascara, df_filtrado, ponte_filtrada):
+    pares = agregados.pares_culinarias(ponte_filtrada, dados["df1"])
+    ranking = agregados.ranking_culinarias(pares).sort_values("aggregate_rating", ascending=False, kind="stable")
+    return {
+        "melhores": registros(agregados.melhores_culinarias(agregados.topo_culinarias(pares), dados["melhores"], mascara, dados["df1"])),
+        "ranking": registros(ranking),
+    }
+
+def _recomendacoes(dados, mascara, df_filtrado, ponte_filtrada):
+    return registros(agregados.recomendacoes_por_cidade(df_filtrado))
+
+# Rotas da API: nome -> função (dados, máscara, df filtrado, ponte filtrada) -> valor em JSON
+METRICAS = {
+    "geral": _geral,
+    "paises": _paises,
+    "cidades": _cidades,
+    "culinarias": _culinarias,
+    "recomendacoes": _recomendacoes,
+}
+
+# ==================================================================================================================================================================#
+#                                                                     SERVIÇO
+# ==================================================================================================================================================================#
+class ServicoMetricas:
+    ''' Dados, índices e respostas prontas da API, sem sessão do Streamlit.
+
+        Usa a mesma base (BaseIncremental), os mesmos índices e as mesmas funções de
+        utils.agregados que as páginas. Cada resposta é guardada já serializada, com o ETag,
+        pela chave (rota, versão da base, filtros normalizados); um arquivo novo aplicado muda
+        a versão, e as respostas antigas deixam de ser encontradas e saem do cache pelo LRU.
+    '''
+
+    def __init__(self, base, motor, cache):
+        self.base = base
+        self.motor = motor
+        self.cache = cache
+        self._derivados = (None, None)
+        self._lock = threading.Lock()
+
+    def sincronizar(self):
+        return self.base.sincronizar(PASTA_NOVOS)
+
+    def versao(self):
+        return versao_dados(self.base.frames[0])
+
+    def _dados(self):
+        ''' Dataframes da versão atual com o índice dos filtros e as listas de melhores
+            restaurantes, construídos uma vez por versão.
+        '''
+        df1, ponte = self.base.frames
+        with self._lock:
+            versao, derivados = self._derivados
+            if versao != versao_dados(df1):
+                derivados = IndiceFiltros(df1, ponte), MelhoresPorCulinaria(df1, ponte)
+                self._derivados = (versao_dados(df1), derivados)
+
+        indice, melhores = derivados
+        return {"df1": df1, "ponte": ponte, "indice": indice, "melhores": melhores, "motor": self.motor}
+
+    def em_cache(self, rota, filtros):
+        ''' Resposta (corpo, etag) já calculada, ou None. Não calcula nada: pode rodar no loop. '''
+        return self.cache.get(("api", rota, self.versao(), chave_filtros(**filtros)))
+
+    def responder(self, rota, filtros):
+        ''' Aplica os filtros, calcula a métrica da rota, serializa e guarda a resposta.
+
+            Retorno: Tupla (corpo JSON em bytes, ETag)
+        '''
+        dados = self._dados()
+        versao = versao_dados(dados["df1"])
+
+        filtrado = agregados.filtrar(dados["df1"], dados["ponte"], dados["indice"], **filtros)
+        corpo = json.dumps(
+            {"versao": versao, "dados": METRICAS[rota](dados, *filtrado)},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        resposta = corpo, '"' + hashlib.blake2b(corpo, digest_size=16).hexdigest() + '"'
+
+        self.cache.set(("api", rota, versao, chave_filtros(**filtros)), resposta)
+        return resposta
+
+# ==================================================================================================================================================================#
+#                                                                     HTTP
+# ==================================================================================================================================================================#
+def filtros_da_requisicao(handler):
+    ''' Lê os filtros da query string. Listas ausentes = todos; preço sem mínimo ou máximo fica aberto. '''
+    filtros = {nome: handler.get_query_arguments(nome) for nome in FILTROS_LISTA}
+
+    minimo = handler.get_query_argument("preco_min", None)
+    maximo = handler.get_query_argument("preco_max", None)
+    if minimo is not None or maximo is not None:
+        try:
+            filtros["preco"] = (float(minimo) if minimo else float("-inf"), float(maximo) if maximo else float("inf"))
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="preco_min e preco_max devem ser números")
+
+    return filtros
+
+class MetricaHandler(tornado.web.RequestHandler):
+    ''' GET /api/<rota>: métrica em JSON com ETag (If-None-Match devolve 304 sem corpo).
+
+        Respostas em cache saem direto do loop; as outras são calculadas numa thread, sem
+        travar as requisições que já têm resposta pronta.
+    '''
+
+    def initialize(self, servico, rota):
+        self.servico = servico
+        self.rota = rota
+        self.etag = None
+
+    async def get(self):
+        filtros = filtros_da_requisicao(self)
+
+        resposta = self.servico.em_cache(self.rota, filtros)
+        if resposta is None:
+            resposta = await tornado.ioloop.IOLoop.current().run_in_executor(None, self.servico.responder, self.rota, filtros)
+
+        corpo, self.etag = resposta
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        # A resposta pode mudar com um arquivo novo: o cliente guarda, mas revalida pelo ETag
+        self.set_header("Cache-Control", "no-cache")
+        self.write(corpo)
+
+    def compute_etag(self):
+        # O tornado compara com o If-None-Match no finish(); o hash já vem calculado do cache
+        return self.etag
+
+    def write_error(self, status_code, **kwargs):
+        self.finish({"erro": self._reason})
+
+class StatusHandler(tornado.web.RequestHandler):
+    ''' GET /api/status: versão da base e contadores do cache de respostas. '''
+
+    def initialize(self, servico):
+        self.servico = servico
+
+    def get(self):
+        self.set_header("Cache-Control", "no-store")
+        self.write({"versao": self.servico.versao(), "cache": self.servico.cache.estatisticas()})
+
+    def compute_etag(self):
+        # Sem ETag: os contadores mudam a cada requisição e nunca devem ser respondidos com 304
+        return None
+
+def criar_app(servico):
+    rotas = [(rf"/api/{rota}", MetricaHandler, {"servico": servico, "rota": rota}) for rota in METRICAS]
+    rotas.append((r"/api/status", StatusHandler, {"servico": servico}))
+    return tornado.web.Application(rotas)
+
+async def servir(porta=PORTA_API):
+    ''' Carrega a base, sobe a API na porta e verifica PASTA_NOVOS a cada INTERVALO_SINCRONIZAR_S. '''
+    servico = ServicoMetricas(carregar_base(), criar_motor(MOTOR_CONSULTAS), CacheLRU(max_itens=4096, max_bytes=CACHE_MB * 1024 ** 2))
+    servico.sincronizar()
+    criar_app(servico).listen(porta)
+    print(f"API das métricas em http://localhost:{porta}/api/ ({', '.join(METRICAS)}, status)")
+
+    loop = tornado.ioloop.IOLoop.current()
+    while True:
+        await asyncio.sleep(INTERVALO_SINCRONIZAR_S)
+        await loop.run_in_executor(None, servico.sincronizar)
+
+# ==================================================================================================================================================================#
+#                                                                     EXECUÇÃO
+# ==================================================================================================================================================================#
+if __name__ == "__main__":
+    # Uso: python -m utils.api [porta]
+    # Ex.: curl "http://localhost:8601/api/cidades?paises=India&preco_min=50&preco_max=300"
+    import sys
+
+    asyncio.run(servir(int(sys.argv[1]) if len(sys.argv) > 1 else PORTA_API))
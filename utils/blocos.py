@@ -0,0 +1,346 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import os
+import shutil
+import tempfile
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # sem pyarrow não há onde gravar os blocos; a leitura única continua disponível
+    pa = None
+    feather = None
+
+from utils import snapshot
+from utils.culinarias import montar_ponte
+from utils.ingestao import HistogramaVotos
+from utils.limpeza import (
+    COLUNAS_DESCARTADAS, aplicar_esquema, converter_tipos, estatisticas_esquema, inserir_recomendacao,
+    juntar_estatisticas, preparar_linhas, rotulo_outlier, tipos_esquema,
+)
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Linhas do CSV lidas por vez; a memória da leitura fica limitada a um bloco, qualquer que
+# seja o tamanho do arquivo
+LINHAS_POR_BLOCO = 200_000
+
+# Colunas de texto do zomato.csv. São lidas sempre como texto: um bloco em que todos os valores
+# parecem números não pode virar coluna numérica só naquele bloco.
+COLUNAS_TEXTO = {
+    "Restaurant Name": str,
+    "City": str,
+    "Address": str,
+    "Locality": str,
+    "Locality Verbose": str,
+    "Cuisines": str,
+    "Currency": str,
+    "Rating color": str,
+    "Rating text": str,
+}
+
+# ==================================================================================================================================================================#
+#                                                                     DUPLICATAS ENTRE BLOCOS
+# ==================================================================================================================================================================#
+class ConjuntoHashes:
+    ''' Hashes de 64 bits das linhas já vistas, para remover duplicatas entre blocos.
+
+        Os hashes ficam em sequências ordenadas (8 bytes por linha distinta, sem objetos Python).
+        Cada bloco vira uma sequência nova e sequências de tamanho parecido são intercaladas,
+        então a busca percorre poucas sequências e o custo total é O(n log n).
+    '''
+
+    def __init__(self):
+        self._sequencias = []
+
+    def __len__(self):
+        return sum(len(s) for s in self._sequencias)
+
+    def contem(self, hashes):
+        ''' Máscara dos hashes já vistos. '''
+        vistos = np.zeros(len(hashes), dtype=bool)
+        for sequencia in self._sequencias:
+            posicao = np.minimum(np.searchsorted(sequencia, hashes), len(sequencia) - 1)
+            vistos |= sequencia[posicao] == hashes
+        return vistos
+
+    def adicionar(self, hashes):
+        if len(hashes) == 0:
+            return
+        self._sequencias.append(np.sort(hashes))
+        while len(self._sequencias) > 1 and len(self._sequencias[-2]) <= 2 * len(self._sequencias[-1]):
+            ultima = self._sequencias.pop()
+            self._sequencias[-1] = np.sort(np.concatenate([self._sequencias[-1], ultima]), kind="stable")
+
+def hash_linhas(bloco):
+    ''' Hash de cada linha do bloco bruto. Números são comparados como float64, então a mesma
+        linha gera o mesmo hash num bloco em que a coluna é inteira e noutro em que tem nulos.
+    '''
+    numericas = bloco.select_dtypes(include="number").columns
+    normalizado = bloco.astype({coluna: np.float64 for coluna in numericas})
+    return pd.util.hash_pandas_object(normalizado, index=False).to_numpy()
+
+# ==================================================================================================================================================================#
+#                                                                     LIMPEZA EM BLOCOS
+# ==================================================================================================================================================================#
+class _ArquivoIPC:
+    ''' Arquivo Feather (Arrow IPC) sem compressão, gravado um bloco por vez. '''
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._escritor = None
+        self._esquema = None
+
+    def gravar(self, tabela):
+        if self._escritor is None:
+            self._esquema = tabela.schema
+            self._escritor = pa.ipc.new_file(self.caminho, self._esquema)
+        # Os metadados do pandas guardados no esquema são os do primeiro bloco
+        self._escritor.write_table(tabela.replace_schema_metadata(self._esquema.metadata))
+
+    def fechar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+
+def _gravar_parte(linhas, arquivo):
+    feather.write_feather(linhas.reset_index(drop=True), arquivo, compression="uncompressed")
+
+def primeira_passada(blocos, pasta, prefixo="parte", guardar_hashes=False):
+    ''' 1ª passada da limpeza, um bloco bruto por vez:
+        - remove as linhas já vistas em blocos anteriores (ConjuntoHashes)
+        - aplica as etapas por linha (preparar_linhas) e grava cada bloco como uma parte em "pasta"
+        - acumula o histograma de votos, o candidato a outlier, o resumo dos tipos e as
+          culinárias de cada parte
+
+        Com guardar_hashes o hash de cada linha da parte também é gravado (.npy), para remover
+        duplicatas entre passadas feitas em paralelo (ver utils.paralelo).
+
+        Retorno: Dicionário com as partes (na ordem do arquivo), o histograma de votos e o
+                 outlier (custo em R$, número da parte, posição na parte) ou None
+    '''
+    vistos = ConjuntoHashes()
+    votos = HistogramaVotos()
+    partes = []
+    outlier = None
+
+    for bloco in blocos:
+        bloco = bloco.drop([c for c in COLUNAS_DESCARTADAS if c in bloco.columns], axis=1)
+
+        hashes = hash_linhas(bloco)
+        novas = ~pd.Series(hashes).duplicated().to_numpy() & ~vistos.contem(hashes)
+        vistos.adicionar(hashes[novas])
+
+        linhas = preparar_linhas(bloco[novas])
+        if linhas.empty:
+            continue
+
+        votos.adicionar(linhas["votes"].to_numpy())
+
+        # Como no idxmax, em caso de empate vale o primeiro restaurante do arquivo
+        candidato = rotulo_outlier(linhas)
+        if candidato is not None:
+            custo = linhas.at[candidato, "average_cost_for_two_real"]
+            if outlier is None or custo > outlier[0]:
+                outlier = (custo, len(partes), linhas.index.get_loc(candidato))
+
+        arquivo = os.path.join(pasta, f"{prefixo}_{len(partes):06d}.feather")
+        _gravar_parte(linhas, arquivo)
+        parte = {
+            "arquivo": arquivo,
+            "linhas": len(linhas),
+            "manter": None,     # máscara das linhas mantidas, quando a parte perde duplicatas depois
+            "inicio": 0,        # posição global da primeira linha, definida em finalizar
+            "estatisticas": estatisticas_esquema(linhas),
+            "culinarias": set(montar_ponte(linhas)["cuisines"]),
+        }
+        if guardar_hashes:
+            parte["hashes"] = arquivo.replace(".feather", ".npy")
+            np.save(parte["hashes"], pd.Series(hashes, index=bloco.index)[linhas.index].to_numpy())
+        partes.append(parte)
+
+    return {"partes": partes, "votos": votos, "outlier": outlier}
+
+def ler_parte(parte, colunas=None):
+    ''' Linhas mantidas da parte, indexadas pela posição global (antes da remoção do outlier). '''
+    linhas = feather.read_table(parte["arquivo"], columns=colunas, memory_map=True).to_pandas()
+    if parte["manter"] is not None:
+        linhas = linhas[parte["manter"]]
+    linhas.index = pd.RangeIndex(parte["inicio"], parte["inicio"] + len(linhas))
+    return linhas
+
+def _linhas_limpas(parte, quantis, outlier, colunas=None):
+    ''' Linhas da parte com a recomendação e sem o outlier. '''
+    linhas = inserir_recomendacao(ler_parte(parte, colunas), *quantis)
+    if outlier is not None and outlier in linhas.index:
+        linhas = linhas.drop(outlier)
+    return linhas
+
+def _recomendacoes(parte, quantis, outlier):
+    linhas = _linhas_limpas(parte, quantis, outlier, ["aggregate_rating", "votes", "average_cost_for_two_real"])
+    return set(linhas["recomendation"].unique().tolist())
+
+def _gravar_parte_final(parte, quantis, outlier, tipos, tipo_culinaria, inicio):
+    ''' Converte a parte para os tipos finais e grava df_limpo e ponte dela, com as posições
+        dos restaurantes a partir de "inicio". Retorna os dois arquivos, ou None se ficou vazia.
+    '''
+    linhas = _linhas_limpas(parte, quantis, outlier)
+    if linhas.empty:
+        return None
+
+    linhas.index = pd.RangeIndex(inicio, inicio + len(linhas))
+    linhas = converter_tipos(linhas, tipos)
+
+    base = parte["arquivo"].removesuffix(".feather")
+    _gravar_parte(linhas, base + "_limpo.feather")
+    _gravar_parte(montar_ponte(linhas).astype({"cuisines": tipo_culinaria}), base + "_ponte.feather")
+    return base + "_limpo.feather", base + "_ponte.feather"
+
+def finalizar(resultado, destino, mapear=map):
+    ''' 2ª passada da limpeza, sobre as partes gravadas pela primeira_passada:
+        - recomendação com os quartis do histograma e remoção do outlier
+        - tipos compactos decididos para a base inteira (as mesmas categorias em todas as partes)
+        - df_limpo, ponte e excluidos gravados nos arquivos Feather de "destino"
+
+        O trabalho de cada parte é independente e passa por "mapear" (map, ou o map de um pool
+        de processos); a junção final segue a ordem das partes.
+
+        Parâmetros: resultado da primeira_passada, dicionário {"limpo", "ponte", "excluidos":
+                    caminho} e função map usada nas partes
+
+        Retorno: Quantidade de restaurantes do df_limpo gravado
+    '''
+    partes = [parte for parte in resultado["partes"] if parte["linhas"]]
+    if not partes:
+        raise ValueError("nenhum restaurante válido no CSV")
+
+    numero_outlier = None
+    if resultado["outlier"] is not None:
+        _, numero, posicao = resultado["outlier"]
+        parte_outlier = resultado["partes"][numero]
+        if parte_outlier["manter"] is not None:
+            posicao = int(np.count_nonzero(parte_outlier["manter"][:posicao]))
+        numero_outlier = next(i for i, parte in enumerate(partes) if parte is parte_outlier)
+
+    inicio = 0
+    for parte in partes:
+        parte["inicio"] = inicio
+        inicio += parte["linhas"]
+
+    votos = resultado["votos"]
+    quantis = (votos.quantil(0.75), votos.mediana())
+
+    # O outlier sai da base: a parte dele tem o resumo refeito sem a linha
+    outlier = None
+    if numero_outlier is None:
+        excluidos = inserir_recomendacao(ler_parte(partes[0]), *quantis).iloc[:0]
+    else:
+        parte = partes[numero_outlier]
+        outlier = parte["inicio"] + posicao
+
+        linhas = inserir_recomendacao(ler_parte(parte), *quantis)
+        excluidos = linhas.loc[[outlier]]
+        restantes = linhas.drop(outlier)
+        parte["estatisticas"] = estatisticas_esquema(restantes)
+        parte["culinarias"] = set(montar_ponte(restantes)["cuisines"])
+    excluidos = aplicar_esquema(excluidos.reset_index(drop=True))
+
+    # Tipos da base inteira; as categorias da recomendação só existem depois dos quartis
+    resumo = None
+    culinarias = set()
+    for parte, recomendacoes in zip(partes, mapear(_recomendacoes, partes, repeat(quantis), repeat(outlier))):
+        parcial = dict(parte["estatisticas"], recomendation=recomendacoes)
+        resumo = parcial if resumo is None else juntar_estatisticas(resumo, parcial)
+        culinarias |= parte["culinarias"]
+
+    tipos = tipos_esquema(resumo)
+    tipo_culinaria = pd.CategoricalDtype(sorted(culinarias))
+
+    # Posição final da primeira linha de cada parte, já sem o outlier
+    inicios = [parte["inicio"] - (outlier is not None and parte["inicio"] > outlier) for parte in partes]
+
+    # O resumo de cada parte não vai de novo para os processos
+    for parte in partes:
+        parte.pop("estatisticas")
+        parte.pop("culinarias")
+
+    arquivos = mapear(_gravar_parte_final, partes, repeat(quantis), repeat(outlier), repeat(tipos), repeat(tipo_culinaria), inicios)
+
+    temporarios = {nome: caminho.with_name(caminho.name + ".tmp") for nome, caminho in destino.items()}
+    limpo, ponte = _ArquivoIPC(temporarios["limpo"]), _ArquivoIPC(temporarios["ponte"])
+    restaurantes = 0
+    try:
+        for gravados in arquivos:
+            if gravados is None:
+                continue
+            tabela = feather.read_table(gravados[0], memory_map=True)
+            limpo.gravar(tabela)
+            ponte.gravar(feather.read_table(gravados[1], memory_map=True))
+            restaurantes += tabela.num_rows
+    finally:
+        limpo.fechar()
+        ponte.fechar()
+    feather.write_feather(excluidos, temporarios["excluidos"], compression="uncompressed")
+
+    for nome, caminho in destino.items():
+        os.replace(temporarios[nome], caminho)
+
+    return restaurantes
+
+def limpar_em_blocos(caminho_csv, destino, linhas_por_bloco=LINHAS_POR_BLOCO):
+    ''' Mesma limpeza do limpar_base, lendo o CSV em blocos e gravando o resultado em disco
+        (primeira_passada e finalizar).
+
+        A memória usada fica em um bloco mais 8 bytes por linha distinta do CSV.
+
+        Parâmetros: caminho do CSV, dicionário {"limpo", "ponte", "excluidos": caminho} dos
+                    arquivos de saída e linhas lidas por bloco
+
+        Retorno: Quantidade de restaurantes do df_limpo gravado
+    '''
+    if feather is None:
+        raise RuntimeError("pyarrow não está instalado; não é possível gravar a limpeza em blocos")
+
+    temporaria = tempfile.mkdtemp(prefix="zomato_blocos_", dir=os.path.dirname(destino["limpo"]))
+    try:
+        leitor = pd.read_csv(caminho_csv, chunksize=linhas_por_bloco, dtype=COLUNAS_TEXTO)
+        return finalizar(primeira_passada(leitor, temporaria), destino)
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+
+def gravar_snapshot_em_blocos(caminho_csv, linhas_por_bloco=LINHAS_POR_BLOCO):
+    ''' Limpa o CSV em blocos direto para os arquivos do snapshot (utils.snapshot), que depois
+        é lido mapeado em memória como o snapshot da limpeza completa.
+    '''
+    origem = snapshot.fingerprint(caminho_csv)
+    arquivos = snapshot.caminhos_snapshot(caminho_csv)
+    restaurantes = limpar_em_blocos(caminho_csv, {nome: arquivos[nome] for nome in snapshot.FRAMES}, linhas_por_bloco)
+    snapshot.registrar_snapshot(caminho_csv, origem)
+    return restaurantes
+
+# ==================================================================================================================================================================#
+#                                                                     BUILD
+# ==================================================================================================================================================================#
+if __name__ == "__main__":
+    # Uso: python -m utils.blocos [caminho.csv] [linhas_por_bloco]
+    import resource
+    import sys
+    import time
+    from pathlib import Path
+
+    from utils.data import CAMINHO_CSV
+
+    caminho = Path(sys.argv[1]) if len(sys.argv) > 1 else CAMINHO_CSV
+    linhas_por_bloco = int(sys.argv[2]) if len(sys.argv) > 2 else LINHAS_POR_BLOCO
+
+    inicio = time.perf_counter()
+    restaurantes = gravar_snapshot_em_blocos(caminho, linhas_por_bloco)
+    pico_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(f"{restaurantes:,} restaurantes gravados em {time.perf_counter() - inicio:.2f}s, "
+          f"pico de memória {pico_mb:,.0f} MB: {snapshot.caminhos_snapshot(caminho)['meta']}")
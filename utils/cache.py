@@ -0,0 +1,147 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.instrumentacao import instrumentar
+
+# ==================================================================================================================================================================#
+#                                                                     CACHE LRU
+# ==================================================================================================================================================================#
+def tamanho_valor(valor):
+    ''' Memória ocupada por um valor guardado em cache: arrays pelo buffer, data frames e Series
+        pelo conteúdo das colunas (sys.getsizeof já usa memory_usage(deep=True)) e tuplas,
+        listas e dicionários pela soma dos itens.
+    '''
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if isinstance(valor, (tuple, list)):
+        return sys.getsizeof(valor) + sum(tamanho_valor(item) for item in valor)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamanho_valor(k) + tamanho_valor(v) for k, v in valor.items())
+    return sys.getsizeof(valor)
+
+class CacheLRU:
+    ''' Cache limitado por quantidade de itens e, opcionalmente, por memória; ao encher descarta
+        o item usado há mais tempo.
+
+        O tamanho de cada valor é medido uma vez, na entrada, com a função "tamanho" (por padrão
+        tamanho_valor). Um valor maior que o limite inteiro de memória não é guardado.
+
+        É compartilhado entre as sessões do servidor (guardado com st.cache_resource), por isso
+        as operações são protegidas por um lock. Os valores são entregues sem cópia e não devem
+        ser alterados por quem os recebe.
+
+        Acertos, faltas, descartes (itens removidos para abrir espaço) e recusas (valores maiores
+        que o limite) são contados; ver estatisticas().
+    '''
+
+    def __init__(self, max_itens=64, max_bytes=None, tamanho=tamanho_valor):
+        self.max_itens = max_itens
+        self.max_bytes = max_bytes
+        self.tamanho = tamanho
+        self.bytes = 0
+        self.acertos = 0
+        self.faltas = 0
+        self.descartes = 0
+        self.recusas = 0
+        self._itens = OrderedDict()
+        self._tamanhos = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def __contains__(self, chave):
+        return chave in self._itens
+
+    def _descartar_antigo(self):
+        chave, _ = self._itens.popitem(last=False)
+        self.bytes -= self._tamanhos.pop(chave)
+        self.descartes += 1
+
+    def get(self, chave, padrao=None):
+        with self._lock:
+            if chave not in self._itens:
+                self.faltas += 1
+                return padrao
+            self.acertos += 1
+            self._itens.move_to_end(chave)
+            return self._itens[chave]
+
+    def set(self, chave, valor):
+        tamanho = self.tamanho(valor) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and tamanho > self.max_bytes:
+            with self._lock:
+                self.recusas += 1
+            return
+
+        with self._lock:
+            if chave in self._itens:
+                self.bytes -= self._tamanhos[chave]
+            self._itens[chave] = valor
+            self._tamanhos[chave] = tamanho
+            self.bytes += tamanho
+            self._itens.move_to_end(chave)
+
+            while len(self._itens) > self.max_itens:
+                self._descartar_antigo()
+            while self.max_bytes is not None and self.bytes > self.max_bytes:
+                self._descartar_antigo()
+
+    @instrumentar("cache")
+    def obter_ou_calcular(self, chave, calcular):
+        ''' Retorna o valor em cache ou chama calcular() e guarda o resultado. '''
+        with self._lock:
+            if chave in self._itens:
+                self.acertos += 1
+                self._itens.move_to_end(chave)
+                return self._itens[chave]
+            self.faltas += 1
+
+        # O cálculo roda fora do lock para não bloquear as outras sessões
+        valor = calcular()
+        self.set(chave, valor)
+        return valor
+
+    def estatisticas(self):
+        ''' Contadores e ocupação do cache. '''
+        with self._lock:
+            consultas = self.acertos + self.faltas
+            return {
+                "itens": len(self._itens),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "descartes": self.descartes,
+                "recusas": self.recusas,
+                "taxa_acerto": self.acertos / consultas if consultas else None,
+            }
+
+def chave_filtros(**filtros):
+    ''' Normaliza o estado dos filtros numa chave hashable, independente da ordem de seleção.
+
+        Listas viram tuplas ordenadas e tuplas de faixa (mínimo, máximo) são mantidas.
+    '''
+    chave = []
+    for nome in sorted(filtros):
+        valor = filtros[nome]
+        if isinstance(valor, (list, set)):
+            valor = tuple(sorted(valor))
+        elif isinstance(valor, tuple):
+            valor = tuple(float(v) for v in valor)
+        chave.append((nome, valor))
+    return tuple(chave)
+
+def chave_posicoes(posicoes):
+    ''' Chave curta e hashable para um conjunto de posições de restaurantes (ex.: o índice do
+        data frame filtrado). Filtros diferentes com o mesmo resultado geram a mesma chave.
+    '''
+    posicoes = np.sort(np.asarray(posicoes, dtype=np.int64))
+    return len(posicoes), hashlib.blake2b(posicoes.tobytes(), digest_size=16).hexdigest()
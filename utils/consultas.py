@@ -0,0 +1,183 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import operator
+import threading
+
+import numpy as np
+
+try:
+    import duckdb
+except ImportError:  # sem duckdb as consultas rodam no pandas, o motor de referência
+    duckdb = None
+
+from utils.instrumentacao import instrumentar
+from utils.ranking import posicoes_top
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+OPERADORES = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+AGREGACOES = ("sum", "mean", "count", "nunique")
+
+# ==================================================================================================================================================================#
+#                                                                     CONSULTA
+# ==================================================================================================================================================================#
+class Consulta:
+    ''' Agregação das páginas descrita como consulta, independente do motor que a executa.
+
+        Ex.: "5 cidades com mais restaurantes com pedido online" é
+             Consulta(["city", "country_name"], "has_online_delivery", "sum", limite=5)
+
+        Parâmetros: colunas de agrupamento, coluna agregada, agregação (AGREGACOES), quantidade
+                    de grupos devolvidos (None = todos), filtro (coluna, operador, valor)
+                    aplicado antes da agregação e ordem crescente ou decrescente do resultado
+
+        O resultado é um data frame com as colunas de agrupamento e a coluna agregada (com o
+        nome da coluna de origem), ordenado pelo valor; empates ficam na ordem das chaves
+        (a ordem das categorias do df_limpo, alfabética) e valores nulos vão para o fim.
+    '''
+
+    def __init__(self, grupos, medida, agregacao, limite=None, filtro=None, crescente=False):
+        if agregacao not in AGREGACOES:
+            raise ValueError(f"agregação desconhecida: {agregacao!r}")
+        if filtro is not None and filtro[1] not in OPERADORES:
+            raise ValueError(f"operador desconhecido: {filtro[1]!r}")
+
+        self.grupos = list(grupos)
+        self.medida = medida
+        self.agregacao = agregacao
+        self.limite = limite
+        self.filtro = filtro
+        self.crescente = crescente
+
+    @property
+    def colunas(self):
+        ''' Colunas do data frame lidas pela consulta. '''
+        colunas = self.grupos + [self.medida]
+        if self.filtro is not None and self.filtro[0] not in colunas:
+            colunas.append(self.filtro[0])
+        return colunas
+
+def ordenar(resultado, consulta):
+    ''' Ordena o resultado agregado (grupos na ordem das chaves) pelo valor da consulta e
+        aplica o limite; usado pelo MotorPandas e pelo cubo (utils.cubo).
+    '''
+    # A ordem das chaves é a ordem dos empates; com limite só os grupos escolhidos são
+    # ordenados (utils.ranking)
+    if consulta.limite is None:
+        resultado = resultado.sort_values(consulta.medida, ascending=consulta.crescente, kind="stable", na_position="last")
+    else:
+        resultado = resultado.iloc[posicoes_top(resultado[consulta.medida].to_numpy(), consulta.limite, consulta.crescente)]
+
+    return resultado.reset_index(drop=True)
+
+# ==================================================================================================================================================================#
+#                                                                     MOTORES
+# ==================================================================================================================================================================#
+class MotorPandas:
+    ''' Motor de referência: as mesmas operações do pandas que as páginas faziam. '''
+
+    nome = "pandas"
+
+    @instrumentar("agregacao")
+    def executar(self, consulta, df):
+        if consulta.filtro is not None:
+            coluna, operador, valor = consulta.filtro
+            df = df[OPERADORES[operador](df[coluna], valor)]
+
+        resultado = df.groupby(consulta.grupos, observed=True)[consulta.medida].agg(consulta.agregacao).reset_index()
+        if consulta.agregacao == "sum" and df[consulta.medida].dtype.kind in "biu":
+            # Somas de inteiros e booleanos sempre em int64 (o groupby mantém int32, que pode estourar)
+            resultado[consulta.medida] = resultado[consulta.medida].astype(np.int64)
+
+        return ordenar(resultado, consulta)
+
+class MotorDuckDB:
+    ''' Motor colunar embutido (DuckDB): a consulta vira SQL e roda direto sobre as colunas do
+        data frame, sem copiá-lo, e em várias threads.
+
+        Colunas categóricas chegam ao DuckDB como ENUM, que ordena na ordem das categorias
+        como o groupby do pandas; somas de reais e médias usam soma compensada (fsum), como
+        o pandas, e as colunas do resultado voltam com os tipos do motor de referência.
+    '''
+
+    nome = "duckdb"
+
+    SQL_AGREGACOES = {
+        "sum": 'CAST(sum(CAST("{0}" AS BIGINT)) AS BIGINT)',
+        "sum_real": 'fsum(CAST("{0}" AS DOUBLE))',
+        "mean": 'fsum(CAST("{0}" AS DOUBLE)) / count("{0}")',
+        "count": 'count("{0}")',
+        "nunique": 'count(DISTINCT "{0}")',
+    }
+
+    def __init__(self):
+        if duckdb is None:
+            raise RuntimeError("duckdb não está instalado; use o motor pandas")
+        self._conexao = duckdb.connect()
+        self._local = threading.local()
+
+    def _cursor(self):
+        # Uma conexão do DuckDB não pode ser usada por duas threads ao mesmo tempo; cada thread
+        # do servidor recebe o seu cursor
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._local.cursor = self._conexao.cursor()
+        return cursor
+
+    def sql(self, consulta, real=False):
+        ''' SQL da consulta sobre a tabela "dados" e os parâmetros dela ("real": a coluna
+            agregada é de ponto flutuante).
+        '''
+        agregacao = "sum_real" if consulta.agregacao == "sum" and real else consulta.agregacao
+        grupos = ", ".join(f'"{coluna}"' for coluna in consulta.grupos)
+        valor = self.SQL_AGREGACOES[agregacao].format(consulta.medida)
+        direcao = "ASC" if consulta.crescente else "DESC"
+
+        sql = f'SELECT {grupos}, {valor} AS "{consulta.medida}" FROM dados'
+        parametros = []
+        if consulta.filtro is not None:
+            coluna, operador, limite = consulta.filtro
+            sql += f' WHERE "{coluna}" {"=" if operador == "==" else operador} ?'
+            parametros.append(limite)
+        sql += f' GROUP BY {grupos} ORDER BY "{consulta.medida}" {direcao} NULLS LAST, {grupos}'
+        if consulta.limite is not None:
+            sql += f" LIMIT {int(consulta.limite)}"
+
+        return sql, parametros
+
+    @instrumentar("agregacao")
+    def executar(self, consulta, df):
+        dados = df[consulta.colunas]
+        sql, parametros = self.sql(consulta, dados[consulta.medida].dtype.kind == "f")
+
+        cursor = self._cursor()
+        cursor.register("dados", dados)
+        try:
+            resultado = cursor.execute(sql, parametros).df()
+        finally:
+            cursor.unregister("dados")
+
+        return resultado.astype({coluna: dados[coluna].dtype for coluna in consulta.grupos})
+
+MOTORES = {
+    "pandas": MotorPandas,
+    "duckdb": MotorDuckDB,
+}
+
+def criar_motor(nome="pandas"):
+    ''' Motor das consultas pelo nome (MOTORES). Sem o duckdb instalado, usa o pandas. '''
+    if nome not in MOTORES:
+        raise ValueError(f"motor de consultas desconhecido: {nome!r} (opções: {', '.join(MOTORES)})")
+    if nome == "duckdb" and duckdb is None:
+        return MotorPandas()
+    return MOTORES[nome]()
@@ -0,0 +1,385 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import math
+
+import numpy as np
+import pandas as pd
+
+from utils.consultas import OPERADORES, ordenar
+from utils.instrumentacao import instrumentar
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Custo em R$: eixo com somas acumuladas dentro de cada célula, para a faixa de preço continuar
+# exata sem virar dimensão das células
+CUSTO = "average_cost_for_two_real"
+
+# Dimensões das células: os filtros da sidebar (país e cidade) e os agrupamentos dos gráficos
+DIMENSOES = ("country_name", "city", "price_range", "recomendation")
+DIMENSOES_PARES = ("country_name", "city", "cuisines")
+
+# Bits de cada parte inteira das somas de floats (ver _partes_exatas)
+BITS_PARTE = 24
+
+# Colunas somadas em cada célula de restaurantes (soma e quantidade de valores não nulos)
+MEDIDAS_RESTAURANTES = (
+    "restaurant_id",
+    "votes",
+    "aggregate_rating",
+    "average_cost_for_two_real",
+    "has_online_delivery",
+    "has_table_booking",
+    "is_delivering_now",
+)
+
+# Colunas do restaurante somadas em cada célula de pares (restaurante, culinária)
+MEDIDAS_PARES = ("aggregate_rating", "votes")
+
+# ==================================================================================================================================================================#
+#                                                                     CÉLULAS
+# ==================================================================================================================================================================#
+def _codificar(serie):
+    ''' Código de cada linha e valores distintos em ordem (a das categorias, nas categóricas).
+        Nulos ficam com o código len(valores).
+    '''
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos, valores = serie.cat.codes.to_numpy(), serie.cat.categories
+    else:
+        codigos, valores = pd.factorize(serie, sort=True)
+
+    codigos = codigos.astype(np.int64)
+    return np.where(codigos < 0, len(valores), codigos), valores
+
+def _partes_exatas(valores):
+    ''' Decompõe floats em partes inteiras exatas: valor = soma(partes[j] * 2^(BITS_PARTE * j)) / 2^escala.
+
+        Somas e diferenças das partes (int64) não arredondam, então somas acumuladas podem ser
+        subtraídas sem erro e a soma final sai corretamente arredondada (a soma compensada do
+        groupby do pandas quase sempre também sai, mas não sempre).
+
+        Retorno: Tupla (partes int64 com forma (k, len(valores)), escala)
+    '''
+    _, expoentes = np.frexp(valores[valores != 0])
+    if not len(expoentes):
+        return np.zeros((1, len(valores)), dtype=np.int64), 0
+
+    # Todo float com expoente e é múltiplo de 2^(e - 53)
+    escala = max(0, 53 - int(expoentes.min()))
+    k = max(1, math.ceil((int(expoentes.max()) + escala) / BITS_PARTE))
+
+    resto = np.ldexp(valores, escala)
+    partes = np.empty((k, len(valores)), dtype=np.int64)
+    for j in range(k - 1, -1, -1):
+        # Divisões por potências de 2 e floor são exatas: cada parte sai sem arredondar
+        parte = np.floor(np.ldexp(resto, -BITS_PARTE * j))
+        resto = resto - np.ldexp(parte, BITS_PARTE * j)
+        partes[j] = parte
+    return partes, escala
+
+def _juntar_partes(partes, escala):
+    ''' Floats das somas de partes (forma (k, n)), com um só arredondamento cada. '''
+    totais = np.zeros(partes.shape[1], dtype=object)
+    for j in range(partes.shape[0] - 1, -1, -1):
+        totais = totais * (1 << BITS_PARTE) + partes[j].astype(object)
+    return np.array([total / (1 << escala) for total in totais], dtype=np.float64)
+
+class _Celulas:
+    ''' Combinações de dimensões presentes nos dados (uma célula por combinação), com as somas
+        e contagens das linhas de cada uma.
+
+        medidas: {filtro: {"linhas": ..., ("n", coluna): ..., ("soma", coluna): ...}}, onde o
+        filtro None é o agregado sem filtro e os outros são filtros (coluna, operador, valor)
+        pré-agregados para as consultas que os usam. Somas de floats ficam em partes inteiras
+        (_partes_exatas, escalas[coluna]), com forma (k, células).
+
+        Eixo do custo: as linhas de cada célula ordenadas pelo código do custo, uma entrada por
+        custo distinto da célula, com as mesmas medidas acumuladas (acumulados). As medidas de
+        uma faixa de custo saem da diferença de dois acumulados por célula (ver faixa), então a
+        consulta com preço custa o mesmo que a sem preço: proporcional às células.
+    '''
+
+    def __init__(self, codigos, tamanhos, dados, colunas, filtros=(), custo=None, custos=0):
+        dimensoes = list(codigos)
+        chave = np.ravel_multi_index([codigos[d] for d in dimensoes], [tamanhos[d] for d in dimensoes])
+        chaves, celula = np.unique(chave, return_inverse=True)
+
+        self.total = len(chaves)
+        self.coordenadas = {
+            d: c.astype(np.int32)
+            for d, c in zip(dimensoes, np.unravel_index(chaves, [tamanhos[d] for d in dimensoes]))
+        }
+
+        # Entradas do eixo do custo: (célula, código do custo) distintos, em ordem
+        self._largura = custos + 1
+        self.eixo, entrada = np.unique(celula.astype(np.int64) * self._largura + custo, return_inverse=True)
+        self.entradas = len(self.eixo)
+
+        # Valores de cada coluna (floats em partes inteiras, com a escala da coluna)
+        validos, valores, self.escalas = {}, {}, {}
+        for coluna in colunas:
+            serie = dados[coluna].to_numpy(dtype=np.float64)
+            validos[coluna] = ~np.isnan(serie)
+            serie = np.where(validos[coluna], serie, 0.0)
+            if dados[coluna].dtype.kind in "biu":
+                valores[coluna] = serie[np.newaxis]
+            else:
+                valores[coluna], self.escalas[coluna] = _partes_exatas(serie)
+
+        self.medidas, self.acumulados = {}, {}
+        for filtro in (None, *filtros):
+            presente = np.ones(len(celula), dtype=bool)
+            if filtro is not None:
+                coluna, operador, valor = filtro
+                presente = OPERADORES[operador](dados[coluna], valor).to_numpy(dtype=bool)
+
+            pesos = {"linhas": presente[np.newaxis]}
+            for coluna in colunas:
+                pesos["n", coluna] = (presente & validos[coluna])[np.newaxis]
+                pesos["soma", coluna] = np.where(presente, valores[coluna], 0)
+
+            # Somas de inteiros (e das partes) em float64 são exatas até 2^53
+            medidas, acumulados = {}, {}
+            for nome, peso in pesos.items():
+                medidas[nome] = np.stack([np.bincount(celula, weights=p, minlength=self.total) for p in peso]).astype(np.int64)
+                por_entrada = np.stack([np.bincount(entrada, weights=p, minlength=self.entradas) for p in peso]).astype(np.int64)
+                acumulados[nome] = np.concatenate([np.zeros((len(peso), 1), dtype=np.int64), np.cumsum(por_entrada, axis=1)], axis=1)
+            self.medidas[filtro], self.acumulados[filtro] = medidas, acumulados
+
+    def faixa(self, minimo, maximo):
+        ''' Posições (início, fim) no eixo do custo, por célula, das entradas com código do custo
+            em [minimo, maximo).
+        '''
+        base = np.arange(self.total, dtype=np.int64) * self._largura
+        return np.searchsorted(self.eixo, base + minimo), np.searchsorted(self.eixo, base + maximo)
+
+    def medida(self, filtro, nome, faixa=None):
+        ''' Medida por célula (forma (k, células)), de todas as linhas ou só das da faixa de custo. '''
+        if faixa is None:
+            return self.medidas[filtro][nome]
+        inicio, fim = faixa
+        acumulado = self.acumulados[filtro][nome]
+        return acumulado[:, fim] - acumulado[:, inicio]
+
+# ==================================================================================================================================================================#
+#                                                                     CUBO
+# ==================================================================================================================================================================#
+class CuboOLAP:
+    ''' Cubo pré-agregado por país × cidade × faixa de preço × recomendação (e país × cidade ×
+        culinária, nas células de pares da ponte), com o custo em R$ como eixo acumulado dentro
+        de cada célula, montado uma vez no carregamento.
+
+        Os filtros da sidebar viram uma máscara sobre as células (fatia) e as agregações dos
+        gráficos somam as células selecionadas: o custo depende da quantidade de células, não
+        da quantidade de restaurantes. A faixa de preço não multiplica as células: as medidas
+        de cada célula na faixa saem de duas buscas no eixo do custo (_Celulas.faixa).
+
+        - somas, contagens e médias: soma das somas e das contagens das células
+        - nunique de uma dimensão (cidades por país, culinárias por cidade): combinações
+          distintas entre as células selecionadas, exato
+        - filtros das Consultas (ex.: nota > 4): pré-agregados no carregamento (filtros)
+
+        O filtro de culinárias só vale para as células de pares: restaurantes
+        "com alguma das culinárias" não saem do cubo (ver restringe_culinarias).
+
+        Somas de floats são exatas (partes inteiras, _partes_exatas): somas e médias partem da
+        soma corretamente arredondada. A soma do groupby do pandas nem sempre é, então médias (e
+        a ordem de empates entre elas) podem diferir do pandas no último ulp (ex.:
+        552.1600000000001 no lugar de 552.16).
+    '''
+
+    def __init__(self, df1, ponte, filtros=()):
+        self.filtros = list(dict.fromkeys(filtros))
+
+        codigos, self.valores, self.tipos = {}, {}, {}
+        for dimensao in DIMENSOES:
+            codigos[dimensao], self.valores[dimensao] = _codificar(df1[dimensao])
+            self.tipos[dimensao] = df1[dimensao].dtype
+        tamanhos = {d: len(self.valores[d]) + 1 for d in DIMENSOES}
+
+        # Custo: valores distintos em ordem, a faixa de preço vira um intervalo de códigos (o nulo fica fora)
+        custo, self.custos = _codificar(df1[CUSTO])
+        self._custo_nulo = bool((custo == len(self.custos)).any())
+
+        # Pares: dimensões do restaurante de cada par, mais a culinária
+        restaurante = ponte["restaurante"].to_numpy()
+        codigos_pares = {d: codigos[d][restaurante] for d in DIMENSOES_PARES if d in codigos}
+        codigos_pares["cuisines"], self.valores["cuisines"] = _codificar(ponte["cuisines"])
+        self.tipos["cuisines"] = ponte["cuisines"].dtype
+        tamanhos["cuisines"] = len(self.valores["cuisines"]) + 1
+        colunas_pares = df1[list(MEDIDAS_PARES)].take(restaurante)
+
+        self._restaurantes = _Celulas(codigos, tamanhos, df1, MEDIDAS_RESTAURANTES, self.filtros, custo, len(self.custos))
+        self._pares = _Celulas(codigos_pares, tamanhos, colunas_pares, MEDIDAS_PARES, (), custo[restaurante], len(self.custos))
+
+    def celulas(self):
+        ''' Quantidade de células de restaurantes e de pares e de entradas no eixo do custo. '''
+        return {
+            "restaurantes": self._restaurantes.total,
+            "restaurantes_eixo_custo": self._restaurantes.entradas,
+            "pares": self._pares.total,
+            "pares_eixo_custo": self._pares.entradas,
+        }
+
+    # -------------------------------------------------------------------------------------------------------------------------------------------------------------
+    # Fatia
+    # -------------------------------------------------------------------------------------------------------------------------------------------------------------
+    def _codigos_selecionados(self, celulas, dimensao, selecionados):
+        ''' Códigos da dimensão com algum dos valores selecionados, ou None quando a lista está
+            vazia ou tem todos os valores presentes (mesma regra do IndiceFiltros).
+        '''
+        if not selecionados:
+            return None
+
+        selecionados = set(selecionados)
+        valores = self.valores[dimensao]
+        presentes = np.unique(celulas.coordenadas[dimensao])
+        presentes = presentes[presentes < len(valores)]
+        if selecionados.issuperset(valores[presentes]):
+            return None
+
+        return np.append(valores.isin(list(selecionados)), False)
+
+    def _selecao(self, celulas, paises, cidades, custo):
+        ''' Máscara das células e posições da faixa de custo no eixo (ou None, sem preço). '''
+        selecao = np.ones(celulas.total, dtype=bool)
+
+        for dimensao, selecionados in (("country_name", paises), ("city", cidades)):
+            codigos = self._codigos_selecionados(celulas, dimensao, selecionados)
+            if codigos is not None:
+                selecao &= codigos[celulas.coordenadas[dimensao]]
+
+        faixa = None
+        if custo is not None:
+            faixa = celulas.faixa(*custo)
+            selecao &= celulas.medida(None, "linhas", faixa)[0] > 0
+
+        return celulas, selecao, faixa
+
+    def _faixa_custo(self, preco):
+        minimo, maximo = preco
+        return np.searchsorted(self.custos, minimo, side="left"), np.searchsorted(self.custos, maximo, side="right")
+
+    @instrumentar("filtro")
+    def fatia(self, paises=None, cidades=None, culinarias=None, preco=None):
+        ''' Células selecionadas pelos filtros da sidebar, com a mesma regra do IndiceFiltros
+            (listas vazias ou com todos os valores = todos; preço com os extremos inclusos).
+
+            Retorno: Tupla ((células, máscara, faixa de custo) dos restaurantes, (...) dos pares);
+                     as culinárias filtram só os pares, como a ponte em agregados.filtrar
+        '''
+        # Faixa de preço com todos os restaurantes: sem passar pelo eixo do custo
+        custo = None
+        if preco is not None:
+            minimo, maximo = self._faixa_custo(preco)
+            if minimo > 0 or maximo < len(self.custos) or self._custo_nulo:
+                custo = (minimo, maximo)
+
+        restaurantes = self._selecao(self._restaurantes, paises, cidades, custo)
+        pares = self._selecao(self._pares, paises, cidades, custo)
+
+        if culinarias:
+            pares[1][:] &= np.append(self.valores["cuisines"].isin(list(culinarias)), False)[self._pares.coordenadas["cuisines"]]
+
+        return restaurantes, pares
+
+    def restringe_culinarias(self, fatia, culinarias):
+        ''' Se a lista de culinárias deixa de fora algum restaurante da fatia (montada sem o
+            filtro de culinárias). Quando deixa, as métricas por restaurante precisam do índice.
+        '''
+        if not culinarias:
+            return False
+
+        pares, selecao, _ = fatia[1]
+        codigos = np.unique(pares.coordenadas["cuisines"][selecao])
+        if (codigos == len(self.valores["cuisines"])).any():
+            return True
+        return not set(culinarias).issuperset(self.valores["cuisines"][codigos])
+
+    # -------------------------------------------------------------------------------------------------------------------------------------------------------------
+    # Agregações
+    # -------------------------------------------------------------------------------------------------------------------------------------------------------------
+    @instrumentar("agregacao")
+    def agregar(self, grupos, medidas, fatia, filtro=None):
+        ''' Agrega as células da fatia como um groupby(grupos, observed=True).agg(**medidas).
+
+            Parâmetros: dimensões de agrupamento, {nome: (coluna, agregação)} com agregação
+                        "sum", "mean", "count" (valores não nulos), "size" (linhas) ou
+                        "nunique" (só de dimensões), fatia e filtro pré-agregado (ou None)
+
+            Com a culinária nos grupos ou em alguma medida, agrega os pares (restaurante,
+            culinária); senão, os restaurantes.
+
+            Retorno: Data frame com os grupos (na ordem das chaves, com os tipos do df_limpo)
+                     e uma coluna por medida (somas de inteiros e booleanos em int64)
+        '''
+        grupos = list(grupos)
+        por_par = "cuisines" in grupos or any(coluna == "cuisines" for coluna, _ in medidas.values())
+        celulas, selecao, faixa = fatia[1] if por_par else fatia[0]
+        if filtro not in celulas.medidas:
+            raise ValueError(f"filtro não pré-agregado no cubo: {filtro!r}")
+        for dimensao in grupos:
+            if dimensao not in celulas.coordenadas:
+                raise ValueError(f"dimensão fora das células do cubo: {dimensao!r}")
+
+        # Grupos presentes: células da fatia com alguma linha (depois do filtro) e sem nulo nos grupos
+        linhas = celulas.medida(filtro, "linhas", faixa)[0]
+        selecao = selecao & (linhas > 0)
+        for dimensao in grupos:
+            selecao &= celulas.coordenadas[dimensao] < len(self.valores[dimensao])
+        posicoes = np.flatnonzero(selecao)
+
+        tamanhos = [len(self.valores[d]) for d in grupos]
+        chave = np.ravel_multi_index([celulas.coordenadas[d][posicoes] for d in grupos], tamanhos)
+        chaves, grupo = np.unique(chave, return_inverse=True)
+        quantidade = len(chaves)
+
+        def por_grupo(nome):
+            partes = celulas.medida(filtro, nome, faixa)[:, posicoes]
+            return np.stack([np.bincount(grupo, weights=parte, minlength=quantidade) for parte in partes]).astype(np.int64)
+
+        resultado = {}
+        for dimensao, codigos in zip(grupos, np.unravel_index(chaves, tamanhos)):
+            if isinstance(self.tipos[dimensao], pd.CategoricalDtype):
+                resultado[dimensao] = pd.Categorical.from_codes(codigos, dtype=self.tipos[dimensao])
+            else:
+                resultado[dimensao] = self.valores[dimensao][codigos].to_numpy().astype(self.tipos[dimensao])
+
+        for nome, (coluna, agregacao) in medidas.items():
+            if agregacao == "size":
+                valor = np.bincount(grupo, weights=linhas[posicoes], minlength=quantidade).astype(np.int64)
+            elif agregacao == "nunique":
+                if coluna not in celulas.coordenadas:
+                    raise ValueError(f"nunique no cubo só para dimensões, não {coluna!r}")
+                codigos = celulas.coordenadas[coluna][posicoes].astype(np.int64)
+                distintos = np.unique(grupo * (len(self.valores[coluna]) + 1) + codigos)
+                distintos = distintos[distintos % (len(self.valores[coluna]) + 1) < len(self.valores[coluna])]
+                valor = np.bincount(distintos // (len(self.valores[coluna]) + 1), minlength=quantidade).astype(np.int64)
+            elif ("n", coluna) in celulas.medidas[filtro]:
+                n = por_grupo(("n", coluna))[0]
+                total = por_grupo(("soma", coluna))
+                total = _juntar_partes(total, celulas.escalas[coluna]) if coluna in celulas.escalas else total[0]
+                if agregacao == "count":
+                    valor = n
+                elif agregacao == "sum":
+                    valor = total
+                elif agregacao == "mean":
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        valor = np.where(n > 0, total / n, np.nan)
+                else:
+                    raise ValueError(f"agregação desconhecida: {agregacao!r}")
+            else:
+                raise ValueError(f"coluna sem medida no cubo: {coluna!r}")
+            resultado[nome] = valor
+
+        return pd.DataFrame(resultado)
+
+    @instrumentar("agregacao")
+    def executar(self, consulta, fatia):
+        ''' Executa uma Consulta (utils.consultas) sobre a fatia, com o mesmo resultado do
+            MotorPandas sobre os restaurantes (ou pares) filtrados, a menos do último ulp das
+            médias (ver CuboOLAP).
+        '''
+        resultado = self.agregar(consulta.grupos, {consulta.medida: (consulta.medida, consulta.agregacao)}, fatia, consulta.filtro)
+        return ordenar(resultado, consulta)
@@ -0,0 +1,213 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import numpy as np
+import pandas as pd
+
+from utils.instrumentacao import instrumentar
+
+# ==================================================================================================================================================================#
+#                                                                     PONTE RESTAURANTE -> CULINÁRIA
+# ==================================================================================================================================================================#
+# A coluna "cuisines" de cada restaurante tem várias culinárias separadas por vírgula.
+# Em vez de repetir todas as colunas do restaurante para cada culinária, a ponte guarda
+# apenas dois inteiros por par (restaurante, culinária):
+#   "restaurante" - posição da linha no df_limpo (int32)
+#   "cuisines"    - culinária como categoria (código int16 + lista única de nomes)
+# As páginas buscam no df_limpo só as colunas que precisam, pela posição do restaurante.
+
+def montar_ponte(df1):
+    ''' Cria a ponte restaurante -> culinária a partir do df_limpo.
+
+        Parâmetro: Data frame limpo com índice posicional (0..n-1)
+
+        Retorno: Data frame com as colunas "restaurante" e "cuisines", uma linha por par
+    '''
+    # Cada texto distinto de "cuisines" é quebrado uma única vez (em vez de um split/explode
+    # por restaurante); os pares são montados depois só com índices
+    codigos, textos = pd.factorize(df1["cuisines"])
+    textos = [str(texto) for texto in textos]
+    if (codigos < 0).any():
+        # Nulos viram o texto "nan", como no astype(str)
+        codigos = np.where(codigos < 0, len(textos), codigos)
+        textos.append("nan")
+    listas = [[c.strip() for c in texto.split(",")] for texto in textos]
+
+    tamanhos = np.array([len(lista) for lista in listas], dtype=np.int64)
+    inicio_lista = np.cumsum(tamanhos) - tamanhos
+    categorias, codigo_culinaria = np.unique(np.array([c for lista in listas for c in lista], dtype=object), return_inverse=True)
+
+    # Pares por restaurante e posição de cada par dentro da lista de culinárias do restaurante
+    pares = tamanhos[codigos]
+    ordem_no_restaurante = np.arange(pares.sum()) - np.repeat(np.cumsum(pares) - pares, pares)
+
+    ponte = pd.DataFrame({
+        "restaurante": np.repeat(df1.index.to_numpy(), pares).astype(np.int32),
+        "cuisines": pd.Categorical.from_codes(
+            codigo_culinaria[np.repeat(inicio_lista[codigos], pares) + ordem_no_restaurante],
+            categories=categorias,
+        ),
+    })
+
+    return ponte
+
+@instrumentar("filtro")
+def filtrar_ponte(ponte, mascara=None, culinarias=None):
+    ''' Mantém os pares cujo restaurante está na máscara e cuja culinária está na lista.
+
+        Parâmetros: ponte, máscara booleana por restaurante (None = todos) e
+                    lista de culinárias (None ou vazia = todas)
+
+        Retorno: Ponte filtrada
+    '''
+    manter = np.ones(len(ponte), dtype=bool)
+
+    if mascara is not None:
+        manter &= mascara[ponte["restaurante"].to_numpy()]
+
+    if culinarias:
+        manter &= ponte["cuisines"].isin(culinarias).to_numpy()
+
+    return ponte[manter]
+
+@instrumentar("filtro")
+def culinarias_de(ponte, mascara=None):
+    ''' Lista ordenada das culinárias oferecidas pelos restaurantes da máscara. '''
+    ponte = filtrar_ponte(ponte, mascara)
+    return sorted(ponte["cuisines"].unique())
+
+@instrumentar("filtro")
+def juntar(ponte, df1, colunas):
+    ''' Monta um data frame estreito com as colunas pedidas para cada par da ponte.
+
+        "restaurante" e "cuisines" vêm da própria ponte; as demais são buscadas no df_limpo
+        pela posição do restaurante. Só as colunas listadas são copiadas, na ordem da ponte.
+
+        Retorno: Data frame com as colunas pedidas, uma linha por par
+    '''
+    da_ponte = [c for c in colunas if c in ponte.columns]
+    do_df = [c for c in colunas if c not in ponte.columns]
+
+    linhas = df1[do_df].take(ponte["restaurante"].to_numpy()).reset_index(drop=True)
+    for coluna in da_ponte:
+        linhas[coluna] = ponte[coluna].array
+
+    return linhas[colunas]
+
+def culinarias_unicas_por(ponte, df1, chaves):
+    ''' Quantidade de culinárias distintas por grupo (ex.: por país ou por cidade).
+
+        Parâmetros: ponte (já filtrada), df_limpo e lista de colunas de agrupamento
+
+        Retorno: Data frame com as chaves e a coluna "cuisines" com a contagem
+    '''
+    pares = juntar(ponte, df1, list(chaves) + ["cuisines"])
+    return pares.groupby(list(chaves), observed=True)["cuisines"].nunique().reset_index()
+
+# ==================================================================================================================================================================#
+#                                                                     MELHORES RESTAURANTES POR CULINÁRIA
+# ==================================================================================================================================================================#
+class MelhoresPorCulinaria:
+    ''' Restaurantes de cada culinária já ordenados por (nota, votos), do melhor para o pior,
+        montado uma vez no carregamento.
+
+        As listas ficam num único array de posições (formato CSR): a culinária de código c
+        ocupa restaurantes[inicios[c]:inicios[c + 1]]. Com filtros, os k melhores de cada
+        culinária saem percorrendo a lista do início e pulando os restaurantes fora da máscara,
+        sem ordenar nada na hora. Empates ficam na ordem da ponte (posição do restaurante).
+    '''
+
+    def __init__(self, df1, ponte):
+        posicoes = ponte["restaurante"].to_numpy()
+        codigos = ponte["cuisines"].cat.codes.to_numpy()
+        nota = df1["aggregate_rating"].to_numpy(dtype=np.float64)[posicoes]
+        votos = df1["votes"].to_numpy(dtype=np.float64)[posicoes]
+
+        # lexsort: última chave é a principal; nulos ficam no fim, como no sort_values
+        ordem = np.lexsort((np.arange(len(posicoes)), -votos, -nota, codigos))
+
+        self.restaurantes = posicoes[ordem].astype(np.int32)
+        self.codigos = codigos[ordem]
+        self.nota = nota[ordem]
+        self.tipo = ponte["cuisines"].dtype
+        self.inicios = np.searchsorted(codigos[ordem], np.arange(len(self.tipo.categories) + 1))
+
+    def _melhores_da_lista(self, lista, k, mascara):
+        ''' Os k primeiros da lista que passam na máscara, olhando janelas cada vez maiores. '''
+        if mascara is None:
+            return lista[:k]
+
+        escolhidos = []
+        quantidade = 0
+        inicio, janela = 0, 4 * k
+        while inicio < len(lista) and quantidade < k:
+            parte = lista[inicio:inicio + janela]
+            parte = parte[mascara[parte]][: k - quantidade]
+            escolhidos.append(parte)
+            quantidade += len(parte)
+            inicio, janela = inicio + janela, janela * 2
+
+        return np.concatenate(escolhidos) if escolhidos else lista[:0]
+
+    @instrumentar("agregacao")
+    def melhores(self, k, mascara=None, culinarias=None):
+        ''' Os k melhores restaurantes de cada culinária entre os filtrados.
+
+            Parâmetros: quantidade por culinária, máscara booleana por restaurante (None = todos)
+                        e lista de culinárias (None = todas)
+
+            Retorno: Data frame no formato da ponte ("restaurante", "cuisines"), com as culinárias
+                     na ordem da lista (em ordem alfabética quando não há lista) e, em cada uma,
+                     os restaurantes do melhor para o pior
+        '''
+        if culinarias is not None:
+            codigos = pd.unique(self.tipo.categories.get_indexer(list(culinarias)))
+            codigos = codigos[codigos >= 0]
+        else:
+            codigos = np.arange(len(self.tipo.categories))
+
+        listas = [
+            self._melhores_da_lista(self.restaurantes[self.inicios[c]:self.inicios[c + 1]], k, mascara)
+            for c in codigos.tolist()
+        ]
+        tamanhos = [len(lista) for lista in listas]
+
+        return pd.DataFrame({
+            "restaurante": np.concatenate(listas) if listas else np.empty(0, dtype=np.int32),
+            "cuisines": pd.Categorical.from_codes(np.repeat(codigos, tamanhos), dtype=self.tipo),
+        })
+
+    @instrumentar("agregacao")
+    def catalogo(self, mascara=None, culinarias=None, busca="", ordem="nome"):
+        ''' Culinárias com algum restaurante entre os filtrados, na ordem da tabela paginada.
+
+            Parâmetros: máscara booleana por restaurante (None = todos), lista de culinárias
+                        (None ou vazia = todas), texto buscado no nome (sem diferenciar
+                        maiúsculas) e ordem: "nome" (A-Z), "nome_desc" (Z-A) ou "nota" (nota do
+                        melhor restaurante filtrado, maior primeiro; empates em ordem alfabética)
+
+            Retorno: Lista com os nomes das culinárias
+        '''
+        passa = slice(None) if mascara is None else np.flatnonzero(mascara[self.restaurantes])
+        codigos = self.codigos[passa]
+        nota = self.nota[passa]
+
+        # As listas estão agrupadas por culinária e ordenadas: a 1ª ocorrência é o melhor restaurante
+        codigos, primeiro = np.unique(codigos, return_index=True)
+        nomes = self.tipo.categories[codigos]
+
+        manter = np.ones(len(codigos), dtype=bool)
+        if culinarias:
+            manter &= nomes.isin(list(culinarias))
+        if busca:
+            manter &= nomes.str.contains(busca, case=False, regex=False)
+        nomes, nota_melhor = nomes[manter], nota[primeiro][manter]
+
+        if ordem == "nome_desc":
+            nomes = nomes[::-1]
+        elif ordem == "nota":
+            nomes = nomes[np.lexsort((np.arange(len(nomes)), -nota_melhor))]
+        elif ordem != "nome":
+            raise ValueError(f"ordem desconhecida: {ordem!r}")
+
+        return nomes.tolist()
@@ -0,0 +1,252 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import os
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from utils import instrumentacao, snapshot
+from utils.agregados import CONSULTAS_CIDADES
+from utils.blocos import gravar_snapshot_em_blocos
+from utils.cache import CacheLRU, chave_posicoes
+from utils.cubo import CuboOLAP
+from utils.culinarias import MelhoresPorCulinaria
+from utils.grade import GradeEspacial
+from utils.hll import EsbocosDistintos
+from utils.indices import IndiceFiltros
+from utils.ingestao import BaseIncremental
+from utils.instrumentacao import instrumentar
+from utils.limpeza import limpar_base, limpar_dados, relatorio_memoria
+from utils.mapa import html_mapa
+from utils.paralelo import gravar_snapshot_em_paralelo
+
+# Com o copy-on-write ligado, cópias rasas dos dataframes compartilhados não duplicam memória
+# e qualquer escrita feita por uma página gera a sua própria cópia, sem tocar nos dados em cache.
+pd.set_option("mode.copy_on_write", True)
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Outro CSV no mesmo formato (ex.: uma base sintética maior, ver benchmarks/desempenho.py) pode ser
+# indicado em ZOMATO_CSV; o snapshot e a pasta de novos ficam ao lado dele
+CAMINHO_CSV = Path(os.environ.get("ZOMATO_CSV", Path(__file__).resolve().parent.parent / "dataset" / "zomato.csv"))
+
+# Arquivos de restaurantes novos ou alterados (mesmo formato do zomato.csv), aplicados por
+# cima do CSV principal sem reiniciar o servidor - ver "python -m utils.ingestao"
+PASTA_NOVOS = CAMINHO_CSV.parent / "novos"
+
+# Acima deste tamanho o CSV é limpo em blocos (a leitura de uma vez chega a ocupar várias
+# vezes o tamanho do arquivo em memória)
+LIMITE_LEITURA_UNICA_MB = 256
+
+# Processos usados na limpeza dos CSVs grandes (1 = em blocos no próprio processo, ver utils.paralelo)
+PROCESSOS_LIMPEZA = int(os.environ.get("ZOMATO_PROCESSOS", "1"))
+
+# Motor que executa as agregações da API: "pandas" (referência) ou "duckdb" (ver utils.consultas)
+MOTOR_CONSULTAS = os.environ.get("ZOMATO_MOTOR", "pandas")
+
+# Memória máxima dos valores derivados em cache no processo (o mapa sem filtros tem ~1,2 MB)
+CACHE_MB = int(os.environ.get("ZOMATO_CACHE_MB", "256"))
+
+# Porta da API HTTP/JSON das métricas (python -m utils.api)
+PORTA_API = int(os.environ.get("ZOMATO_API_PORTA", "8601"))
+
+# Vários servidores do Streamlit na mesma máquina (atrás de um balanceador): com "1" cada processo
+# lê o snapshot sem cópia e os dataframes ficam nas páginas do arquivo mapeado, divididas entre
+# todos (ver snapshot.ler_snapshot e benchmarks/memoria_processos.py)
+MEMORIA_COMPARTILHADA = os.environ.get("ZOMATO_MEMORIA_COMPARTILHADA", "0") == "1"
+
+# Painel de instrumentação na sidebar (tempo de cada filtro, agregação, gráfico e renderização do
+# rerun) para todas as sessões; com "0" ele ainda pode ser ligado por sessão com ?debug=1 na URL
+INSTRUMENTACAO = os.environ.get("ZOMATO_INSTRUMENTACAO", "0") == "1"
+
+# Contagens distintas aproximadas nas métricas da Home: com "1" restaurantes e culinárias saem da
+# união de esboços HyperLogLog por país, cidade e culinária (utils.hll) quando a página não copia
+# as linhas filtradas (mapa de clusters, sem busca por nome nem faixa de preço), com o erro padrão relativo
+# de ZOMATO_ERRO_CONTAGEM (menor erro = mais memória: 0,025 usa 2 KB por partição e coluna, ~7 MB
+# por coluna no zomato.csv). Com 0,05 (512 bytes) o hash fixo dá azar nos ids do zomato.csv e a
+# contagem de restaurantes sem filtro erra 8%, quase o dobro do erro padrão; com 0,025 erra 0,5%
+CONTAGEM_APROXIMADA = os.environ.get("ZOMATO_CONTAGEM_APROXIMADA", "0") == "1"
+ERRO_CONTAGEM = float(os.environ.get("ZOMATO_ERRO_CONTAGEM", "0.025"))
+
+# ==================================================================================================================================================================#
+#                                                                     CARREGAMENTO
+# ==================================================================================================================================================================#
+def carregar_base():
+    ''' Lê e limpa o zomato.csv, sem cache (usado pelo _carregar_base e pela API, utils.api).
+
+        Quando existe um snapshot Feather do CSV atual ele é lido no lugar da limpeza completa.
+        Os arquivos de PASTA_NOVOS são aplicados por cima dele (ver utils.ingestao).
+
+        CSVs maiores que LIMITE_LEITURA_UNICA_MB são limpos em blocos direto para o snapshot
+        (utils.blocos), sem carregar o arquivo inteiro na memória; com ZOMATO_PROCESSOS > 1
+        os blocos são divididos entre processos (utils.paralelo).
+
+        Com vários servidores na mesma máquina só o primeiro constrói o snapshot (os outros
+        esperam a trava e leem o arquivo pronto); com MEMORIA_COMPARTILHADA os dataframes
+        ficam no arquivo mapeado, sem uma cópia por processo.
+    '''
+    with snapshot.trava(CAMINHO_CSV):
+        grande = CAMINHO_CSV.stat().st_size > LIMITE_LEITURA_UNICA_MB * 1024 ** 2
+        if grande and snapshot.feather is not None and not snapshot.snapshot_valido(CAMINHO_CSV):
+            if PROCESSOS_LIMPEZA > 1:
+                gravar_snapshot_em_paralelo(CAMINHO_CSV, PROCESSOS_LIMPEZA)
+            else:
+                gravar_snapshot_em_blocos(CAMINHO_CSV)
+
+        return BaseIncremental(*snapshot.carregar(CAMINHO_CSV, limpar_base, MEMORIA_COMPARTILHADA))
+
+@st.cache_resource(show_spinner="Carregando dados...")
+def _carregar_base():
+    ''' Lê e limpa o zomato.csv uma única vez por processo (carregar_base).
+
+        O st.cache_resource guarda o próprio objeto (sem pickle e sem cópia por chamada),
+        então todas as páginas e sessões do servidor compartilham os mesmos dataframes.
+    '''
+    return carregar_base()
+
+@instrumentar("carga")
+def load_data():
+    ''' Retorna os dataframes limpos compartilhados pelo processo.
+
+        Antes, aplica os arquivos novos de PASTA_NOVOS (upsert por restaurant_id); sem arquivos
+        novos a verificação é só uma listagem da pasta.
+
+        Cada chamada devolve cópias rasas (views) dos dataframes em cache. Com o copy-on-write
+        ligado, elas não ocupam memória extra e qualquer alteração feita pela página fica
+        restrita à própria view, deixando os dados compartilhados intactos.
+
+        Retorno: Tupla (df_limpo, ponte) - ver utils.culinarias para o uso da ponte
+    '''
+    base = _carregar_base()
+    base.sincronizar(PASTA_NOVOS)
+
+    df1, ponte = base.frames
+    return df1.copy(deep=False), ponte.copy(deep=False)
+
+def versao_dados(df):
+    ''' Versão da base de onde o data frame veio (muda a cada arquivo novo aplicado). '''
+    return df.attrs.get("versao", 0)
+
+# Os parâmetros com "_" não entram na chave do st.cache_resource: a chave é só a versão,
+# e as duas versões mais recentes ficam em memória enquanto sessões antigas terminam o rerun.
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _indice(_df1, _ponte, versao):
+    return IndiceFiltros(_df1, _ponte)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _grade(_df1, versao):
+    return GradeEspacial(_df1)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _melhores(_df1, _ponte, versao):
+    return MelhoresPorCulinaria(_df1, _ponte)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _cubo(_df1, _ponte, versao):
+    filtros = [consulta.filtro for consulta in CONSULTAS_CIDADES.values() if consulta.filtro is not None]
+    return CuboOLAP(_df1, _ponte, filtros)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _esbocos(_df1, _ponte, versao, erro):
+    return EsbocosDistintos(_df1, _ponte, erro=erro)
+
+@instrumentar("carga")
+def load_index(df1, ponte):
+    ''' Retorna o índice dos filtros da sidebar para os dataframes devolvidos por load_data,
+        construído uma vez por versão da base.
+    '''
+    return _indice(df1, ponte, versao_dados(df1))
+
+@instrumentar("carga")
+def load_grade(df1):
+    ''' Retorna a grade espacial do mapa (códigos de Morton e clusters pré-agregados por zoom),
+        construída uma vez por versão da base a partir da latitude/longitude do df_limpo.
+    '''
+    return _grade(df1, versao_dados(df1))
+
+@instrumentar("carga")
+def load_melhores(df1, ponte):
+    ''' Retorna as listas de restaurantes de cada culinária ordenadas por (nota, votos), usadas
+        nos rankings da Visão Restaurantes, construídas uma vez por versão da base.
+    '''
+    return _melhores(df1, ponte, versao_dados(df1))
+
+@instrumentar("carga")
+def load_cubo(df1, ponte):
+    ''' Retorna o cubo pré-agregado (utils.cubo) dos gráficos das páginas, construído uma vez
+        por versão da base, com os filtros das consultas de CONSULTAS_CIDADES.
+    '''
+    return _cubo(df1, ponte, versao_dados(df1))
+
+@instrumentar("carga")
+def load_esbocos(df1, ponte):
+    ''' Retorna os esboços HyperLogLog das contagens distintas (utils.hll), construídos uma vez
+        por versão da base, ou None com CONTAGEM_APROXIMADA desligada.
+    '''
+    if not CONTAGEM_APROXIMADA:
+        return None
+    return _esbocos(df1, ponte, versao_dados(df1), ERRO_CONTAGEM)
+
+def chave_mapa(df):
+    ''' Chave do mapa no cache: versão da base e conjunto de restaurantes exibidos. '''
+    return "mapa", versao_dados(df), chave_posicoes(df.index)
+
+@st.cache_resource(show_spinner=False)
+def load_cache():
+    ''' Retorna o cache dos valores derivados (HTML dos mapas, agregados por filtro), um só por
+        processo e compartilhado por todas as páginas e sessões.
+
+        Todos os valores dividem o mesmo limite de memória (CACHE_MB); ao passar dele, os usados
+        há mais tempo são descartados. Cada chave começa pelo nome do valor, ex.: ("mapa", ...).
+        Os contadores de acertos, faltas e descartes ficam em load_cache().estatisticas().
+    '''
+    return CacheLRU(max_itens=1024, max_bytes=CACHE_MB * 1024 ** 2)
+
+@st.cache_resource(show_spinner="Preparando o mapa...")
+def load_mapas():
+    ''' Retorna o cache compartilhado (load_cache) com o HTML do mapa sem filtros da Home, que
+        é montado aqui, na primeira execução do processo.
+
+        A chave de cada mapa é o conjunto de restaurantes exibidos (chave_mapa do data frame
+        filtrado), então reruns sem mudança no resultado e filtros diferentes com o mesmo
+        resultado reaproveitam o mesmo HTML.
+    '''
+    df1, _ = _carregar_base().frames
+
+    cache = load_cache()
+    cache.set(chave_mapa(df1), html_mapa(df1))
+
+    return cache
+
+# ==================================================================================================================================================================#
+#                                                                     INSTRUMENTAÇÃO
+# ==================================================================================================================================================================#
+def iniciar_instrumentacao():
+    ''' Começa o rastreio do rerun (utils.instrumentacao) quando a instrumentação está ligada:
+        para todos com ZOMATO_INSTRUMENTACAO=1 ou só na sessão aberta com ?debug=1.
+
+        Retorno: Rastreio ou None (desligada: os trechos não medem nada)
+    '''
+    return instrumentacao.iniciar("Zomato Dashboard", INSTRUMENTACAO or st.query_params.get("debug") == "1")
+
+def painel_instrumentacao(rastreio):
+    ''' Mostra o painel de depuração do rerun na sidebar, com os contadores do load_cache. '''
+    if rastreio is not None:
+        instrumentacao.painel(rastreio, load_cache().estatisticas())
+
+# ==================================================================================================================================================================#
+#                                                                     RELATÓRIO DE MEMÓRIA
+# ==================================================================================================================================================================#
+if __name__ == "__main__":
+    # Uso: python -m utils.data  (mostra a memória antes e depois do ESQUEMA)
+    df_bruto = pd.read_csv(CAMINHO_CSV)
+
+    antes, _ = limpar_dados(df_bruto, compactar=False)
+    depois, ponte = limpar_dados(df_bruto)
+
+    print("df_limpo")
+    print(relatorio_memoria(antes, depois).to_string(float_format="{:,.1f}".format))
+    print(f"\nponte: {ponte.memory_usage(deep=True, index=False).sum():,} bytes")
@@ -0,0 +1,140 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import numpy as np
+import pandas as pd
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Bits por eixo do código de Morton (grade de 2^20 x 2^20 células no nível mais fino)
+NIVEL_MAX = 20
+
+# Cada tile de 256px do mapa é dividido em 2^2 x 2^2 células, ou seja, clusters de ~64px
+BITS_POR_TILE = 2
+
+# A partir deste zoom o mapa recebe os restaurantes individuais em vez dos clusters
+ZOOM_PONTOS = 12
+
+# Latitude máxima da projeção Web Mercator usada pelos tiles do mapa
+LATITUDE_MAX = 85.05112878
+
+# ==================================================================================================================================================================#
+#                                                                     CÓDIGO DE MORTON
+# ==================================================================================================================================================================#
+def _espalhar_bits(valores):
+    ''' Intercala zeros entre os bits (0b111 -> 0b10101), preparando a combinação de x e y. '''
+    v = valores.astype(np.uint64)
+    for deslocamento, mascara in (
+        (16, 0x0000FFFF0000FFFF),
+        (8, 0x00FF00FF00FF00FF),
+        (4, 0x0F0F0F0F0F0F0F0F),
+        (2, 0x3333333333333333),
+        (1, 0x5555555555555555),
+    ):
+        v = (v | (v << np.uint64(deslocamento))) & np.uint64(mascara)
+    return v
+
+def codigo_morton(latitude, longitude):
+    ''' Converte coordenadas em códigos de Morton (curva Z) na grade Web Mercator.
+
+        Os NIVEL_MAX * 2 bits formam uma hierarquia: descartar os 2 últimos bits dá a célula
+        do nível acima, então a célula de qualquer zoom sai de um único deslocamento de bits.
+    '''
+    lat = np.clip(np.asarray(latitude, dtype=np.float64), -LATITUDE_MAX, LATITUDE_MAX)
+    lon = np.clip(np.asarray(longitude, dtype=np.float64), -180.0, 180.0)
+
+    x = (lon + 180.0) / 360.0
+    seno = np.sin(np.radians(lat))
+    y = 0.5 - np.log((1 + seno) / (1 - seno)) / (4 * np.pi)
+
+    lado = 1 << NIVEL_MAX
+    celula_x = np.clip((x * lado).astype(np.int64), 0, lado - 1)
+    celula_y = np.clip((y * lado).astype(np.int64), 0, lado - 1)
+
+    return _espalhar_bits(celula_x) | (_espalhar_bits(celula_y) << np.uint64(1))
+
+def bits_do_zoom(zoom):
+    ''' Bits por eixo da grade de clusters usada em cada zoom do mapa. '''
+    return int(min(max(zoom, 0) + BITS_POR_TILE, NIVEL_MAX))
+
+# ==================================================================================================================================================================#
+#                                                                     GRADE ESPACIAL
+# ==================================================================================================================================================================#
+class GradeEspacial:
+    ''' Agregação espacial dos restaurantes feita no servidor.
+
+        Guarda um código de Morton por restaurante e, para o dataset sem filtros, a tabela de
+        clusters de cada zoom abaixo de ZOOM_PONTOS. Com filtros os clusters são calculados
+        só sobre os restaurantes filtrados e visíveis, sem percorrer o dataframe.
+    '''
+
+    def __init__(self, df1):
+        self.latitude = df1["latitude"].to_numpy(dtype=np.float64)
+        self.longitude = df1["longitude"].to_numpy(dtype=np.float64)
+        self.nota = df1["aggregate_rating"].to_numpy(dtype=np.float64)
+
+        self.cor_codigo, self.cores = pd.factorize(df1["color"].astype(str))
+        self.morton = codigo_morton(self.latitude, self.longitude)
+
+        todos = np.arange(len(df1))
+        self.pre_agregado = {zoom: self._agregar(todos, zoom) for zoom in range(ZOOM_PONTOS)}
+
+    def _agregar(self, posicoes, zoom):
+        ''' Agrupa as posições nas células do zoom: quantidade, centro, nota média e cor mais comum. '''
+        colunas = ["latitude", "longitude", "restaurantes", "nota_media", "cor"]
+        if len(posicoes) == 0:
+            return pd.DataFrame(columns=colunas)
+
+        deslocamento = np.uint64(2 * (NIVEL_MAX - bits_do_zoom(zoom)))
+        _, celula = np.unique(self.morton[posicoes] >> deslocamento, return_inverse=True)
+        total_celulas = int(celula.max()) + 1
+
+        quantidade = np.bincount(celula, minlength=total_celulas)
+
+        # Cor dominante: contagem por (célula, cor) e a cor de maior contagem em cada célula
+        total_cores = len(self.cores)
+        por_cor = np.bincount(celula * total_cores + self.cor_codigo[posicoes], minlength=total_celulas * total_cores)
+        cor = self.cores[por_cor.reshape(total_celulas, total_cores).argmax(axis=1)]
+
+        return pd.DataFrame({
+            "latitude": np.bincount(celula, self.latitude[posicoes], total_celulas) / quantidade,
+            "longitude": np.bincount(celula, self.longitude[posicoes], total_celulas) / quantidade,
+            "restaurantes": quantidade,
+            "nota_media": np.bincount(celula, self.nota[posicoes], total_celulas) / quantidade,
+            "cor": np.asarray(cor),
+        }, columns=colunas)
+
+    def _dentro(self, latitude, longitude, limites):
+        ''' Máscara das coordenadas dentro de ((lat_sul, lon_oeste), (lat_norte, lon_leste)). '''
+        (sul, oeste), (norte, leste) = limites
+        dentro = (latitude >= sul) & (latitude <= norte)
+        if oeste <= leste:
+            return dentro & (longitude >= oeste) & (longitude <= leste)
+        # Viewport cruzando o antimeridiano
+        return dentro & ((longitude >= oeste) | (longitude <= leste))
+
+    def posicoes_visiveis(self, mascara=None, limites=None):
+        ''' Posições dos restaurantes filtrados (mascara None = todos) dentro do viewport. '''
+        posicoes = np.arange(len(self.morton)) if mascara is None else np.flatnonzero(mascara)
+        if limites is not None:
+            posicoes = posicoes[self._dentro(self.latitude[posicoes], self.longitude[posicoes], limites)]
+        return posicoes
+
+    def clusters(self, zoom, mascara=None, limites=None):
+        ''' Clusters visíveis no zoom e viewport informados.
+
+            Parâmetros: zoom do mapa, máscara booleana dos restaurantes filtrados (None = todos)
+                        e limites ((lat_sul, lon_oeste), (lat_norte, lon_leste)) do viewport
+
+            Retorno: Data frame com latitude, longitude, restaurantes, nota_media e cor por cluster
+        '''
+        zoom = int(min(max(zoom, 0), ZOOM_PONTOS - 1))
+
+        if mascara is None:
+            tabela = self.pre_agregado[zoom]
+            if limites is not None:
+                tabela = tabela[self._dentro(tabela["latitude"].to_numpy(), tabela["longitude"].to_numpy(), limites)]
+            return tabela.reset_index(drop=True)
+
+        return self._agregar(self.posicoes_visiveis(mascara, limites), zoom)
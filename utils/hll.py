@@ -0,0 +1,166 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import math
+
+import numpy as np
+import pandas as pd
+
+from utils.instrumentacao import instrumentar
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Limites da precisão (log2 da quantidade de registros): 16 a 65.536 registros por esboço
+PRECISAO_MIN = 4
+PRECISAO_MAX = 16
+
+# Partições dos esboços: cada par (restaurante, culinária) da ponte cai na partição do seu país,
+# cidade e culinária
+PARTICOES = ("country_name", "city", "cuisines")
+
+# ==================================================================================================================================================================#
+#                                                                     HYPERLOGLOG
+# ==================================================================================================================================================================#
+def precisao_para_erro(erro):
+    ''' Menor precisão p cujo erro padrão (1,04 / raiz de 2^p) fica abaixo do erro pedido. '''
+    if not 0 < erro < 1:
+        raise ValueError(f"erro relativo deve estar entre 0 e 1, não {erro!r}")
+    return min(PRECISAO_MAX, max(PRECISAO_MIN, math.ceil(math.log2((1.04 / erro) ** 2))))
+
+def _bits(valores):
+    ''' Quantidade de bits significativos de cada uint64 (0 para o zero). '''
+    # Em duas metades de 32 bits, que o float64 representa sem arredondar
+    alto = (valores >> np.uint64(32)).astype(np.float64)
+    baixo = (valores & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(alto > 0, 32 + np.frexp(alto)[1], np.frexp(baixo)[1])
+
+def posicoes_e_postos(valores, precisao):
+    ''' Registro de cada valor (primeiros p bits do hash) e o posto: posição do primeiro bit 1
+        nos 64 - p bits restantes.
+    '''
+    hashes = pd.util.hash_array(np.asarray(valores))
+    resto = 64 - precisao
+    registro = (hashes >> np.uint64(resto)).astype(np.int64)
+    posto = resto - _bits(hashes & np.uint64((1 << resto) - 1)) + 1
+    return registro, posto.astype(np.uint8)
+
+def estimar(registros):
+    ''' Estimativa da quantidade de distintos de um esboço (ou de uma matriz, um por linha). '''
+    registros = np.asarray(registros)
+    m = registros.shape[-1]
+    alfa = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+
+    estimativa = alfa * m * m / np.ldexp(1.0, -registros.astype(np.int64)).sum(axis=-1)
+    vazios = (registros == 0).sum(axis=-1)
+
+    # Poucos distintos: contagem linear dos registros vazios (hash de 64 bits, sem correção para muitos)
+    with np.errstate(divide="ignore"):
+        linear = m * np.log(m / np.maximum(vazios, 1))
+    estimativa = np.where((estimativa <= 2.5 * m) & (vazios > 0), linear, estimativa)
+
+    return np.rint(estimativa).astype(np.int64)
+
+class HyperLogLog:
+    ''' Esboço de cardinalidade: m = 2^p registros de um byte com o maior posto visto em cada um.
+
+        Dois esboços se unem pelo máximo registro a registro (o resultado é o esboço da união dos
+        conjuntos), então contagens distintas de partes podem ser somadas sem dupla contagem.
+        Erro padrão relativo de 1,04 / raiz de m.
+    '''
+
+    def __init__(self, precisao, registros=None):
+        self.precisao = precisao
+        self.registros = np.zeros(1 << precisao, dtype=np.uint8) if registros is None else registros
+
+    @classmethod
+    def com_erro(cls, erro):
+        return cls(precisao_para_erro(erro))
+
+    @property
+    def erro(self):
+        return 1.04 / math.sqrt(len(self.registros))
+
+    def adicionar(self, valores):
+        registro, posto = posicoes_e_postos(valores, self.precisao)
+        np.maximum.at(self.registros, registro, posto)
+        return self
+
+    def unir(self, outro):
+        if outro.precisao != self.precisao:
+            raise ValueError("só esboços com a mesma precisão podem ser unidos")
+        return HyperLogLog(self.precisao, np.maximum(self.registros, outro.registros))
+
+    def estimar(self):
+        return int(estimar(self.registros))
+
+# ==================================================================================================================================================================#
+#                                                                     ESBOÇOS POR PARTIÇÃO
+# ==================================================================================================================================================================#
+class EsbocosDistintos:
+    ''' Um HyperLogLog por partição (país, cidade, culinária) para cada coluna contada, montados
+        uma vez no carregamento a partir dos pares da ponte.
+
+        Uma contagem distinta filtrada é a união dos esboços das partições selecionadas: um
+        restaurante com várias culinárias escolhidas entra em várias partições, mas é contado
+        uma vez. Países e cidades, que são as próprias partições, são contados exatamente.
+
+        Memória: partições × 2^p bytes por coluna (p = precisao_para_erro(erro)).
+    '''
+
+    def __init__(self, df1, ponte, colunas=("restaurant_id", "cuisines"), erro=0.05):
+        self.precisao = precisao_para_erro(erro)
+        m = 1 << self.precisao
+
+        # Partição de cada par pelos códigos (país, cidade, culinária); nulos com código próprio
+        restaurante = ponte["restaurante"].to_numpy()
+        codigos, self.valores = [], {}
+        for dimensao, serie in zip(PARTICOES, (df1["country_name"], df1["city"], ponte["cuisines"])):
+            codigo, self.valores[dimensao] = pd.factorize(serie)
+            codigo = np.where(codigo < 0, len(self.valores[dimensao]), codigo)
+            codigos.append(codigo if dimensao == "cuisines" else codigo[restaurante])
+        tamanhos = [len(self.valores[d]) + 1 for d in PARTICOES]
+        chaves, particao = np.unique(np.ravel_multi_index(codigos, tamanhos), return_inverse=True)
+        self.particoes = dict(zip(PARTICOES, np.unravel_index(chaves, tamanhos)))
+        self.total = len(chaves)
+
+        self.esbocos, self._todas = {}, {}
+        for coluna in colunas:
+            registro, posto = posicoes_e_postos(df1[coluna].to_numpy(), self.precisao)
+            registros = np.zeros(self.total * m, dtype=np.uint8)
+            np.maximum.at(registros, particao * m + registro[restaurante], posto[restaurante])
+            self.esbocos[coluna] = registros.reshape(self.total, m)
+            # União de todas as partições, pronta para o caso sem filtro
+            self._todas[coluna] = self.esbocos[coluna].max(axis=0)
+
+    @property
+    def erro(self):
+        return 1.04 / math.sqrt(1 << self.precisao)
+
+    def selecao(self, paises=None, cidades=None, culinarias=None):
+        ''' Máscara das partições pelos filtros, ou None sem filtro (listas vazias ou com todos
+            os valores, como no IndiceFiltros).
+        '''
+        selecao = None
+        for dimensao, selecionados in zip(PARTICOES, (paises, cidades, culinarias)):
+            if selecionados and not set(selecionados).issuperset(self.valores[dimensao]):
+                codigos = np.append(self.valores[dimensao].isin(list(selecionados)), False)
+                parcial = codigos[self.particoes[dimensao]]
+                selecao = parcial if selecao is None else selecao & parcial
+        return selecao
+
+    @instrumentar("agregacao")
+    def estimar(self, coluna, selecao=None):
+        ''' Distintos aproximados da coluna nas partições da seleção (None = todas). '''
+        if selecao is None:
+            return int(estimar(self._todas[coluna]))
+
+        registros = self.esbocos[coluna][selecao]
+        if not len(registros):
+            return 0
+        return int(estimar(registros.max(axis=0)))
+
+    def contar(self, dimensao, selecao=None):
+        ''' Valores distintos (exatos) de uma dimensão das partições da seleção. '''
+        codigos = self.particoes[dimensao] if selecao is None else self.particoes[dimensao][selecao]
+        return int(np.count_nonzero(np.unique(codigos) < len(self.valores[dimensao])))
@@ -0,0 +1,116 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import numpy as np
+import pandas as pd
+
+from utils.instrumentacao import instrumentar
+
+# ==================================================================================================================================================================#
+#                                                                     ÍNDICE DOS FILTROS
+# ==================================================================================================================================================================#
+class IndiceFiltros:
+    ''' Índice construído uma vez no carregamento para responder aos filtros da sidebar
+        sem copiar nem varrer o dataframe inteiro a cada rerun.
+
+        - país, cidade e culinária: lista ordenada das posições dos restaurantes de cada valor
+        - preço: posições ordenadas pelo custo em R$, para achar uma faixa com busca binária
+
+        Cada filtro vira uma máscara booleana (um byte por restaurante) montada só a partir
+        das posições selecionadas, e os filtros são combinados com "&". Filtros vazios ou que
+        selecionam todos os valores não geram máscara nenhuma.
+    '''
+
+    def __init__(self, df1, ponte):
+        self.total = len(df1)
+
+        self.paises = self._posicoes_por_valor(df1["country_name"], np.arange(self.total))
+        self.cidades = self._posicoes_por_valor(df1["city"], np.arange(self.total))
+        self.culinarias = self._posicoes_por_valor(ponte["cuisines"], ponte["restaurante"].to_numpy())
+
+        preco = df1["average_cost_for_two_real"].to_numpy(dtype=np.float64)
+        # NaN vai para o fim da ordenação e nunca entra numa faixa de preço
+        self.ordem_preco = np.argsort(preco, kind="stable").astype(np.int32)
+        self.preco_ordenado = preco[self.ordem_preco]
+        self.precos_validos = int(np.count_nonzero(~np.isnan(preco)))
+
+    @staticmethod
+    def _posicoes_por_valor(serie, posicoes):
+        ''' Agrupa as posições por valor: {valor: array ordenado e sem repetição de posições}. '''
+        codigos, valores = pd.factorize(serie)
+        ordem = np.argsort(codigos, kind="stable")
+        limites = np.searchsorted(codigos[ordem], np.arange(len(valores) + 1))
+
+        return {
+            valores[i]: np.unique(posicoes[ordem[limites[i]:limites[i + 1]]]).astype(np.int32)
+            for i in range(len(valores))
+        }
+
+    def _mascara_valores(self, listas, selecionados):
+        ''' Máscara dos restaurantes com algum dos valores selecionados (None = sem filtro). '''
+        if not selecionados:
+            return None
+
+        selecionados = set(selecionados)
+        if selecionados.issuperset(listas):
+            return None
+
+        mascara = np.zeros(self.total, dtype=bool)
+        for valor in selecionados:
+            posicoes = listas.get(valor)
+            if posicoes is not None:
+                mascara[posicoes] = True
+
+        return mascara
+
+    def _mascara_preco(self, preco):
+        if preco is None:
+            return None
+
+        minimo, maximo = preco
+        inicio = np.searchsorted(self.preco_ordenado[:self.precos_validos], minimo, side="left")
+        fim = np.searchsorted(self.preco_ordenado[:self.precos_validos], maximo, side="right")
+        if inicio == 0 and fim == self.total:
+            return None
+
+        mascara = np.zeros(self.total, dtype=bool)
+        mascara[self.ordem_preco[inicio:fim]] = True
+
+        return mascara
+
+    @instrumentar("filtro")
+    def mascara(self, paises=None, cidades=None, culinarias=None, preco=None):
+        ''' Combina os filtros numa única máscara booleana por restaurante.
+
+            Parâmetros: listas de países, cidades e culinárias (vazias = todos) e
+                        tupla (mínimo, máximo) do custo em R$, com os extremos inclusos
+
+            Retorno: Array booleano com uma posição por restaurante, ou None quando
+                     nenhum filtro restringe o resultado
+        '''
+        resultado = None
+
+        for parcial in (
+            self._mascara_valores(self.paises, paises),
+            self._mascara_valores(self.cidades, cidades),
+            self._mascara_valores(self.culinarias, culinarias),
+            self._mascara_preco(preco),
+        ):
+            if parcial is None:
+                continue
+            resultado = parcial if resultado is None else resultado & parcial
+
+        return resultado
+
+    @instrumentar("filtro")
+    def filtrar(self, df1, **filtros):
+        ''' Aplica os filtros e retorna as linhas selecionadas do df_limpo.
+
+            Sem filtros ativos retorna uma view do próprio df_limpo (sem cópia); caso contrário
+            copia só as linhas selecionadas.
+        '''
+        mascara = self.mascara(**filtros)
+        if mascara is None:
+            return df1.copy(deep=False)
+
+        return df1.take(np.flatnonzero(mascara))
@@ -0,0 +1,308 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import os
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from utils.culinarias import montar_ponte
+from utils.limpeza import (
+    converter_tipos,
+    estatisticas_dos_tipos,
+    estatisticas_esquema,
+    inserir_recomendacao,
+    juntar_estatisticas,
+    preparar_linhas,
+    rotulo_outlier,
+    tipos_esquema,
+)
+
+# ==================================================================================================================================================================#
+#                                                                     HISTOGRAMA DE VOTOS
+# ==================================================================================================================================================================#
+class HistogramaVotos:
+    ''' Contagem de restaurantes por quantidade de votos.
+
+        É um resumo exato e combinável dos votos: restaurantes entram e saem sem reler o resto
+        da base, dois histogramas se somam com juntar() e os quantis saem da contagem acumulada
+        com a mesma interpolação linear do pandas (Series.quantile e Series.median).
+    '''
+
+    def __init__(self, votos=()):
+        self.contagens = Counter()
+        self.total = 0
+        self.adicionar(votos)
+
+    def __len__(self):
+        return self.total
+
+    @staticmethod
+    def _contar(votos):
+        votos = pd.to_numeric(pd.Series(np.asarray(votos)), errors="coerce").dropna()
+        valores, contagens = np.unique(votos.to_numpy(dtype=np.float64), return_counts=True)
+        return zip(valores.tolist(), contagens.tolist())
+
+    def adicionar(self, votos):
+        for valor, quantidade in self._contar(votos):
+            self.contagens[valor] += quantidade
+            self.total += quantidade
+
+    def remover(self, votos):
+        for valor, quantidade in self._contar(votos):
+            restante = self.contagens[valor] - quantidade
+            if restante < 0:
+                raise ValueError(f"remoção de {quantidade} restaurantes com {valor} votos, mas só há {self.contagens[valor]}")
+            if restante:
+                self.contagens[valor] = restante
+            else:
+                del self.contagens[valor]
+            self.total -= quantidade
+
+    def juntar(self, outro):
+        ''' Histograma com os votos dos dois (ex.: resumos calculados em partes da base). '''
+        resultado = HistogramaVotos()
+        resultado.contagens = self.contagens + outro.contagens
+        resultado.total = self.total + outro.total
+        return resultado
+
+    def _valores(self, posicoes):
+        ''' Valores nas posições (0..total-1) da lista ordenada de votos. '''
+        valores = np.array(sorted(self.contagens), dtype=np.float64)
+        acumulado = np.cumsum([self.contagens[v] for v in valores.tolist()])
+        return valores[np.searchsorted(acumulado, posicoes, side="right")]
+
+    def quantil(self, q):
+        if self.total == 0:
+            return np.nan
+
+        # Mesma posição virtual e interpolação do numpy (método "linear")
+        posicao = min(max(self.total * q + (1 - q) - 1, 0), self.total - 1)
+        anterior = int(np.floor(posicao))
+        fracao = posicao - anterior
+        a, b = self._valores([anterior, min(anterior + 1, self.total - 1)])
+
+        if fracao >= 0.5:
+            return float(b - (b - a) * (1 - fracao))
+        return float(a + (b - a) * fracao)
+
+    def mediana(self):
+        if self.total == 0:
+            return np.nan
+
+        meio = self.total // 2
+        if self.total % 2:
+            return float(self._valores([meio])[0])
+        a, b = self._valores([meio - 1, meio])
+        return float((a + b) / 2)
+
+# ==================================================================================================================================================================#
+#                                                                     BASE INCREMENTAL
+# ==================================================================================================================================================================#
+def _ids_brutos(df_bruto):
+    ''' Restaurant IDs de um arquivo no formato do zomato.csv, antes de qualquer limpeza. '''
+    nomes = df_bruto.columns.str.lower().str.strip().str.replace(' ', '_')
+    return pd.to_numeric(df_bruto.iloc[:, list(nomes).index("restaurant_id")]).unique()
+
+class BaseIncremental:
+    ''' Dataframes limpos que aceitam novos arquivos de restaurantes sem refazer a limpeza.
+
+        Cada arquivo (mesmo formato do zomato.csv) é aplicado como upsert por restaurant_id:
+        as linhas dos ids presentes no arquivo são trocadas pelas novas e ids novos entram no
+        final da base. Só as linhas do arquivo passam pela limpeza; o que depende da base toda
+        é atualizado a partir de resumos:
+          - quartis de votos da recomendação: HistogramaVotos (a coluna inteira só é recalculada
+            quando o 3º quartil ou a mediana mudam)
+          - outlier de preço da Austrália: a linha removida fica guardada em "excluidos" e
+            volta para a base se um restaurante mais caro chegar
+          - ponte de culinárias: as posições dos restaurantes mantidos são remapeadas e só os
+            restaurantes novos são quebrados por culinária
+          - tipos compactos: as linhas novas são convertidas para os tipos da base (ampliados só
+            quando não cabem, ex.: culinária nova nas categorias); a base não passa de novo
+            pelo aplicar_esquema
+
+        O par (df1, ponte) é trocado de uma vez a cada arquivo aplicado e recebe um novo número
+        de versão em df1.attrs["versao"]. Os frames publicados não mudam (sessões no meio de um
+        rerun continuam lendo a versão anterior), então a versão nova é uma cópia com as linhas
+        que saem retiradas e as novas anexadas. As estruturas derivadas (IndiceFiltros,
+        GradeEspacial, MelhoresPorCulinaria, CuboOLAP, EsbocosDistintos, mapas e agregados)
+        ficam nos caches pela versão e são montadas de novo, inteiras, para cada versão.
+    '''
+
+    def __init__(self, df1, ponte, excluidos):
+        self.excluidos = excluidos
+        self.votos = HistogramaVotos(np.concatenate([df1["votes"].to_numpy(), excluidos["votes"].to_numpy()]))
+        self.limites = (self.votos.quantil(0.75), self.votos.mediana())
+
+        self.versao = 0
+        self.aplicados = {}
+        self._lock = threading.RLock()
+        self._publicar(df1, ponte)
+
+    def _publicar(self, df1, ponte):
+        df1.attrs["versao"] = self.versao
+        self.frames = (df1, ponte)
+
+    def aplicar_delta(self, df_bruto):
+        ''' Aplica um arquivo de restaurantes novos ou alterados (upsert por restaurant_id).
+
+            Restaurantes do arquivo que a limpeza descarta (ex.: custo zero) saem da base.
+
+            Retorno: Dicionário com a quantidade de ids inseridos, atualizados e removidos,
+                     se os quartis de votos mudaram e a nova versão
+        '''
+        ids = _ids_brutos(df_bruto)
+        novos = preparar_linhas(df_bruto)
+
+        with self._lock:
+            df1, ponte = self.frames
+            sai = df1["restaurant_id"].isin(ids).to_numpy()
+            sai_excluidos = self.excluidos["restaurant_id"].isin(ids).to_numpy()
+
+            existentes = set(df1.loc[sai, "restaurant_id"].tolist()) | set(self.excluidos.loc[sai_excluidos, "restaurant_id"].tolist())
+            entram = set(novos["restaurant_id"].tolist())
+            resumo = {
+                "inseridos": len(entram - existentes),
+                "atualizados": len(entram & existentes),
+                "removidos": len(existentes - entram),
+            }
+
+            # Quartis de votos a partir do histograma: sai o voto das linhas trocadas, entra o das novas
+            self.votos.remover(df1["votes"].to_numpy()[sai])
+            self.votos.remover(self.excluidos["votes"].to_numpy()[sai_excluidos])
+            self.votos.adicionar(novos["votes"].to_numpy())
+
+            limites = (self.votos.quantil(0.75), self.votos.mediana())
+            recalcular = not np.array_equal(limites, self.limites, equal_nan=True)
+            self.limites = limites
+
+            novos = inserir_recomendacao(novos, *limites)
+            mantidos = df1
+            excluidos = self.excluidos[~sai_excluidos]
+            if recalcular:
+                # Cópia rasa: a coluna nova não pode aparecer no df1 já publicado
+                mantidos = inserir_recomendacao(mantidos.copy(deep=False), *limites)
+                excluidos = inserir_recomendacao(excluidos, *limites)
+
+            # Tipos que comportam a base e as linhas novas, sem converter a base de novo: só as
+            # colunas cujo tipo muda (ex.: culinária nova nas categorias) são convertidas nela
+            extras = pd.concat([parte for parte in (excluidos, novos) if len(parte)] or [novos], ignore_index=True)
+            estatisticas = estatisticas_esquema(extras)
+            if recalcular:
+                estatisticas["recomendation"] |= set(mantidos["recomendation"].unique().tolist())
+            tipos = tipos_esquema(juntar_estatisticas(estatisticas_dos_tipos(df1), estatisticas))
+            mudam = {c: t for c, t in tipos.items() if t is not None and mantidos[c].dtype != t}
+            if mudam:
+                mantidos = converter_tipos(mantidos, mudam)
+            extras = converter_tipos(extras, tipos)[df1.columns]
+
+            # O outlier é escolhido de novo entre o anterior e as linhas novas; os restaurantes
+            # mantidos só concorrem quando o outlier anterior saiu da base
+            fica = ~sai
+            outlier = rotulo_outlier(extras)
+            excluido = extras.iloc[:0]
+            if len(self.excluidos) and not len(excluidos):
+                australia = np.flatnonzero(fica & (mantidos["country_name"] == "Australia").to_numpy())
+                custos = mantidos["average_cost_for_two_real"].to_numpy()[australia]
+                # Empate fica com o mantido, que vem antes na ordem da base
+                if len(australia) and (outlier is None or custos.max() >= extras.at[outlier, "average_cost_for_two_real"]):
+                    posicao_outlier = australia[np.argmax(custos)]
+                    fica[posicao_outlier] = False
+                    excluido = mantidos.iloc[[posicao_outlier]]
+                    outlier = None
+            if outlier is not None:
+                excluido = extras.loc[[outlier]]
+                extras = extras.drop(outlier)
+            self.excluidos = excluido.reset_index(drop=True)
+
+            # Só as linhas que saem são retiradas e só as novas são anexadas, já nos tipos da base
+            if not fica.all():
+                mantidos = mantidos[fica]
+            novo_df1 = pd.concat([mantidos, extras], ignore_index=True) if len(extras) else mantidos.reset_index(drop=True)
+
+            # Posição nova de cada restaurante mantido (-1 = saiu da base)
+            posicao = np.full(len(df1), -1, dtype=np.int64)
+            posicao[fica] = np.arange(len(mantidos))
+
+            ponte_mantida = ponte[posicao[ponte["restaurante"].to_numpy()] >= 0]
+            ponte_nova = montar_ponte(novo_df1.iloc[len(mantidos):])
+            culinarias = union_categoricals([ponte_mantida["cuisines"].array, ponte_nova["cuisines"].array], sort_categories=True)
+            # Culinárias que ficaram sem restaurante saem das categorias (contagem dos códigos, sem ordenar os pares)
+            usadas = np.bincount(culinarias.codes, minlength=len(culinarias.categories)) > 0
+            if not usadas.all():
+                culinarias = culinarias.remove_categories(culinarias.categories[~usadas])
+            nova_ponte = pd.DataFrame({
+                "restaurante": np.concatenate([
+                    posicao[ponte_mantida["restaurante"].to_numpy()],
+                    ponte_nova["restaurante"].to_numpy(),
+                ]).astype(np.int32),
+                "cuisines": culinarias,
+            })
+
+            self.versao += 1
+            self._publicar(novo_df1, nova_ponte)
+
+        resumo["quartis_recalculados"] = recalcular
+        resumo["versao"] = self.versao
+        return resumo
+
+    def sincronizar(self, pasta):
+        ''' Aplica, em ordem de nome, os arquivos .csv da pasta ainda não aplicados ou alterados
+            desde a última vez (tamanho ou data de modificação diferentes).
+
+            Retorno: True quando algum arquivo foi aplicado
+        '''
+        try:
+            entradas = sorted((e for e in os.scandir(pasta) if e.name.endswith(".csv")), key=lambda e: e.name)
+        except FileNotFoundError:
+            return False
+
+        aplicou = False
+        with self._lock:
+            for entrada in entradas:
+                info = entrada.stat()
+                assinatura = (info.st_size, info.st_mtime_ns)
+                if self.aplicados.get(entrada.name) == assinatura:
+                    continue
+
+                self.aplicar_delta(pd.read_csv(entrada.path))
+                self.aplicados[entrada.name] = assinatura
+                aplicou = True
+
+        return aplicou
+
+# ==================================================================================================================================================================#
+#                                                                     PUBLICAÇÃO DE ARQUIVOS
+# ==================================================================================================================================================================#
+if __name__ == "__main__":
+    # Uso: python -m utils.ingestao novos.csv
+    # Simula o upsert sobre a base atual, mostra o resumo e publica o arquivo em PASTA_NOVOS;
+    # os servidores aplicam o arquivo no próximo rerun, sem reiniciar.
+    import shutil
+    import sys
+    import time
+    from pathlib import Path
+
+    from utils import snapshot
+    from utils.data import CAMINHO_CSV, PASTA_NOVOS
+    from utils.limpeza import limpar_base
+
+    origem = Path(sys.argv[1])
+
+    base = BaseIncremental(*snapshot.carregar(CAMINHO_CSV, limpar_base))
+    base.sincronizar(PASTA_NOVOS)
+
+    inicio = time.perf_counter()
+    resumo = base.aplicar_delta(pd.read_csv(origem))
+    print(f"Upsert simulado em {time.perf_counter() - inicio:.3f}s: {resumo}")
+
+    # Prefixo com data e hora mantém a ordem de aplicação; a cópia é atômica (.tmp + replace)
+    PASTA_NOVOS.mkdir(parents=True, exist_ok=True)
+    destino = PASTA_NOVOS / f"{time.strftime('%Y%m%d-%H%M%S')}_{origem.stem}.csv"
+    temporario = destino.with_name(destino.name + ".tmp")
+    shutil.copyfile(origem, temporario)
+    os.replace(temporario, destino)
+    print(f"Publicado em {destino}")
@@ -0,0 +1,275 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Tipos dos trechos, na ordem do resumo do painel
+TIPOS = ("pagina", "carga", "filtro", "agregacao", "grafico", "mapa", "render", "cache")
+
+SERVICO = "zomato-dashboard"
+
+# Rastreio do rerun em andamento (cada sessão do Streamlit roda o script na própria thread)
+_local = threading.local()
+
+# ==================================================================================================================================================================#
+#                                                                     TAMANHOS
+# ==================================================================================================================================================================#
+def linhas(valor):
+    ''' Linhas de um data frame ou array (máscara booleana: linhas marcadas), ou None. '''
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return len(valor)
+    if isinstance(valor, np.ndarray):
+        return int(np.count_nonzero(valor)) if valor.dtype == bool else len(valor)
+    if isinstance(valor, tuple):
+        # Ex.: agregados.filtrar devolve (máscara, df filtrado, ponte filtrada)
+        return next((len(v) for v in valor if isinstance(v, pd.DataFrame)), None)
+    return None
+
+def bytes_payload(valor):
+    ''' Bytes enviados ao navegador por um elemento: JSON da figura do Plotly, memória do data
+        frame ou tamanho do HTML. None quando não dá para medir sem renderizar (ex.: folium.Map).
+    '''
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return int(valor.memory_usage(deep=True).sum()) if isinstance(valor, pd.DataFrame) else int(valor.memory_usage(deep=True))
+    if isinstance(valor, str):
+        return len(valor.encode("utf-8"))
+    if isinstance(valor, bytes):
+        return len(valor)
+    if hasattr(valor, "to_plotly_json"):
+        return len(valor.to_json().encode("utf-8"))
+    return None
+
+# ==================================================================================================================================================================#
+#                                                                     RASTREIO
+# ==================================================================================================================================================================#
+class Rastreio:
+    ''' Trechos cronometrados de um rerun: cada trecho tem nome, tipo, início e duração em
+        nanossegundos, o trecho pai (trechos abertos dentro de outro) e atributos como linhas
+        processadas e bytes enviados.
+    '''
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.id = secrets.token_hex(16)
+        self.trechos = []
+        self._pilha = []
+        self._inicio_relogio = time.time_ns()
+        self._inicio = time.perf_counter_ns()
+
+    @contextmanager
+    def trecho(self, nome, tipo, **atributos):
+        ''' Cronometra o bloco; os atributos podem ser completados dentro dele (o dicionário
+            devolvido é o do trecho).
+        '''
+        registro = {
+            "nome": nome,
+            "tipo": tipo,
+            "id": secrets.token_hex(8),
+            "pai": self._pilha[-1]["id"] if self._pilha else None,
+            "nivel": len(self._pilha),
+            "inicio": time.perf_counter_ns() - self._inicio,
+            "duracao": None,
+            "atributos": atributos,
+        }
+        self.trechos.append(registro)
+        self._pilha.append(registro)
+        try:
+            yield atributos
+        except BaseException as erro:
+            # st.rerun/st.stop também passam por aqui: ficam registrados, não são erro da página
+            atributos["interrompido"] = type(erro).__name__
+            raise
+        finally:
+            registro["duracao"] = time.perf_counter_ns() - self._inicio - registro["inicio"]
+            self._pilha.pop()
+
+    def duracao(self):
+        return time.perf_counter_ns() - self._inicio
+
+    def resumo(self):
+        ''' Um trecho por linha, na ordem de início, com o tempo total e o tempo próprio (sem os
+            trechos filhos) em ms. Trechos ainda abertos contam até agora.
+        '''
+        agora = self.duracao()
+        filhos = {}
+        for t in self.trechos:
+            if t["pai"] is not None:
+                filhos[t["pai"]] = filhos.get(t["pai"], 0) + (t["duracao"] if t["duracao"] is not None else agora - t["inicio"])
+
+        linhas_resumo = []
+        for t in self.trechos:
+            duracao = t["duracao"] if t["duracao"] is not None else agora - t["inicio"]
+            linhas_resumo.append({
+                "trecho": "· " * t["nivel"] + t["nome"],
+                "tipo": t["tipo"],
+                "ms": duracao / 1e6,
+                "ms_proprio": (duracao - filhos.get(t["id"], 0)) / 1e6,
+                "linhas": t["atributos"].get("linhas"),
+                "linhas_saida": t["atributos"].get("linhas_saida"),
+                "bytes": t["atributos"].get("bytes"),
+            })
+        return pd.DataFrame(linhas_resumo, columns=["trecho", "tipo", "ms", "ms_proprio", "linhas", "linhas_saida", "bytes"])
+
+    def otel(self):
+        ''' Trechos no formato OTLP/JSON do OpenTelemetry (um resourceSpans com um scopeSpans). '''
+        def valor(v):
+            if isinstance(v, bool):
+                return {"boolValue": v}
+            if isinstance(v, (int, np.integer)):
+                return {"intValue": str(int(v))}
+            if isinstance(v, (float, np.floating)):
+                return {"doubleValue": float(v)}
+            return {"stringValue": str(v)}
+
+        agora = self.duracao()
+        spans = []
+        for t in self.trechos:
+            inicio = self._inicio_relogio + t["inicio"]
+            fim = inicio + (t["duracao"] if t["duracao"] is not None else agora - t["inicio"])
+            atributos = {"zomato.tipo": t["tipo"], **{f"zomato.{k}": v for k, v in t["atributos"].items() if v is not None}}
+            span = {
+                "traceId": self.id,
+                "spanId": t["id"],
+                "name": t["nome"],
+                "kind": 1,
+                "startTimeUnixNano": str(inicio),
+                "endTimeUnixNano": str(fim),
+                "attributes": [{"key": k, "value": valor(v)} for k, v in atributos.items()],
+            }
+            if t["pai"] is not None:
+                span["parentSpanId"] = t["pai"]
+            spans.append(span)
+
+        return {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": SERVICO}},
+                {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+            ]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]}
+
+    def chrome(self):
+        ''' Trechos no formato Trace Event do Chrome (chrome://tracing, Perfetto): eventos
+            completos ("X") com início e duração em microssegundos.
+        '''
+        agora = self.duracao()
+        eventos = [{"name": "process_name", "ph": "M", "pid": os.getpid(), "tid": 0, "args": {"name": self.nome}}]
+        for t in self.trechos:
+            eventos.append({
+                "name": t["nome"],
+                "cat": t["tipo"],
+                "ph": "X",
+                "ts": t["inicio"] / 1e3,
+                "dur": (t["duracao"] if t["duracao"] is not None else agora - t["inicio"]) / 1e3,
+                "pid": os.getpid(),
+                "tid": 0,
+                "args": {k: v for k, v in t["atributos"].items() if v is not None},
+            })
+        return {"traceEvents": eventos, "displayTimeUnit": "ms"}
+
+# ==================================================================================================================================================================#
+#                                                                     API DAS PÁGINAS
+# ==================================================================================================================================================================#
+def iniciar(nome, ativo=True):
+    ''' Começa o rastreio do rerun na thread atual (ativo=False desliga o do rerun anterior).
+
+        Retorno: Rastreio ou None
+    '''
+    _local.atual = Rastreio(nome) if ativo else None
+    return _local.atual
+
+def atual():
+    return getattr(_local, "atual", None)
+
+@contextmanager
+def trecho(nome, tipo, **atributos):
+    ''' Cronometra o bloco no rastreio atual; sem rastreio ligado não faz nada. '''
+    rastreio = atual()
+    if rastreio is None:
+        yield atributos
+        return
+    with rastreio.trecho(nome, tipo, **atributos) as registro:
+        yield registro
+
+def instrumentar(tipo, nome=None):
+    ''' Decorador: cada chamada vira um trecho com as linhas do primeiro data frame ou array
+        recebido ("linhas") e do resultado ("linhas_saida").
+
+        Sem rastreio ligado a função é chamada direto, sem medição.
+    '''
+    def decorador(funcao):
+        modulo = funcao.__module__
+        rotulo = nome or (f"{modulo.rsplit('.', 1)[-1]}.{funcao.__qualname__}" if modulo.startswith("utils.") else funcao.__qualname__)
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            rastreio = atual()
+            if rastreio is None:
+                return funcao(*args, **kwargs)
+
+            entrada = next((linhas(a) for a in args if isinstance(a, (pd.DataFrame, np.ndarray))), None)
+            with rastreio.trecho(rotulo, tipo, linhas=entrada) as atributos:
+                resultado = funcao(*args, **kwargs)
+                atributos["linhas_saida"] = linhas(resultado)
+            return resultado
+
+        return medida
+    return decorador
+
+def renderizar(funcao, valor, *args, **kwargs):
+    ''' Chama um elemento do Streamlit (st.plotly_chart, st.dataframe, components.html,
+        st_folium...) dentro de um trecho "render", com as linhas e os bytes do conteúdo.
+
+        Os bytes são medidos antes do trecho, então não entram no tempo da renderização.
+    '''
+    rastreio = atual()
+    if rastreio is None:
+        return funcao(valor, *args, **kwargs)
+
+    with rastreio.trecho(funcao.__name__, "render", linhas=linhas(valor), bytes=bytes_payload(valor)):
+        return funcao(valor, *args, **kwargs)
+
+# ==================================================================================================================================================================#
+#                                                                     PAINEL
+# ==================================================================================================================================================================#
+def painel(rastreio, estatisticas_cache=None):
+    ''' Painel de depuração na sidebar com os trechos do rerun, o tempo próprio somado por tipo,
+        os contadores do cache e os downloads em OpenTelemetry (JSON) e Chrome trace.
+    '''
+    import streamlit as st
+
+    resumo = rastreio.resumo()
+    por_tipo = resumo.groupby("tipo")["ms_proprio"].sum().reindex(TIPOS).dropna()
+
+    with st.sidebar.expander("🔎 Instrumentação do rerun"):
+        st.metric("Tempo do rerun", f"{rastreio.duracao() / 1e6:,.1f} ms")
+        st.bar_chart(por_tipo.rename("ms próprio"), horizontal=True)
+        st.dataframe(
+            resumo,
+            hide_index=True,
+            column_config={
+                "ms": st.column_config.NumberColumn(format="%.2f"),
+                "ms_proprio": st.column_config.NumberColumn("ms próprio", format="%.2f"),
+                "linhas_saida": st.column_config.NumberColumn("linhas saída"),
+            },
+        )
+
+        if estatisticas_cache is not None:
+            st.caption("Cache compartilhado (load_cache)")
+            st.json(estatisticas_cache, expanded=False)
+
+        nome = f"rerun_{time.strftime('%Y%m%d-%H%M%S')}"
+        st.download_button("OpenTelemetry (JSON)", json.dumps(rastreio.otel()), f"{nome}_otel.json", "application/json", on_click="ignore")
+        st.download_button("Chrome trace", json.dumps(rastreio.chrome()), f"{nome}_chrome.json", "application/json", on_click="ignore")
@@ -0,0 +1,384 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import numpy as np
+import pandas as pd
+
+from utils.culinarias import montar_ponte
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Colunas não usadas no dashboard
+COLUNAS_DESCARTADAS = ["Locality Verbose", "Switch to order menu"]
+
+# Valores de texto que representam ausência de informação
+VALORES_NULOS = ['NaN', 'nan', 'None', 'none', 'NA', 'n/a', 'N/A', '', ' ']
+
+# Nome do país a partir do "country_code"
+COUNTRIES = {
+    1: "India",
+    14: "Australia",
+    30: "Brazil",
+    37: "Canada",
+    94: "Indonesia",
+    148: "New Zealand",
+    162: "Philippines",
+    166: "Qatar",
+    184: "Singapore",
+    189: "South Africa",
+    191: "Sri Lanka",
+    208: "Turkey",
+    214: "United Arab Emirates",
+    215: "United Kingdom",
+    216: "United States of America"
+}
+
+# Cor do marcador a partir do "rating_color"
+COLORS = {
+    "3F7E00": "darkgreen",
+    "5BA829": "green",
+    "9ACD32": "lightgreen",
+    "CDD614": "orange",
+    "FFBA00": "red",
+    "CBCBC8": "darkred",
+    "FF7800": "darkred",
+}
+
+# Classificação de cada range de preço
+CLASSIFICACAO = {
+    1: "cheap",
+    2: "normal",
+    3: "gourmet",
+    4: "caro"
+}
+
+# Conversão de moedas para R$
+CONVERSOES = {
+    'Botswana Pula(P)': 0.41,
+    'Brazilian Real(R$)': 1.0,
+    'Dollar($)': 5.44,
+    'Emirati Diram(AED)': 1.48,
+    'Indian Rupees(Rs.)': 0.065,
+    'Indonesian Rupiah(IDR)': 0.00034,
+    'NewZealand($)': 3.14,
+    'Pounds(£)': 7.25,
+    'Qatari Rial(QR)': 1.49,
+    'Rand(R)': 0.32,
+    'Sri Lankan Rupee(LKR)': 0.018,
+    'Turkish Lira(TL)': 0.13
+}
+
+# Tipos compactos das colunas do dataframe limpo:
+#   "category" - textos repetidos em muitas linhas (guardados uma vez, com códigos inteiros por linha)
+#   "bool"     - flags 0/1
+#   "inteiro"  - menor tipo inteiro que comporta os valores
+#   "float32"  - só é aplicado quando a conversão não altera nenhum valor
+ESQUEMA = {
+    "restaurant_id": "inteiro",
+    "country_code": "inteiro",
+    "city": "category",
+    "cuisines": "category",
+    "average_cost_for_two": "inteiro",
+    "currency": "category",
+    "has_table_booking": "bool",
+    "has_online_delivery": "bool",
+    "is_delivering_now": "bool",
+    "price_range": "inteiro",
+    "aggregate_rating": "float32",
+    "rating_color": "category",
+    "rating_text": "category",
+    "votes": "inteiro",
+    "country_name": "category",
+    "color": "category",
+    "price_type": "category",
+    "recomendation": "category",
+    "average_cost_for_two_real": "float32",
+}
+
+# ==================================================================================================================================================================#
+#                                                                     TIPOS
+# ==================================================================================================================================================================#
+def _float32_sem_perda(serie):
+    ''' True quando a coluna volta idêntica depois de convertida para float32. '''
+    convertida = serie.astype(np.float32).astype(serie.dtype)
+    return bool(((convertida == serie) | (convertida.isna() & serie.isna())).all())
+
+def estatisticas_esquema(df):
+    ''' Resume o que cada coluna do ESQUEMA precisa para escolher o tipo compacto:
+        "category" - conjunto de valores (as categorias)
+        "bool"     - se todos os valores são 0/1
+        "inteiro"  - se todos são inteiros sem nulos, e o mínimo e o máximo
+        "float32"  - se a conversão para float32 é exata
+
+        Os resumos de partes diferentes da base se combinam com juntar_estatisticas, então os
+        tipos podem ser decididos sem ter todas as linhas em memória ao mesmo tempo.
+    '''
+    estatisticas = {}
+
+    for coluna, tipo in ESQUEMA.items():
+        if coluna not in df.columns:
+            continue
+        serie = df[coluna]
+
+        if tipo == "category":
+            estatisticas[coluna] = set(serie.dropna().unique().tolist())
+        elif tipo == "bool":
+            estatisticas[coluna] = bool(serie.isin([0, 1]).all())
+        elif tipo == "inteiro":
+            valores = pd.to_numeric(serie).to_numpy()
+            inteiros = len(valores) > 0 and bool(np.array_equal(valores, valores.astype(np.int64)))
+            estatisticas[coluna] = (inteiros, valores.min(), valores.max()) if inteiros else (False, None, None)
+        elif tipo == "float32":
+            estatisticas[coluna] = _float32_sem_perda(serie)
+
+    return estatisticas
+
+def estatisticas_dos_tipos(df):
+    ''' Resumo (como o de estatisticas_esquema) dos tipos já aplicados ao data frame, tirado
+        só dos dtypes, sem ler as linhas: combinado com o resumo de linhas novas, dá tipos que
+        comportam as duas partes sem converter de novo a base inteira.
+    '''
+    estatisticas = {}
+
+    for coluna, tipo in ESQUEMA.items():
+        if coluna not in df.columns:
+            continue
+        dtype = df[coluna].dtype
+
+        if tipo == "category":
+            estatisticas[coluna] = set(dtype.categories.tolist()) if isinstance(dtype, pd.CategoricalDtype) else set(df[coluna].dropna().unique().tolist())
+        elif tipo == "bool":
+            estatisticas[coluna] = dtype == bool
+        elif tipo == "inteiro":
+            estatisticas[coluna] = (True, np.iinfo(dtype).min, np.iinfo(dtype).max) if dtype.kind == "i" else (False, None, None)
+        elif tipo == "float32":
+            estatisticas[coluna] = dtype == np.float32
+
+    return estatisticas
+
+def juntar_estatisticas(a, b):
+    ''' Combina os resumos de duas partes da base (ver estatisticas_esquema). '''
+    juntas = {}
+
+    for coluna in a.keys() & b.keys():
+        tipo = ESQUEMA[coluna]
+        if tipo == "category":
+            juntas[coluna] = a[coluna] | b[coluna]
+        elif tipo == "inteiro":
+            (inteiros_a, min_a, max_a), (inteiros_b, min_b, max_b) = a[coluna], b[coluna]
+            juntas[coluna] = (inteiros_a and inteiros_b, min(min_a, min_b), max(max_a, max_b)) if inteiros_a and inteiros_b else (False, None, None)
+        else:
+            juntas[coluna] = a[coluna] and b[coluna]
+
+    return juntas
+
+def tipos_esquema(estatisticas):
+    ''' Tipo compacto de cada coluna a partir dos resumos (None = coluna fica como está).
+
+        Inteiros descem até o menor tipo com sinal que comporta o mínimo e o máximo (a mesma
+        regra do pd.to_numeric com downcast="integer") e as categorias ficam em ordem, como
+        no astype("category").
+    '''
+    tipos = {}
+
+    for coluna, resumo in estatisticas.items():
+        tipo = ESQUEMA[coluna]
+        if tipo == "category":
+            tipos[coluna] = pd.CategoricalDtype(sorted(resumo))
+        elif tipo == "bool":
+            tipos[coluna] = np.dtype(bool) if resumo else None
+        elif tipo == "inteiro":
+            inteiros, minimo, maximo = resumo
+            tipos[coluna] = None
+            if inteiros:
+                for candidato in (np.int8, np.int16, np.int32, np.int64):
+                    if np.iinfo(candidato).min <= minimo and maximo <= np.iinfo(candidato).max:
+                        tipos[coluna] = np.dtype(candidato)
+                        break
+        elif tipo == "float32":
+            tipos[coluna] = np.dtype(np.float32) if resumo else None
+
+    return tipos
+
+def converter_tipos(df, tipos):
+    ''' Converte as colunas do data frame para os tipos escolhidos por tipos_esquema. '''
+    df = df.copy()
+
+    for coluna, tipo in tipos.items():
+        if tipo is not None and coluna in df.columns:
+            df[coluna] = df[coluna].astype(tipo)
+
+    return df
+
+def aplicar_esquema(df):
+    ''' Converte as colunas do dataframe para os tipos compactos definidos em ESQUEMA.
+
+        Colunas ausentes são ignoradas e nenhuma conversão perde informação: inteiros só
+        descem até o menor tipo que comporta os valores e float32 só é usado quando é exato.
+
+        Parâmetro: Data frame limpo
+
+        Retorno: Data frame com os tipos convertidos
+    '''
+    return converter_tipos(df, tipos_esquema(estatisticas_esquema(df)))
+
+def relatorio_memoria(antes, depois):
+    ''' Compara o uso de memória por coluna (em bytes, contando o conteúdo dos textos).
+
+        Parâmetros: Data frame antes e depois da aplicação do esquema
+
+        Retorno: Data frame com o tipo e a memória de cada coluna, com a linha "TOTAL" no final
+    '''
+    relatorio = pd.DataFrame({
+        "tipo_antes": antes.dtypes.astype(str),
+        "tipo_depois": depois.dtypes.astype(str),
+        "bytes_antes": antes.memory_usage(deep=True, index=False),
+        "bytes_depois": depois.memory_usage(deep=True, index=False),
+    })
+    relatorio.loc["TOTAL"] = ["", "", relatorio["bytes_antes"].sum(), relatorio["bytes_depois"].sum()]
+    relatorio["reducao_%"] = (1 - relatorio["bytes_depois"] / relatorio["bytes_antes"]) * 100
+
+    return relatorio
+
+# ==================================================================================================================================================================#
+#                                                                     LIMPEZA E FEATURE ENGINEERING
+# ==================================================================================================================================================================#
+def preparar_linhas(df):
+    ''' Etapas da limpeza que dependem só de cada linha (mais a remoção de duplicatas, que
+        compara linhas inteiras e por isso nunca junta restaurantes diferentes):
+        1 - retira as colunas não usadas e as linhas duplicadas
+        2 - padroniza o nome das colunas e substitui os valores de texto nulos por NaN
+        3 - remove os restaurantes sem custo e cria as colunas de país, cor, tipo de preço
+            e custo em R$
+
+        Pode ser aplicada ao CSV inteiro ou só a um arquivo de novos restaurantes.
+
+        Parâmetro: Data frame bruto no formato do zomato.csv
+
+        Retorno: Data frame com as colunas limpas, ainda sem a recomendação
+    '''
+
+    # LIMPEZA E ORGANIZAÇÃO
+
+    # Criar cópia do dataframe e retirar colunas não usadas
+    df1 = df.copy()
+    # Verifica se as colunas existem antes de remover para evitar erros
+    df1 = df1.drop([c for c in COLUNAS_DESCARTADAS if c in df1.columns], axis=1)
+
+    df1.drop_duplicates(inplace=True)
+
+    # Organizar as colunas
+    df1.columns = df1.columns.str.lower().str.strip().str.replace(' ', '_')
+
+    # Preencher Valores nulos de variáveis importantes
+    df1["cuisines"] = df1["cuisines"].fillna("Not Informed")
+
+    # Deletar valores nulos não utilizáveis
+    df1.replace(VALORES_NULOS, np.nan, inplace=True)
+    df1 = df1.loc[df1["average_cost_for_two"] != 0, :]
+
+    # Feature Engineering
+
+    # Criar a coluna: "Country name" , substituindo o código postal pelo nome do país
+    df1["country_name"] = df1["country_code"].map(COUNTRIES)
+
+    # Classificar as cores baseado no "rating_color"
+    df1["color"] = df1["rating_color"].map(COLORS)
+
+    # Criar uma coluna de classificação para cada range de preço
+    df1["price_type"] = df1["price_range"].map(CLASSIFICACAO)
+
+    # Criação de coluna de conversão de moedas para R$ (moedas sem taxa ficam como NaN)
+    df1["average_cost_for_two_real"] = df1["currency"].map(CONVERSOES) * df1["average_cost_for_two"]
+
+    return df1
+
+def classificar_recomendacao(nota, votos, quantil_75, mediana):
+    ''' Recomendação de cada restaurante a partir da nota e dos votos.
+
+        Os limites de votos (3º quartil e mediana) são calculados sobre todos os restaurantes,
+        por isso são recebidos prontos em vez de calculados aqui.
+
+        Retorno: Array de textos com uma recomendação por restaurante
+    '''
+    votos = np.asarray(votos)
+    nota = np.asarray(nota)
+
+    # As condições são avaliadas em ordem, como num if/elif: vale a primeira verdadeira
+    condicoes = [
+        (nota > 4) & (votos > quantil_75),
+        (nota >= 4) | ((nota >= 3) & (votos >= mediana)),
+        nota < 3,
+    ]
+    escolhas = ["muito recomendado", "recomendado", "pouco recomendado"]
+
+    return np.select(condicoes, escolhas, default="Neutro").astype(object)
+
+def inserir_recomendacao(df1, quantil_75, mediana):
+    ''' Cria ou recalcula a coluna "recomendation", logo antes do custo em R$. '''
+    recomendacao = classificar_recomendacao(df1["aggregate_rating"], df1["votes"], quantil_75, mediana)
+
+    if "recomendation" in df1.columns:
+        df1["recomendation"] = recomendacao
+    else:
+        df1.insert(df1.columns.get_loc("average_cost_for_two_real"), "recomendation", recomendacao)
+
+    return df1
+
+def rotulo_outlier(df1):
+    ''' Rótulo da linha do outlier de preço da Austrália (o restaurante australiano mais caro),
+        ou None quando não há restaurantes australianos.
+    '''
+    australia = df1["country_name"] == "Australia"
+    if not australia.any():
+        return None
+    return df1.loc[australia, "average_cost_for_two_real"].idxmax()
+
+def limpar_base(df, compactar=True):
+    ''' Função para realizar a limpeza, ordenação e criação ou modificação de colunas no dataframe:
+        1 - etapas por linha (preparar_linhas)
+        2 - cria a coluna de recomendação com os quartis de votos de todos os restaurantes
+        3 - remove o outlier de preço da Austrália
+        4 - converte as colunas para os tipos compactos do ESQUEMA
+        5 - cria a ponte restaurante -> culinária (uma linha por par, só com inteiros)
+
+        Parâmetros: Data frame bruto lido do zomato.csv e se os tipos do ESQUEMA devem ser aplicados
+
+        Retorno: Tupla (df1, ponte, excluidos) com o data frame limpo, a ponte de culinárias e
+                 as linhas removidas como outlier (guardadas para a ingestão incremental)
+    '''
+    df1 = preparar_linhas(df)
+
+    # Coluna de recomendação baseado na quantidade de votos
+    quantile_75 = df1["votes"].quantile(0.75)
+    mediana = df1["votes"].median()
+    df1 = inserir_recomendacao(df1, quantile_75, mediana)
+
+    # Remoção de Outlier
+    outlier = rotulo_outlier(df1)
+    excluidos = df1.loc[[outlier] if outlier is not None else []]
+    if outlier is not None:
+        df1 = df1.drop(outlier)
+
+    # Índice posicional: o snapshot colunar não guarda o índice original do CSV e a ponte
+    # de culinárias referencia os restaurantes pela posição da linha
+    df1 = df1.reset_index(drop=True)
+    excluidos = excluidos.reset_index(drop=True)
+
+    if compactar:
+        df1 = aplicar_esquema(df1)
+        excluidos = aplicar_esquema(excluidos)
+
+    # Criação da ponte restaurante -> culinária para aplicação do filtro de culinárias
+    ponte = montar_ponte(df1)
+
+    return df1, ponte, excluidos
+
+def limpar_dados(df, compactar=True):
+    ''' Limpeza completa do zomato.csv (ver limpar_base).
+
+        Retorno: Tupla (df1, ponte) com o data frame limpo e a ponte de culinárias
+    '''
+    df1, ponte, _ = limpar_base(df, compactar)
+    return df1, ponte
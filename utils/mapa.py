@@ -0,0 +1,162 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import folium
+import numpy as np
+from folium.plugins import FastMarkerCluster, MarkerCluster
+
+from utils.grade import ZOOM_PONTOS
+from utils.instrumentacao import instrumentar
+
+#===========================================================================================================================================================================
+#                                                                                MAPA
+#===========================================================================================================================================================================
+
+# Cria cada marcador a partir de uma linha do array de dados. O popup é uma função: o Leaflet
+# só monta o HTML quando o marcador é clicado, em vez de embutir um popup por restaurante na página.
+CALLBACK_MARCADOR = """
+    var escapar = function (texto) {
+        var div = document.createElement("div");
+        div.textContent = texto;
+        return div.innerHTML;
+    };
+    var callback = function (row) {
+        var marker = L.marker(new L.LatLng(row[0], row[1]), {
+            icon: L.AwesomeMarkers.icon({icon: "home", prefix: "fa", markerColor: row[2]})
+        });
+        marker.bindPopup(function () {
+            return '<div style="width: 250px;">'
+                + '<h3 style="text-align: center;"><b>' + escapar(row[3]) + '</b></h3>'
+                + '<div style="font-size: 12px; margin-top: 10px;">'
+                + '<b>Cozinha:</b> ' + escapar(row[4]) + '<br>'
+                + '<b>Preço:</b> R$ ' + row[5] + '<br>'
+                + '<b>Nota:</b> ' + row[6] + '/5.0<br>'
+                + '<b>Recomendação:</b> ' + escapar(row[7])
+                + '</div></div>';
+        }, {maxWidth: 300});
+        return marker;
+    };
+"""
+
+def dados_marcadores(df):
+    ''' Monta, coluna a coluna, a lista [lat, lon, cor, nome, cozinha, preço, nota, recomendação]
+        de cada restaurante usada pelo callback do modo rápido.
+    '''
+    preco = np.char.mod("%.2f", df["average_cost_for_two_real"].to_numpy(dtype=np.float64))
+
+    colunas = [
+        df["latitude"].to_numpy(dtype=np.float64).tolist(),
+        df["longitude"].to_numpy(dtype=np.float64).tolist(),
+        df["color"].astype(str).tolist(),
+        df["restaurant_name"].astype(str).tolist(),
+        df["cuisines"].astype(str).tolist(),
+        preco.tolist(),
+        df["aggregate_rating"].astype(str).tolist(),
+        df["recomendation"].astype(str).tolist(),
+    ]
+
+    return [list(linha) for linha in zip(*colunas)]
+
+        #Criação de um mapa dos restaurantes
+@instrumentar("mapa")
+def create_map(df, modo="rapido"):
+    ''' Cria o mapa dos restaurantes com os marcadores agrupados em clusters.
+
+        Parâmetros: Data frame filtrado e o modo do mapa:
+            "rapido"    - todos os marcadores em um único array de dados e criados no navegador
+                          (FastMarkerCluster), com o popup montado só no clique
+            "detalhado" - um folium.Marker com popup HTML por restaurante, montado no servidor
+
+        Retorno: Mapa do folium
+    '''
+    if df.empty: return folium.Map(location=[0,0], zoom_start=2)
+
+    mapa = folium.Map(location=[df["latitude"].mean(), df["longitude"].mean()], zoom_start=2)
+
+    if modo == "rapido":
+        FastMarkerCluster(dados_marcadores(df), callback=CALLBACK_MARCADOR).add_to(mapa)
+        return mapa
+
+    marker_cluster = MarkerCluster().add_to(mapa)
+
+    for index, linha in df.iterrows():
+        html = f"""
+        <div style="width: 250px;">
+            <h3 style="text-align: center;"><b>{linha['restaurant_name']}</b></h3>
+            <div style="font-size: 12px; margin-top: 10px;">
+                <b>Cozinha:</b> {linha['cuisines']}<br>
+                <b>Preço:</b> R$ {linha['average_cost_for_two_real']:.2f}<br>
+                <b>Nota:</b> {linha['aggregate_rating']}/5.0<br>
+                <b>Recomendação:</b> {linha['recomendation']}
+            </div>
+        </div>"""
+
+        folium.Marker(
+            location=[linha["latitude"], linha["longitude"]],
+            popup=folium.Popup(html, max_width=300),
+            icon=folium.Icon(color=linha["color"], icon="home", prefix="fa")
+        ).add_to(marker_cluster)
+
+    return mapa
+
+@instrumentar("mapa")
+def html_mapa(df, modo="rapido"):
+    ''' HTML completo do mapa (o mesmo que o folium_static enviaria ao navegador), pronto para
+        ser guardado em cache e exibido com streamlit.components.v1.html.
+    '''
+    return folium.Figure().add_child(create_map(df, modo)).render()
+
+#===========================================================================================================================================================================
+#                                                                                MAPA AGREGADO NO SERVIDOR
+#===========================================================================================================================================================================
+def limites_viewport(bounds):
+    ''' Converte os limites devolvidos pelo st_folium em ((lat_sul, lon_oeste), (lat_norte, lon_leste)).
+
+        Retorna None quando o viewport ainda não é conhecido. Longitudes fora de [-180, 180]
+        (mapa arrastado além do antimeridiano) são trazidas de volta para o intervalo.
+    '''
+    if not bounds or not bounds.get("_southWest") or not bounds.get("_northEast"):
+        return None
+
+    sul, oeste = bounds["_southWest"]["lat"], bounds["_southWest"]["lng"]
+    norte, leste = bounds["_northEast"]["lat"], bounds["_northEast"]["lng"]
+
+    if leste - oeste >= 360:
+        oeste, leste = -180.0, 180.0
+    else:
+        oeste = (oeste + 180) % 360 - 180
+        leste = (leste + 180) % 360 - 180
+
+    return (sul, oeste), (norte, leste)
+
+@instrumentar("mapa")
+def camada_grade(grade, df, zoom, mascara=None, limites=None):
+    ''' Camada com o que está visível no viewport, agregado no servidor.
+
+        Abaixo de ZOOM_PONTOS cada cluster da grade vira um círculo com a quantidade de
+        restaurantes, a nota média e a cor mais comum; a partir dele são enviados só os
+        restaurantes dentro do viewport.
+
+        Parâmetros: GradeEspacial, df_limpo completo, zoom atual, máscara dos filtros
+                    (None = todos) e limites do viewport
+
+        Retorno: folium.FeatureGroup para o parâmetro feature_group_to_add do st_folium
+    '''
+    camada = folium.FeatureGroup(name="Restaurantes")
+
+    if zoom >= ZOOM_PONTOS:
+        posicoes = grade.posicoes_visiveis(mascara, limites)
+        FastMarkerCluster(dados_marcadores(df.take(posicoes)), callback=CALLBACK_MARCADOR).add_to(camada)
+        return camada
+
+    for cluster in grade.clusters(zoom, mascara, limites).itertuples(index=False):
+        folium.CircleMarker(
+            location=[cluster.latitude, cluster.longitude],
+            radius=float(6 + 3 * np.log2(cluster.restaurantes)),
+            color=cluster.cor,
+            fill=True,
+            fill_opacity=0.6,
+            tooltip=f"{cluster.restaurantes} restaurantes · nota média {cluster.nota_media:.2f}",
+        ).add_to(camada)
+
+    return camada
@@ -0,0 +1,218 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils import snapshot
+from utils.blocos import COLUNAS_TEXTO, LINHAS_POR_BLOCO, ConjuntoHashes, feather, finalizar, primeira_passada
+from utils.ingestao import HistogramaVotos
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Tamanho máximo de cada intervalo do CSV entregue a um processo; com mais intervalos que
+# processos a memória de cada processo continua limitada e a carga fica equilibrada
+TAMANHO_INTERVALO_MB = 64
+
+TAMANHO_LEITURA = 1 << 20
+
+# As partes trocadas entre os processos ficam em memória compartilhada (/dev/shm) só quando
+# ela tem livre FOLGA_COMPARTILHADA vezes o tamanho do CSV (as partes somam mais ou menos o
+# tamanho dele, e em contêineres o /dev/shm costuma ter 64 MB); senão ficam em disco, ao lado
+# do snapshot de destino. O processo principal lê cada parte mapeada, sem cópia pelo pipe do pool
+PASTA_COMPARTILHADA = "/dev/shm"
+FOLGA_COMPARTILHADA = 2
+
+# ==================================================================================================================================================================#
+#                                                                     INTERVALOS DO CSV
+# ==================================================================================================================================================================#
+def intervalos_csv(caminho_csv, quantidade):
+    ''' Divide as linhas de dados do CSV em até "quantidade" intervalos de bytes de tamanho
+        parecido, cada um terminando num fim de linha.
+
+        Campos entre aspas podem ter quebras de linha (ex.: endereços), então só vale como
+        fim de registro a quebra com uma quantidade par de aspas antes dela.
+
+        Retorno: Tupla (linha do cabeçalho em bytes, lista de (início, fim) em bytes)
+    '''
+    tamanho = os.path.getsize(caminho_csv)
+
+    with open(caminho_csv, "rb") as f:
+        cabecalho = f.readline()
+        inicio_dados = f.tell()
+
+        limites = [inicio_dados]
+        posicao = inicio_dados
+        aspas = 0   # aspas entre o início dos dados e "posicao"
+
+        for i in range(1, quantidade):
+            alvo = inicio_dados + (tamanho - inicio_dados) * i // quantidade
+            if alvo <= posicao:
+                continue
+
+            f.seek(posicao)
+            while posicao < alvo:
+                bloco = f.read(min(TAMANHO_LEITURA, alvo - posicao))
+                aspas += bloco.count(b'"')
+                posicao += len(bloco)
+
+            # Avança até uma quebra de linha fora de aspas
+            fim = None
+            while fim is None:
+                bloco = f.read(TAMANHO_LEITURA)
+                if not bloco:
+                    break
+                procura = 0
+                while True:
+                    quebra = bloco.find(b"\n", procura)
+                    if quebra < 0:
+                        aspas += bloco.count(b'"', procura)
+                        posicao += len(bloco)
+                        break
+                    aspas += bloco.count(b'"', procura, quebra)
+                    procura = quebra + 1
+                    if aspas % 2 == 0:
+                        fim = posicao + quebra + 1
+                        break
+
+            if fim is None or fim >= tamanho:
+                break
+            posicao = fim
+            limites.append(fim)
+
+    limites.append(tamanho)
+    return cabecalho, [(a, b) for a, b in zip(limites[:-1], limites[1:]) if b > a]
+
+# ==================================================================================================================================================================#
+#                                                                     LIMPEZA EM PARALELO
+# ==================================================================================================================================================================#
+def _primeira_passada_intervalo(caminho_csv, cabecalho, inicio, fim, pasta, prefixo, linhas_por_bloco):
+    ''' Executado em cada processo: primeira_passada só sobre um intervalo de bytes do CSV. '''
+    with open(caminho_csv, "rb") as f:
+        f.seek(inicio)
+        dados = f.read(fim - inicio)
+
+    leitor = pd.read_csv(io.BytesIO(cabecalho + dados), chunksize=linhas_por_bloco, dtype=COLUNAS_TEXTO)
+    return primeira_passada(leitor, pasta, prefixo, guardar_hashes=True)
+
+def juntar_intervalos(resultados):
+    ''' Junta as primeiras passadas dos intervalos, na ordem do arquivo.
+
+        Cada intervalo só removeu as próprias duplicatas; aqui os hashes gravados removem as
+        linhas que já apareceram num intervalo anterior (vale a primeira ocorrência, como no
+        drop_duplicates) e o histograma de votos perde os votos delas. Resumos de tipos e
+        culinárias não mudam: uma linha repetida não traz valor novo.
+
+        Retorno: Dicionário no formato da primeira_passada, pronto para o finalizar
+    '''
+    partes = []
+    votos = HistogramaVotos()
+    outlier = None
+    vistos = ConjuntoHashes()
+
+    for resultado in resultados:
+        votos = votos.juntar(resultado["votos"])
+
+        # O maior custo vence; no empate fica o intervalo anterior, como no idxmax
+        if resultado["outlier"] is not None and (outlier is None or resultado["outlier"][0] > outlier[0]):
+            custo, numero, posicao = resultado["outlier"]
+            outlier = (custo, len(partes) + numero, posicao)
+
+        for parte in resultado["partes"]:
+            hashes = np.load(parte.pop("hashes"))
+            repetidas = vistos.contem(hashes)
+            vistos.adicionar(hashes[~repetidas])
+
+            if repetidas.any():
+                parte["manter"] = ~repetidas
+                parte["linhas"] = int(np.count_nonzero(~repetidas))
+                votos_parte = feather.read_table(parte["arquivo"], columns=["votes"], memory_map=True)
+                votos.remover(votos_parte.column("votes").to_numpy()[repetidas])
+            partes.append(parte)
+
+    return {"partes": partes, "votos": votos, "outlier": outlier}
+
+def pasta_das_partes(caminho_csv, destino):
+    ''' Pasta das partes da primeira passada: /dev/shm quando comporta o CSV com folga, senão
+        a pasta do df_limpo de destino (nunca a memória quando ela não cabe).
+    '''
+    if os.path.isdir(PASTA_COMPARTILHADA):
+        if shutil.disk_usage(PASTA_COMPARTILHADA).free >= FOLGA_COMPARTILHADA * os.path.getsize(caminho_csv):
+            return PASTA_COMPARTILHADA
+    return os.path.dirname(os.path.abspath(destino["limpo"]))
+
+def limpar_em_paralelo(caminho_csv, destino, processos=None, linhas_por_bloco=LINHAS_POR_BLOCO):
+    ''' Mesma limpeza do limpar_base, dividindo o CSV por intervalos de bytes entre processos.
+
+        1 - cada processo faz a primeira_passada de um intervalo e grava as partes em
+            memória compartilhada ou ao lado do destino (pasta_das_partes)
+        2 - as partes são juntadas na ordem do arquivo (juntar_intervalos): duplicatas entre
+            intervalos, histograma de votos e outlier
+        3 - recomendação, tipos e conversão de cada parte voltam para o pool (finalizar) e a
+            gravação final segue a ordem das partes
+
+        O resultado não depende da quantidade de processos nem da ordem em que terminam.
+
+        Parâmetros: caminho do CSV, dicionário {"limpo", "ponte", "excluidos": caminho} dos
+                    arquivos de saída, quantidade de processos (None = núcleos disponíveis)
+                    e linhas lidas por bloco
+
+        Retorno: Quantidade de restaurantes do df_limpo gravado
+    '''
+    if feather is None:
+        raise RuntimeError("pyarrow não está instalado; não é possível gravar a limpeza em paralelo")
+
+    processos = processos or os.cpu_count() or 1
+    tamanho = os.path.getsize(caminho_csv)
+    quantidade = max(processos, int(-(-tamanho // (TAMANHO_INTERVALO_MB * 1024 ** 2))))
+    cabecalho, intervalos = intervalos_csv(caminho_csv, quantidade)
+
+    temporaria = tempfile.mkdtemp(prefix="zomato_paralelo_", dir=pasta_das_partes(caminho_csv, destino))
+    try:
+        # "spawn": o processo principal pode ser o servidor do Streamlit, com várias threads
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as pool:
+            resultados = pool.map(
+                _primeira_passada_intervalo,
+                *zip(*[
+                    (caminho_csv, cabecalho, inicio, fim, temporaria, f"intervalo_{i:05d}", linhas_por_bloco)
+                    for i, (inicio, fim) in enumerate(intervalos)
+                ]),
+            )
+            return finalizar(juntar_intervalos(resultados), destino, mapear=pool.map)
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+
+def gravar_snapshot_em_paralelo(caminho_csv, processos=None, linhas_por_bloco=LINHAS_POR_BLOCO):
+    ''' Limpa o CSV em paralelo direto para os arquivos do snapshot (utils.snapshot). '''
+    origem = snapshot.fingerprint(caminho_csv)
+    arquivos = snapshot.caminhos_snapshot(caminho_csv)
+    restaurantes = limpar_em_paralelo(caminho_csv, {nome: arquivos[nome] for nome in snapshot.FRAMES}, processos, linhas_por_bloco)
+    snapshot.registrar_snapshot(caminho_csv, origem)
+    return restaurantes
+
+# ==================================================================================================================================================================#
+#                                                                     BUILD
+# ==================================================================================================================================================================#
+if __name__ == "__main__":
+    # Uso: python -m utils.paralelo [caminho.csv] [processos]
+    import sys
+    import time
+    from pathlib import Path
+
+    from utils.data import CAMINHO_CSV
+
+    caminho = Path(sys.argv[1]) if len(sys.argv) > 1 else CAMINHO_CSV
+    processos = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    inicio = time.perf_counter()
+    restaurantes = gravar_snapshot_em_paralelo(caminho, processos)
+    print(f"{restaurantes:,} restaurantes gravados em {time.perf_counter() - inicio:.2f}s: {snapshot.caminhos_snapshot(caminho)['meta']}")
@@ -0,0 +1,49 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import numpy as np
+
+# ==================================================================================================================================================================#
+#                                                                     SELEÇÃO PARCIAL
+# ==================================================================================================================================================================#
+def posicoes_top(valores, n, crescente=False):
+    ''' Posições dos n maiores (ou menores) valores, na ordem do ranking, sem ordenar o array
+        inteiro: np.partition acha o valor de corte em O(N) e só os n escolhidos são ordenados.
+
+        Mesmo resultado de sort_values(kind="stable", na_position="last").head(n): empates ficam
+        na ordem das posições e nulos só entram quando faltam valores.
+    '''
+    valores = np.asarray(valores)
+    if valores.dtype.kind == "f":
+        nulos = np.isnan(valores)
+        candidatas = np.flatnonzero(~nulos)
+    else:
+        # Inteiros e booleanos são comparados como int64, sem passar por float
+        valores = valores.astype(np.int64, copy=False)
+        nulos = None
+        candidatas = np.arange(len(valores))
+
+    n = max(min(int(n), len(valores)), 0)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    chave = valores[candidatas] if crescente else -valores[candidatas]
+
+    if n < len(candidatas):
+        corte = np.partition(chave, n - 1)[n - 1]
+        melhores = chave < corte
+        # Entre os empatados no valor de corte entram os primeiros, até completar n
+        melhores[np.flatnonzero(chave == corte)[: n - np.count_nonzero(melhores)]] = True
+        candidatas, chave = candidatas[melhores], chave[melhores]
+
+    posicoes = candidatas[np.lexsort((candidatas, chave))]
+    if len(posicoes) < n:
+        posicoes = np.concatenate([posicoes, np.flatnonzero(nulos)[: n - len(posicoes)]])
+    return posicoes
+
+def top_n(dados, n, coluna=None, crescente=False):
+    ''' As n primeiras linhas de uma Series (ou de um data frame, pela "coluna") no ranking,
+        equivalente a sort_values(...).head(n) sem a ordenação completa.
+    '''
+    valores = dados if coluna is None else dados[coluna]
+    return dados.iloc[posicoes_top(valores.to_numpy(), n, crescente)]
@@ -0,0 +1,286 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import io
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:   # sem pyarrow o CSV é escrito pelo pandas (mesmos valores, ~7x mais lento)
+    pa = pa_csv = None
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Linhas geradas por tarefa; cada bloco tem o próprio gerador aleatório (semente, número do
+# bloco), então o arquivo não depende da quantidade de processos
+LINHAS_POR_BLOCO = 50_000
+
+# Colunas sorteadas juntas, de um restaurante real do mesmo país: preço, faixa de preço,
+# serviços, nota, cor e texto da nota (no idioma do país) e votos continuam coerentes entre si
+COLUNAS_REAMOSTRADAS = [
+    "Average Cost for two", "Has Table booking", "Has Online delivery", "Is delivering now",
+    "Switch to order menu", "Price range", "Aggregate rating", "Rating color", "Rating text", "Votes",
+]
+
+# Os votos sorteados são multiplicados por um fator log-normal com este desvio (mantém a
+# assimetria da distribuição real sem repetir sempre os mesmos valores)
+DISPERSAO_VOTOS = 0.35
+
+# Desvio (graus) das coordenadas em volta do centro de cada localidade
+RAIO_LOCALIDADE = 0.01
+
+# Os restaurant_ids gerados começam acima dos ids do zomato.csv (até ~18,5 milhões)
+ID_INICIAL = 100_000_000
+
+# ==================================================================================================================================================================#
+#                                                                     PERFIL DA BASE REAL
+# ==================================================================================================================================================================#
+def _probabilidades(contagem):
+    return contagem.index.to_numpy(), (contagem / contagem.sum()).to_numpy()
+
+class PerfilZomato:
+    ''' Distribuições do zomato.csv usadas para gerar restaurantes novos no mesmo formato.
+
+        - país pela frequência real; cidade pela frequência dentro do país e localidade pela
+          frequência dentro da cidade (moeda sempre a do país, coordenadas em volta da localidade)
+        - preço, serviços, nota, cor/texto da nota e votos sorteados juntos de um restaurante
+          real do mesmo país (COLUNAS_REAMOSTRADAS), com os votos espalhados (DISPERSAO_VOTOS)
+        - culinárias: a quantidade vem do mesmo restaurante sorteado; as culinárias, sem
+          repetição, pela frequência de cada uma no país
+        - nome: primeira palavra e resto de nomes reais do país, combinados; endereço com
+          número, um trecho de endereço real do país, localidade e cidade
+        - duplicatas: a mesma proporção de linhas repetidas do arquivo real
+
+        O outlier de preço da Austrália (ver limpeza.rotulo_outlier) fica fora do sorteio:
+        repetido em escala, deixaria de ser um único restaurante removido pela limpeza.
+    '''
+
+    def __init__(self, df):
+        self.colunas = list(df.columns)
+        self.taxa_duplicatas = float(df.duplicated().mean())
+
+        df = df.drop_duplicates()
+        australia = df["Country Code"] == 14
+        if australia.any():
+            df = df.drop(df.loc[australia, "Average Cost for two"].idxmax())
+
+        self.paises, self.p_paises = _probabilidades(df["Country Code"].value_counts(sort=False))
+        self.por_pais = {}
+        self.localidades = {}
+
+        culinarias = df["Cuisines"].fillna("").str.split(", ")
+        quantidades = culinarias.map(lambda lista: len([c for c in lista if c]))
+
+        for pais, grupo in df.groupby("Country Code", sort=False):
+            lista = culinarias.loc[grupo.index].explode()
+            vocabulario, p_culinarias = _probabilidades(lista[lista != ""].value_counts())
+
+            nomes = grupo["Restaurant Name"].str.split(" ", n=1)
+            compostos = nomes[nomes.str.len() == 2]
+
+            trechos = grupo["Address"].str.split(", ").str[0]
+
+            linhas = grupo[COLUNAS_REAMOSTRADAS].reset_index(drop=True)
+            linhas["culinarias"] = quantidades.loc[grupo.index].to_numpy()
+
+            self.por_pais[pais] = {
+                "moeda": grupo["Currency"].mode()[0],
+                "cidades": _probabilidades(grupo["City"].value_counts(sort=False)),
+                "linhas": {coluna: linhas[coluna].to_numpy() for coluna in linhas.columns},
+                "culinarias": (vocabulario.astype(object), np.log(p_culinarias).astype(np.float32)),
+                "um_nome": float(1 - len(compostos) / len(nomes)),
+                "nomes": grupo["Restaurant Name"].to_numpy(dtype=object),
+                "primeiros": compostos.str[0].to_numpy(dtype=object),
+                "restos": compostos.str[1].to_numpy(dtype=object),
+                "trechos": trechos.to_numpy(dtype=object),
+            }
+
+        # Centro de cada localidade (sem as coordenadas zeradas, que ficam zeradas)
+        coordenadas = df[(df["Longitude"] != 0) | (df["Latitude"] != 0)]
+        centros = coordenadas.groupby(["City", "Locality"])[["Latitude", "Longitude"]].mean()
+        for cidade, grupo in df.groupby("City", sort=False):
+            nomes, p = _probabilidades(grupo["Locality"].value_counts(sort=False))
+            centro = centros.reindex(pd.MultiIndex.from_product([[cidade], nomes])).fillna(0).to_numpy()
+            self.localidades[cidade] = (nomes.astype(object), p, centro)
+
+    def _pais(self, pais, quantidade, gerador):
+        ''' Colunas de "quantidade" restaurantes novos de um país (sem restaurant_id). '''
+        perfil = self.por_pais[pais]
+
+        sorteio = gerador.integers(0, len(perfil["linhas"]["Votes"]), quantidade)
+        colunas = {coluna: valores[sorteio] for coluna, valores in perfil["linhas"].items()}
+
+        votos = colunas["Votes"] * gerador.lognormal(0, DISPERSAO_VOTOS, quantidade)
+        colunas["Votes"] = np.rint(votos).astype(np.int64)
+
+        # Cidade e localidade
+        nomes_cidades, p_cidades = perfil["cidades"]
+        cidade = gerador.choice(len(nomes_cidades), quantidade, p=p_cidades)
+        localidade = np.empty(quantidade, dtype=object)
+        centro = np.zeros((quantidade, 2))
+        for codigo in np.unique(cidade).tolist():
+            posicoes = np.flatnonzero(cidade == codigo)
+            nomes_localidades, p, centros = self.localidades[nomes_cidades[codigo]]
+            escolha = gerador.choice(len(nomes_localidades), len(posicoes), p=p)
+            localidade[posicoes] = nomes_localidades[escolha]
+            centro[posicoes] = centros[escolha]
+        cidade = nomes_cidades[cidade].astype(object)
+
+        deslocamento = gerador.normal(0, RAIO_LOCALIDADE, (quantidade, 2))
+        coordenadas = np.where(centro != 0, np.round(centro + deslocamento, 10), 0.0)
+
+        # Culinárias sem repetição, pela frequência no país (Gumbel top-k)
+        vocabulario, log_p = perfil["culinarias"]
+        quantidades = np.minimum(colunas.pop("culinarias"), len(vocabulario))
+        maximo = int(quantidades.max()) if quantidade else 0
+        texto_culinarias = np.full(quantidade, "", dtype=object)
+        if maximo:
+            chaves = log_p + gerador.gumbel(size=(quantidade, len(vocabulario))).astype(np.float32)
+            escolhidas = np.argpartition(-chaves, maximo - 1, axis=1)[:, :maximo]
+            ordem = np.take_along_axis(chaves, escolhidas, axis=1).argsort(axis=1)[:, ::-1]
+            escolhidas = vocabulario[np.take_along_axis(escolhidas, ordem, axis=1)]
+            texto_culinarias = np.where(quantidades > 0, escolhidas[:, 0], "")
+            for j in range(1, maximo):
+                texto_culinarias = np.where(quantidades > j, texto_culinarias + ", " + escolhidas[:, j], texto_culinarias)
+
+        # Nome: um nome real de uma palavra ou primeira palavra + resto de nomes reais diferentes
+        nome = perfil["nomes"][gerador.integers(0, len(perfil["nomes"]), quantidade)]
+        if len(perfil["primeiros"]):
+            composto = gerador.random(quantidade) >= perfil["um_nome"]
+            n = int(composto.sum())
+            nome[composto] = (
+                perfil["primeiros"][gerador.integers(0, len(perfil["primeiros"]), n)] + " "
+                + perfil["restos"][gerador.integers(0, len(perfil["restos"]), n)]
+            )
+
+        numero = gerador.integers(1, 1000, quantidade).astype(str).astype(object)
+        trecho = perfil["trechos"][gerador.integers(0, len(perfil["trechos"]), quantidade)]
+        verbose = localidade + ", " + cidade
+
+        colunas.update({
+            "Restaurant Name": nome,
+            "Country Code": np.full(quantidade, pais),
+            "City": cidade,
+            "Address": numero + ", " + trecho + ", " + verbose,
+            "Locality": localidade,
+            "Locality Verbose": verbose,
+            "Longitude": coordenadas[:, 1],
+            "Latitude": coordenadas[:, 0],
+            "Cuisines": texto_culinarias,
+            "Currency": np.full(quantidade, perfil["moeda"], dtype=object),
+        })
+        return pd.DataFrame(colunas)
+
+    def gerar(self, quantidade, gerador, primeiro_id=ID_INICIAL):
+        ''' Data frame com "quantidade" linhas no formato do zomato.csv.
+
+            Os restaurantes novos recebem ids seguidos a partir de primeiro_id; as duplicatas
+            (taxa_duplicatas) repetem uma linha anterior do mesmo bloco, id incluso.
+        '''
+        duplicada = gerador.random(quantidade) < self.taxa_duplicatas
+        duplicada[:1] = False
+        unicos = int(quantidade - duplicada.sum())
+
+        pais = gerador.choice(len(self.paises), unicos, p=self.p_paises)
+        partes = [self._pais(self.paises[codigo], int((pais == codigo).sum()), gerador) for codigo in np.unique(pais).tolist()]
+
+        # Os países saem agrupados; uma permutação os mistura como no arquivo real
+        df = pd.concat(partes, ignore_index=True).take(gerador.permutation(unicos)).reset_index(drop=True)
+        df["Restaurant ID"] = primeiro_id + np.arange(unicos, dtype=np.int64)
+
+        # Cada duplicata copia um restaurante que já apareceu antes dela
+        ultimo = np.cumsum(~duplicada) - 1
+        origem = ultimo.copy()
+        origem[duplicada] = gerador.integers(0, ultimo[duplicada] + 1)
+
+        return df.take(origem)[self.colunas].reset_index(drop=True)
+
+# ==================================================================================================================================================================#
+#                                                                     GERAÇÃO EM PARALELO
+# ==================================================================================================================================================================#
+_perfil = None
+
+def _iniciar(perfil):
+    global _perfil
+    _perfil = perfil
+
+def _gerar_bloco(semente, numero, quantidade, perfil=None):
+    ''' Executado em cada processo: um bloco já convertido em CSV (bytes, sem cabeçalho). '''
+    perfil = perfil or _perfil
+    gerador = np.random.default_rng([semente, numero])
+    df = perfil.gerar(quantidade, gerador, ID_INICIAL + numero * LINHAS_POR_BLOCO)
+
+    if pa_csv is None:
+        return df.to_csv(index=False, header=False).encode("utf-8")
+
+    # O pyarrow põe aspas em todos os textos; o pd.read_csv lê os mesmos valores
+    saida = io.BytesIO()
+    pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), saida, pa_csv.WriteOptions(include_header=False, quoting_style="needed"))
+    return saida.getvalue()
+
+def gerar_csv(destino, linhas, semente=0, processos=None, base=None):
+    ''' Grava um CSV sintético no formato do zomato.csv com "linhas" linhas (ver PerfilZomato).
+
+        Os blocos de LINHAS_POR_BLOCO linhas são gerados pelos processos e gravados em ordem,
+        sem a base inteira em memória: no máximo 2 blocos por processo ficam esperando a
+        gravação. A mesma semente gera sempre o mesmo arquivo, com qualquer quantidade de
+        processos.
+
+        Parâmetros: caminho do CSV, quantidade de linhas, semente, quantidade de processos
+                    (None = núcleos disponíveis) e data frame da base real (None = zomato.csv)
+    '''
+    if base is None:
+        from utils.data import CAMINHO_CSV
+        base = pd.read_csv(CAMINHO_CSV)
+
+    perfil = PerfilZomato(base)
+    processos = processos or os.cpu_count() or 1
+    tarefas = [
+        (semente, numero, min(LINHAS_POR_BLOCO, linhas - inicio))
+        for numero, inicio in enumerate(range(0, linhas, LINHAS_POR_BLOCO))
+    ]
+
+    with open(destino, "wb") as f:
+        f.write((",".join(perfil.colunas) + "\n").encode("utf-8"))
+
+        if processos == 1:
+            for tarefa in tarefas:
+                f.write(_gerar_bloco(*tarefa, perfil))
+            return
+
+        # "spawn": quem chama pode ser um processo com várias threads (ex.: o benchmark)
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=processos, mp_context=contexto, initializer=_iniciar, initargs=(perfil,)) as pool:
+            pendentes = deque()
+            for tarefa in tarefas:
+                pendentes.append(pool.submit(_gerar_bloco, *tarefa))
+                if len(pendentes) >= 2 * processos:
+                    f.write(pendentes.popleft().result())
+            while pendentes:
+                f.write(pendentes.popleft().result())
+
+# ==================================================================================================================================================================#
+#                                                                     EXECUÇÃO
+# ==================================================================================================================================================================#
+if __name__ == "__main__":
+    # Uso: python -m utils.sintetico destino.csv linhas [semente] [processos]
+    # Ex.: python -m utils.sintetico /tmp/zomato_50m.csv 50000000 0 8
+    import sys
+    import time
+
+    destino, linhas = sys.argv[1], int(sys.argv[2])
+    semente = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    processos = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    inicio = time.perf_counter()
+    gerar_csv(destino, linhas, semente, processos)
+    tempo = time.perf_counter() - inicio
+    print(f"{linhas:,} linhas em {tempo:.1f}s ({linhas / tempo:,.0f} linhas/s, {os.path.getsize(destino) / 1024 ** 2:,.0f} MB)")
@@ -0,0 +1,229 @@
+#===========================================================================================================================================================================
+#                                                                                BIBLIOTECAS
+#===========================================================================================================================================================================
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # sem pyarrow o dashboard continua lendo direto do CSV
+    pa = feather = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava, cada processo pode acabar limpando o CSV
+    fcntl = None
+
+#===========================================================================================================================================================================
+#                                                                                CONSTANTES
+#===========================================================================================================================================================================
+# Versão do pipeline de limpeza gravada no snapshot. Deve ser incrementada sempre que
+# limpar_dados mudar o conteúdo ou os tipos das colunas, para invalidar snapshots antigos.
+VERSAO_LIMPEZA = 4
+
+# Data frames gravados no snapshot, na ordem devolvida pela função de limpeza
+FRAMES = ("limpo", "ponte", "excluidos")
+
+TAMANHO_BLOCO_HASH = 1 << 20
+
+# ==================================================================================================================================================================#
+#                                                                     IMPRESSÃO DIGITAL DO CSV
+# ==================================================================================================================================================================#
+def hash_arquivo(caminho):
+    ''' Calcula o sha256 do arquivo lendo em blocos, sem carregar tudo na memória. '''
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO_HASH), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+def fingerprint(caminho):
+    ''' Retorna o tamanho, a data de modificação e o hash do arquivo de origem. '''
+    info = os.stat(caminho)
+    return {
+        "size": info.st_size,
+        "mtime_ns": info.st_mtime_ns,
+        "sha256": hash_arquivo(caminho),
+    }
+
+def caminhos_snapshot(caminho_csv):
+    ''' Arquivos do snapshot, gravados ao lado do CSV (ex.: dataset/zomato_limpo.feather). '''
+    base = caminho_csv.with_suffix("")
+    return {
+        "limpo": base.with_name(base.name + "_limpo.feather"),
+        "ponte": base.with_name(base.name + "_ponte.feather"),
+        "excluidos": base.with_name(base.name + "_excluidos.feather"),
+        "meta": base.with_name(base.name + "_snapshot.json"),
+        "trava": base.with_name(base.name + "_snapshot.lock"),
+    }
+
+def _ler_meta(caminho_meta):
+    try:
+        with open(caminho_meta, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def snapshot_valido(caminho_csv):
+    ''' Verifica se o snapshot corresponde ao CSV atual.
+
+        Tamanho e data de modificação iguais bastam. Se só a data mudou (arquivo copiado
+        ou "tocado"), o hash decide; quando o conteúdo é o mesmo a data do snapshot é
+        atualizada para a próxima verificação voltar a ser instantânea.
+    '''
+    if feather is None:
+        return False
+
+    arquivos = caminhos_snapshot(caminho_csv)
+    meta = _ler_meta(arquivos["meta"])
+    if meta is None or meta.get("versao") != VERSAO_LIMPEZA:
+        return False
+    if not all(arquivos[nome].exists() for nome in FRAMES):
+        return False
+
+    info = os.stat(caminho_csv)
+    origem = meta.get("origem", {})
+    if origem.get("size") != info.st_size:
+        return False
+    if origem.get("mtime_ns") == info.st_mtime_ns:
+        return True
+
+    if origem.get("sha256") != hash_arquivo(caminho_csv):
+        return False
+
+    origem["mtime_ns"] = info.st_mtime_ns
+    try:
+        _gravar_meta(arquivos["meta"], meta)
+    except OSError:
+        pass
+    return True
+
+# ==================================================================================================================================================================#
+#                                                                     LEITURA E ESCRITA
+# ==================================================================================================================================================================#
+def _gravar_meta(caminho_meta, meta):
+    temporario = caminho_meta.with_name(caminho_meta.name + ".tmp")
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(temporario, caminho_meta)
+
+def _gravar_feather(df, caminho):
+    # Sem compressão o arquivo pode ser mapeado em memória e lido sem descompactar
+    temporario = caminho.with_name(caminho.name + ".tmp")
+    feather.write_feather(df, temporario, compression="uncompressed")
+    os.replace(temporario, caminho)
+
+def salvar_snapshot(frames, caminho_csv):
+    ''' Grava os dataframes limpos em Feather (Arrow IPC) e o fingerprint do CSV de origem.
+
+        Parâmetros: tupla (df1, ponte, excluidos) devolvida pela limpeza e caminho do CSV
+
+        A impressão digital é calculada antes de gravar os dados, assim um CSV alterado
+        durante a gravação gera um snapshot que será descartado na próxima leitura.
+    '''
+    if feather is None:
+        raise RuntimeError("pyarrow não está instalado; não é possível gravar o snapshot")
+
+    arquivos = caminhos_snapshot(caminho_csv)
+    origem = fingerprint(caminho_csv)
+
+    for nome, df in zip(FRAMES, frames):
+        _gravar_feather(df, arquivos[nome])
+    registrar_snapshot(caminho_csv, origem)
+
+def registrar_snapshot(caminho_csv, origem):
+    ''' Grava o fingerprint do CSV de origem depois que os arquivos do snapshot estão completos
+        (também usado pela limpeza em blocos, que grava os arquivos por conta própria).
+    '''
+    _gravar_meta(caminhos_snapshot(caminho_csv)["meta"], {"versao": VERSAO_LIMPEZA, "origem": origem})
+
+def _tipo_compartilhado(tipo):
+    # Texto vira string[pyarrow], que continua apontando para o buffer do arquivo mapeado
+    if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+        return pd.StringDtype("pyarrow")
+    return None
+
+def ler_snapshot(caminho_csv, compartilhado=False):
+    ''' Lê o snapshot mapeando os arquivos em memória.
+
+        Por padrão os dados são copiados para a memória do processo. Com "compartilhado" os
+        textos (e as colunas numéricas, quando o arquivo tem um só lote) ficam nas páginas do
+        arquivo mapeado, somente leitura: vários processos lendo o mesmo snapshot dividem essas
+        páginas pelo cache do sistema, e cada um só aloca o que o pandas precisa converter
+        (códigos das categorias, booleanos, offsets dos textos, lotes gravados em blocos).
+
+        Retorno: Tupla (df1, ponte, excluidos)
+    '''
+    arquivos = caminhos_snapshot(caminho_csv)
+    opcoes = {"split_blocks": True, "types_mapper": _tipo_compartilhado} if compartilhado else {}
+    return tuple(feather.read_table(arquivos[nome], memory_map=True).to_pandas(**opcoes) for nome in FRAMES)
+
+@contextmanager
+def trava(caminho_csv):
+    ''' Trava exclusiva entre processos para a construção do snapshot.
+
+        O primeiro processo que encontra o snapshot desatualizado limpa o CSV e grava os
+        arquivos; os outros esperam aqui e depois só leem o que ele gravou. Sem fcntl ou sem
+        permissão de escrita na pasta segue sem trava.
+    '''
+    try:
+        arquivo = open(caminhos_snapshot(caminho_csv)["trava"], "a") if fcntl is not None else None
+    except OSError:
+        arquivo = None
+
+    if arquivo is None:
+        yield
+        return
+
+    with arquivo:
+        fcntl.flock(arquivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+def carregar(caminho_csv, limpar, compartilhado=False):
+    ''' Usa o snapshot quando ele corresponde ao CSV; caso contrário roda a limpeza
+        completa e tenta regravar o snapshot.
+
+        Parâmetros: caminho do CSV, função de limpeza (df bruto -> (df1, ponte, excluidos))
+                    e se o snapshot é lido sem cópia (ver ler_snapshot)
+
+        Retorno: Tupla (df1, ponte, excluidos)
+    '''
+    if snapshot_valido(caminho_csv):
+        return ler_snapshot(caminho_csv, compartilhado)
+
+    frames = limpar(pd.read_csv(caminho_csv))
+
+    if feather is not None:
+        try:
+            salvar_snapshot(frames, caminho_csv)
+        except OSError:
+            # Diretório somente leitura (ex.: deploy): segue sem snapshot
+            pass
+        else:
+            if compartilhado:
+                # Troca os dataframes recém-limpos pelos do arquivo, que os outros processos também mapeiam
+                return ler_snapshot(caminho_csv, compartilhado)
+
+    return frames
+
+# ==================================================================================================================================================================#
+#                                                                     BUILD
+# ==================================================================================================================================================================#
+if __name__ == "__main__":
+    # Uso: python -m utils.snapshot  (reconstrói o snapshot a partir do CSV)
+    import time
+
+    from utils.data import CAMINHO_CSV
+    from utils.limpeza import limpar_base
+
+    inicio = time.perf_counter()
+    salvar_snapshot(limpar_base(pd.read_csv(CAMINHO_CSV)), CAMINHO_CSV)
+    print(f"Snapshot gravado em {time.perf_counter() - inicio:.2f}s: {caminhos_snapshot(CAMINHO_CSV)['meta']}")